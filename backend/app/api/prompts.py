@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from app.models.prompt_models import OutputRepairStats, PromptStatsResponse
+from app.core.database import get_output_parser, get_prompt_registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/prompts", tags=["prompts"])
+
+
+@router.get("/stats", response_model=PromptStatsResponse)
+async def prompt_stats():
+    """
+    Token usage (including provider cache hits) and latency per prompt
+    template version since startup. Each edit to a template's text gets a
+    new version, so the cost of a prompt change shows up side by side.
+    """
+    return PromptStatsResponse(templates=get_prompt_registry().stats())
+
+
+@router.get("/repair-stats", response_model=OutputRepairStats)
+async def repair_stats():
+    """
+    How often model output needed repair (bad JSON, truncation, near-miss
+    thought types, dangling edges) and how many responses that would have
+    ended in the fallback chain were salvaged instead.
+    """
+    return get_output_parser().stats()
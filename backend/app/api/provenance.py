@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.models.provenance_models import ProvenanceQueryResponse
+from app.core.database import get_provenance_writer
+from datetime import datetime
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/provenance", tags=["provenance"])
+
+
+@router.get("", response_model=ProvenanceQueryResponse)
+async def query_provenance(
+    start: Optional[datetime] = Query(None, description="Inclusive start of the time range (UTC)"),
+    end: Optional[datetime] = Query(None, description="Exclusive end of the time range (UTC)"),
+    session_id: Optional[str] = Query(None, description="Only exchanges for this session"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Audit raw LLM exchanges: provider output, latency, token usage and
+    whether the fallback chain was used. Records are written in batches,
+    so the last second or so of exchanges may not be visible yet.
+    """
+    writer = get_provenance_writer()
+    if writer is None:
+        raise HTTPException(status_code=404, detail="Provenance logging is disabled")
+
+    records = await writer.query(start=start, end=end, session_id=session_id, limit=limit)
+    return ProvenanceQueryResponse(start=start, end=end, records=records)
+
+
+@router.get("/stats")
+async def provenance_stats():
+    """Counters for the batching writer (queued, written, dropped, failed batches)."""
+    writer = get_provenance_writer()
+    if writer is None:
+        raise HTTPException(status_code=404, detail="Provenance logging is disabled")
+    return writer.stats()
@@ -1,14 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
 from app.models.thought_models import (
     ProcessPromptRequest,
     ReasoningChain,
     UpdateNodeRequest,
-    ThoughtNode
+    ThoughtNode,
+    GraphLayout,
+    LayoutMode,
+    SessionChanges,
+    CreateBranchRequest,
+    CompareModelsRequest,
+    CompactReasoningChain,
+    WireFormat,
+    ModelComparison,
+    ModelSpec
 )
 from app.services.llm_service import LLMService
-from app.core.config import Settings
-from app.core.database import get_graph_service
-from app.services.graph_service import GraphService
+from app.core.config import get_settings
+from app.core.database import get_session_service, get_provenance_writer, get_prompt_registry, get_output_parser
+from app.core.idempotency import IdempotencyKeyReused, IdempotencyStore
+from app.services.session_service import SessionService
+from app.services.diff_service import GraphDiffService
+from typing import Dict, Optional, Tuple, Union
+import asyncio
+import hashlib
 import uuid
 import logging
 from datetime import datetime
@@ -17,31 +31,104 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/reasoning", tags=["reasoning"])
 
-# Initialize settings
-settings = Settings()
+# Shared settings instance
+settings = get_settings()
+
+# LLM service instance (lazy-initialized, reused so the provider client and
+# its HTTP connection pool survive across requests)
+_llm_service: Optional[LLMService] = None
 
 
 def get_llm_service() -> LLMService:
     """Dependency to get LLM service"""
+    global _llm_service
+
+    if _llm_service is not None:
+        return _llm_service
+
     # Try Gemini first (preferred), fallback to OpenAI
     gemini_key = settings.gemini_api_key if hasattr(settings, 'gemini_api_key') else None
     openai_key = settings.openai_api_key
 
     if gemini_key:
-        return LLMService(api_key=gemini_key.get_secret_value(), provider="gemini")
+        _llm_service = LLMService(api_key=gemini_key.get_secret_value(), provider="gemini",
+                                  provenance=get_provenance_writer(), prompts=get_prompt_registry(),
+                                  context_cache_ttl_seconds=settings.gemini_context_cache_ttl_seconds,
+                                  parser=get_output_parser(),
+                                  continuation_max_tokens=settings.llm_continuation_max_tokens)
     elif openai_key:
-        return LLMService(api_key=openai_key.get_secret_value(), provider="openai")
+        _llm_service = LLMService(api_key=openai_key.get_secret_value(), provider="openai",
+                                  provenance=get_provenance_writer(), prompts=get_prompt_registry(),
+                                  parser=get_output_parser(),
+                                  continuation_max_tokens=settings.llm_continuation_max_tokens)
     else:
         raise HTTPException(
             status_code=500,
             detail="No API key configured. Please set GEMINI_API_KEY or OPENAI_API_KEY in your .env file"
         )
 
+    return _llm_service
+
+
+# LLM services for model comparison, one per (provider, model)
+_model_services: Dict[Tuple[str, str], LLMService] = {}
+
+diff_service = GraphDiffService()
+
+# Results of /process keyed by Idempotency-Key
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.idempotency_ttl_seconds,
+    max_entries=settings.idempotency_max_entries
+)
+
+
+def get_model_service(spec: ModelSpec) -> LLMService:
+    """
+    Get a (cached) LLM service for a specific provider and model.
+
+    Only models listed in settings.compare_models can be run, which also
+    bounds the cache to that list.
+
+    Raises:
+        ValueError: If the model isn't enabled, or its provider has no API key configured
+    """
+    key = (spec.provider, spec.model)
+    if key in _model_services:
+        return _model_services[key]
+
+    if f"{spec.provider}:{spec.model}" not in settings.compare_models:
+        raise ValueError(f"Model '{spec.provider}:{spec.model}' is not enabled; "
+                         f"available: {', '.join(settings.compare_models)}")
+
+    api_keys = {"gemini": settings.gemini_api_key, "openai": settings.openai_api_key}
+    if spec.provider not in api_keys:
+        raise ValueError(f"Unknown provider '{spec.provider}'")
+    if api_keys[spec.provider] is None:
+        raise ValueError(f"No API key configured for {spec.provider}")
+
+    _model_services[key] = LLMService(
+        api_key=api_keys[spec.provider].get_secret_value(),
+        model=spec.model,
+        provider=spec.provider,
+        provenance=get_provenance_writer(),
+        prompts=get_prompt_registry(),
+        context_cache_ttl_seconds=settings.gemini_context_cache_ttl_seconds,
+        parser=get_output_parser(),
+        continuation_max_tokens=settings.llm_continuation_max_tokens
+    )
+    return _model_services[key]
+
 
 @router.post("/process", response_model=ReasoningChain)
 async def process_prompt(
     request: ProcessPromptRequest,
-    llm_service: LLMService = Depends(get_llm_service)
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255,
+        description="Retries with the same key return the original result instead of generating again"
+    ),
+    llm_service: LLMService = Depends(get_llm_service),
+    session_service: SessionService = Depends(get_session_service)
 ):
     """
     Process a user prompt and generate a reasoning chain.
@@ -55,111 +142,319 @@ async def process_prompt(
     - Thought nodes (question, retrieval, reasoning, conclusion)
     - Edges showing how thoughts connect
     - Confidence levels for each step
+    - Precomputed node coordinates (see layout_mode)
+
+    Send an Idempotency-Key header to make retries safe: a retry while the
+    original is still running waits for it, and a retry after it finished
+    gets the same chain back (with Idempotent-Replayed: true) without
+    another LLM call. Reusing a key for a different body is a 422.
     """
     try:
-        # Generate unique session ID
-        session_id = str(uuid.uuid4())
-
-        logger.info(f"Processing prompt for session {session_id}: {request.prompt[:100]}...")
+        if idempotency_key is None:
+            reasoning_chain, _ = await _process(request, llm_service, session_service)
+            return reasoning_chain
+
+        fingerprint = hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+        (reasoning_chain, _), replayed = await idempotency_store.run(
+            idempotency_key,
+            fingerprint,
+            lambda: _process(request, llm_service, session_service),
+            # Fallback chains aren't kept, so a retry gets a real second attempt
+            keep=lambda result: not result[1]
+        )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return reasoning_chain
 
-        # Generate reasoning chain using LLM
-        reasoning_data = await llm_service.generate_reasoning_chain(
-            prompt=request.prompt,
-            session_id=session_id
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error processing prompt: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to process prompt: {str(e)}"
         )
 
-        # Get graph service and persist to Neo4j
-        graph = get_graph_service()
 
-        # Store session node
-        session_node_id = graph.create_node("Session", {
-            "session_id": session_id,
-            "prompt": request.prompt,
-            "status": "completed"
-        })
+async def _process(request: ProcessPromptRequest, llm_service: LLMService,
+                   session_service: SessionService) -> Tuple[ReasoningChain, bool]:
+    """Generate, lay out and store a new session. Returns (chain, used_fallback)."""
+    # Generate unique session ID
+    session_id = str(uuid.uuid4())
+
+    logger.info(f"Processing prompt for session {session_id}: {request.prompt[:100]}...")
+
+    # Generate reasoning chain using LLM
+    reasoning_data = await llm_service.generate_reasoning_chain(
+        prompt=request.prompt,
+        session_id=session_id
+    )
+
+    # Create response
+    reasoning_chain = ReasoningChain(
+        session_id=session_id,
+        prompt=request.prompt,
+        nodes=reasoning_data["nodes"],
+        edges=reasoning_data["edges"],
+        status="completed",
+        created_at=datetime.utcnow().isoformat()
+    )
+
+    # Lay the graph out server-side so the client doesn't have to simulate
+    reasoning_chain.layout = await asyncio.to_thread(
+        session_service.compute_layout, reasoning_chain, request.layout_mode
+    )
+
+    # Persist to Neo4j, seeding the session's layout cache
+    await asyncio.to_thread(
+        session_service.create_session,
+        session_id=session_id,
+        prompt=request.prompt,
+        reasoning_data=reasoning_data,
+        layout=reasoning_chain.layout
+    )
 
-        # Store thought nodes in Neo4j
-        node_id_map = {}  # Map internal IDs to Neo4j IDs
-        for node_data in reasoning_data["nodes"]:
-            neo4j_id = graph.create_node("ThoughtNode", {
-                "node_id": node_data["id"],
-                "type": node_data["type"],
-                "content": node_data["content"],
-                "confidence": node_data["confidence"],
-                "session_id": session_id
-            })
-            node_id_map[node_data["id"]] = neo4j_id
-
-            # Link thought to session
-            graph.create_relationship(session_node_id, neo4j_id, "HAS_THOUGHT")
-
-        # Store edges in Neo4j
-        for edge_data in reasoning_data["edges"]:
-            source_neo4j_id = node_id_map.get(edge_data["source_id"])
-            target_neo4j_id = node_id_map.get(edge_data["target_id"])
-
-            if source_neo4j_id and target_neo4j_id:
-                graph.create_relationship(
-                    source_neo4j_id,
-                    target_neo4j_id,
-                    "LEADS_TO",
-                    {"label": edge_data["label"], "confidence": edge_data.get("confidence", 1.0)}
-                )
-
-        # Create response
-        reasoning_chain = ReasoningChain(
+    logger.info(f"Successfully processed and saved prompt for session {session_id}")
+
+    return reasoning_chain, reasoning_data.get("used_fallback", False)
+
+
+@router.post("/compare", response_model=ModelComparison)
+async def compare_models(
+    request: CompareModelsRequest,
+    session_service: SessionService = Depends(get_session_service)
+):
+    """
+    Run one prompt across several models concurrently and diff the results.
+
+    Every chain is stored as its own session (all in one batched write) and
+    diffed against the first model's chain: matched and unmatched thoughts,
+    divergence points and confidence deltas.
+    """
+    specs = request.models or [
+        ModelSpec(provider=provider, model=model)
+        for provider, _, model in (entry.partition(":") for entry in settings.compare_models)
+    ]
+    comparison = ModelComparison(comparison_id=str(uuid.uuid4()), prompt=request.prompt)
+
+    runnable = []
+    for spec in specs:
+        try:
+            runnable.append((spec, get_model_service(spec), str(uuid.uuid4())))
+        except ValueError as e:
+            comparison.failed[f"{spec.provider}:{spec.model}"] = str(e)
+
+    if not runnable:
+        raise HTTPException(status_code=400, detail=f"No comparable models available: {comparison.failed}")
+
+    logger.info(f"Comparing {len(runnable)} models for comparison {comparison.comparison_id}")
+
+    # All provider calls run at once; each one runs in its own worker thread
+    results = await asyncio.gather(
+        *(service.generate_reasoning_chain(prompt=request.prompt, session_id=session_id)
+          for _, service, session_id in runnable),
+        return_exceptions=True
+    )
+
+    created_at = datetime.utcnow().isoformat()
+    to_store = []
+    for (spec, _, session_id), reasoning_data in zip(runnable, results):
+        name = f"{spec.provider}:{spec.model}"
+        if isinstance(reasoning_data, Exception):
+            comparison.failed[name] = str(reasoning_data)
+            continue
+        if reasoning_data.get("used_fallback"):
+            comparison.failed[name] = "Model output could not be used (fallback chain returned)"
+            continue
+
+        comparison.chains.append(ReasoningChain(
             session_id=session_id,
             prompt=request.prompt,
             nodes=reasoning_data["nodes"],
             edges=reasoning_data["edges"],
             status="completed",
-            created_at=datetime.utcnow().isoformat()
+            created_at=created_at,
+            metadata={"provider": spec.provider, "model": spec.model, "comparison_id": comparison.comparison_id}
+        ))
+        to_store.append({
+            "session_id": session_id,
+            "prompt": request.prompt,
+            "reasoning_data": reasoning_data,
+            "extra_props": {"provider": spec.provider, "model": spec.model,
+                            "comparison_id": comparison.comparison_id}
+        })
+
+    if not comparison.chains:
+        raise HTTPException(status_code=502, detail=f"All models failed: {comparison.failed}")
+
+    try:
+        await asyncio.to_thread(session_service.create_sessions, to_store)
+    except Exception as e:
+        logger.error(f"Error storing comparison {comparison.comparison_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to store comparison: {str(e)}")
+
+    baseline = comparison.chains[0]
+    comparison.diffs = await asyncio.to_thread(
+        lambda: [diff_service.diff(baseline, other) for other in comparison.chains[1:]]
+    )
+    return comparison
+
+
+@router.get("/session/{session_id}", response_model=Union[ReasoningChain, CompactReasoningChain])
+async def get_reasoning_session(
+    session_id: str,
+    layout_mode: Optional[LayoutMode] = Query(
+        None, description="Layout to include (default: force; hierarchical for format=compact)"
+    ),
+    format: WireFormat = Query(WireFormat.FULL, description="compact = columnar encoding for large chains"),
+    session_service: SessionService = Depends(get_session_service)
+):
+    """
+    Retrieve a reasoning chain by session ID.
+
+    Works for branches too: the branch's own changes are merged over the
+    thoughts it shares with its ancestors in a single graph traversal.
+    The chain includes a layout for the requested mode. Layouts are cached
+    on the session per graph version, so repeat fetches don't recompute.
+
+    With format=compact the chain comes back as parallel columns with
+    interned strings and integer edge endpoints (see CompactReasoningChain).
+    Compact chains default to the hierarchical layout, and only include a
+    force layout if one is already cached for the current version.
+    """
+    if format == WireFormat.COMPACT:
+        chain = await asyncio.to_thread(
+            session_service.load_compact, session_id, layout_mode or LayoutMode.HIERARCHICAL
         )
+    else:
+        chain = await asyncio.to_thread(session_service.load_chain, session_id, layout_mode or LayoutMode.FORCE)
+    if chain is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return chain
 
-        logger.info(f"Successfully processed and saved prompt for session {session_id}")
 
-        return reasoning_chain
+@router.get("/session/{session_id}/nodes", response_model=CompactReasoningChain)
+async def get_session_window(
+    session_id: str,
+    offset: int = Query(0, ge=0, description="Global index of the first node (next_offset of the previous window)"),
+    max_nodes: int = Query(1000, ge=1, le=20000, description="Window size"),
+    start_depth: Optional[int] = Query(None, ge=0, description="Jump to the first node at this depth instead of offset"),
+    version: Optional[int] = Query(None, description="Version of the windows fetched so far; 409 if it changed"),
+    layout_mode: Optional[LayoutMode] = Query(
+        None, description="Include layout columns (hierarchical; force only if already cached)"
+    ),
+    session_service: SessionService = Depends(get_session_service)
+):
+    """
+    Load a large chain progressively, one window of nodes at a time, in
+    topological depth order (roots first) and in the compact format.
 
-    except Exception as e:
-        logger.error(f"Error processing prompt: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to process prompt: {str(e)}"
+    Start at offset 0, then request next_offset until it is null, passing
+    the version from the first window. Edge endpoints are global node
+    indices, so windows can be appended as they arrive.
+    """
+    try:
+        window = await asyncio.to_thread(
+            lambda: session_service.load_compact(session_id, layout_mode, offset=offset, max_nodes=max_nodes,
+                                                 start_depth=start_depth, expected_version=version)
         )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
+    if window is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return window
 
-@router.get("/session/{session_id}", response_model=ReasoningChain)
-async def get_reasoning_session(session_id: str):
+
+@router.post("/session/{session_id}/branch", response_model=ReasoningChain)
+async def create_branch(
+    session_id: str,
+    request: CreateBranchRequest,
+    session_service: SessionService = Depends(get_session_service)
+):
     """
-    Retrieve a reasoning chain by session ID.
+    Branch an alternate reasoning path off a session (or off another branch).
 
-    Note: In this MVP version, we return a not found error.
-    In Phase 1.5, we'll add Neo4j persistence to store and retrieve sessions.
+    Only the thoughts and edges that differ from the parent are stored, so
+    forking costs the size of the change, not the size of the chain.
+    Returns the new branch resolved as a full reasoning chain; its
+    session_id is the branch ID.
     """
-    raise HTTPException(
-        status_code=404,
-        detail="Session retrieval not yet implemented. Coming in Phase 1.5!"
-    )
+    try:
+        chain = await asyncio.to_thread(session_service.create_branch, session_id, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if chain is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return chain
+
+
+@router.get("/session/{session_id}/layout", response_model=GraphLayout)
+async def get_session_layout(
+    session_id: str,
+    mode: LayoutMode = LayoutMode.FORCE,
+    session_service: SessionService = Depends(get_session_service)
+):
+    """
+    Get node coordinates for a session without the full chain payload.
+
+    Useful when switching between force and hierarchical views.
+    """
+    chain = await asyncio.to_thread(session_service.load_chain, session_id, mode)
+    if chain is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return chain.layout
+
+
+@router.get("/session/{session_id}/changes", response_model=SessionChanges)
+async def get_session_changes(
+    session_id: str,
+    since: int = Query(0, ge=0, description="Last session version the client has applied"),
+    client_id: Optional[str] = Query(None, description="Stable client id; lets the server compact its change log"),
+    session_service: SessionService = Depends(get_session_service)
+):
+    """
+    Delta sync: return only the thoughts and edges added, updated or removed
+    after version `since`.
+
+    Pass the returned `version` as `since` on the next call. If the log has
+    been compacted past `since`, `full_resync` is true and the whole graph
+    is returned in `added_nodes` / `added_edges`.
+    """
+    try:
+        changes = await asyncio.to_thread(session_service.get_changes, session_id, since, client_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if changes is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return changes
 
 
-@router.put("/session/{session_id}/node/{node_id}")
+@router.put("/session/{session_id}/node/{node_id}", response_model=ThoughtNode)
 async def update_node(
     session_id: str,
     node_id: str,
-    update: UpdateNodeRequest
+    update: UpdateNodeRequest,
+    session_service: SessionService = Depends(get_session_service)
 ):
     """
-    Update a thought node and re-run reasoning from that point.
+    Update a thought node's content and confidence.
 
     This is the key innovation: users can edit reasoning steps
     and see how it affects the conclusion!
 
-    Note: Full implementation coming in Phase 2 (Interactive Editing)
+    Each edit bumps the session version and is recorded in the change log,
+    so other clients pick it up via /changes. Re-running reasoning from the
+    edited node is still coming in Phase 2.
     """
-    raise HTTPException(
-        status_code=501,
-        detail="Node editing coming in Phase 2! Stay tuned..."
+    node = await asyncio.to_thread(
+        session_service.update_thought, session_id, node_id, update.content, update.confidence
     )
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"Node {node_id} not found in session {session_id}")
+    return node
 
 
 @router.get("/health")
@@ -1,15 +1,34 @@
-from app.core.config import Settings
+from app.core.config import get_settings
 from app.services.graph_service import GraphService
+from app.services.layout_service import LayoutService
+from app.services.session_service import SessionService
+from app.services.prompt_service import PromptTemplateRegistry
+from app.services.output_repair import ReasoningOutputParser
+from app.services.base_provenance_backend import BaseProvenanceBackend
+from app.services.provenance_service import (
+    PostgresProvenanceBackend,
+    ProvenanceWriter,
+    SegmentFileBackend
+)
 from typing import Generator, Optional
+import asyncio
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
-# Global settings instance
-settings = Settings()
+# Shared settings instance
+settings = get_settings()
 
 # Global graph service instance (lazy-initialized)
 _graph_service: Optional[GraphService] = None
+_session_service: Optional[SessionService] = None
+_provenance_writer: Optional[ProvenanceWriter] = None
+_prompt_registry: Optional[PromptTemplateRegistry] = None
+_output_parser: Optional[ReasoningOutputParser] = None
+
+# Guards singleton creation; services are requested from worker threads too
+_init_lock = threading.Lock()
 
 
 def get_graph_service() -> GraphService:
@@ -20,19 +39,108 @@ def get_graph_service() -> GraphService:
     global _graph_service
 
     if _graph_service is None:
-        logger.info(f"Initializing Neo4j connection to {settings.neo4j_uri}")
-        _graph_service = GraphService(
-            uri=settings.neo4j_uri,
-            user=settings.neo4j_user,
-            password=settings.neo4j_password.get_secret_value()
-        )
+        with _init_lock:
+            if _graph_service is None:
+                logger.info(f"Initializing Neo4j connection to {settings.neo4j_uri}")
+                _graph_service = GraphService(
+                    uri=settings.neo4j_uri,
+                    user=settings.neo4j_user,
+                    password=settings.neo4j_password.get_secret_value()
+                )
 
     return _graph_service
 
 
-async def test_neo4j_connection() -> dict:
+def get_session_service() -> SessionService:
+    """
+    Get or create the session service (session persistence and layout caching).
+    Shares the singleton graph service connection.
+    """
+    global _session_service
+
+    if _session_service is None:
+        graph = get_graph_service()
+        with _init_lock:
+            if _session_service is None:
+                _session_service = SessionService(
+                    graph,
+                    LayoutService(),
+                    sync_cursor_ttl_seconds=settings.sync_cursor_ttl_seconds
+                )
+
+    return _session_service
+
+
+def get_provenance_writer() -> Optional[ProvenanceWriter]:
+    """
+    Get or create the provenance writer for raw LLM exchanges.
+    Returns None when provenance logging is disabled.
+    """
+    global _provenance_writer
+
+    if not settings.provenance_enabled:
+        return None
+
+    if _provenance_writer is None:
+        with _init_lock:
+            if _provenance_writer is None:
+                backend: BaseProvenanceBackend
+                if settings.provenance_backend == "postgres":
+                    if settings.provenance_postgres_dsn is None:
+                        raise ValueError("PROVENANCE_POSTGRES_DSN must be set for the postgres provenance backend")
+                    backend = PostgresProvenanceBackend(
+                        dsn=settings.provenance_postgres_dsn.get_secret_value(),
+                        segment_seconds=settings.provenance_segment_seconds
+                    )
+                else:
+                    backend = SegmentFileBackend(
+                        directory=settings.provenance_dir,
+                        segment_seconds=settings.provenance_segment_seconds
+                    )
+                logger.info(f"Provenance log using {settings.provenance_backend} backend")
+                _provenance_writer = ProvenanceWriter(
+                    backend,
+                    batch_size=settings.provenance_batch_size,
+                    flush_interval_seconds=settings.provenance_flush_interval_seconds,
+                    retention_days=settings.provenance_retention_days
+                )
+
+    return _provenance_writer
+
+
+def get_prompt_registry() -> PromptTemplateRegistry:
+    """
+    Get or create the prompt template registry shared by every LLM service,
+    so token and latency stats are collected in one place.
+    """
+    global _prompt_registry
+
+    if _prompt_registry is None:
+        with _init_lock:
+            if _prompt_registry is None:
+                _prompt_registry = PromptTemplateRegistry()
+
+    return _prompt_registry
+
+
+def get_output_parser() -> ReasoningOutputParser:
+    """
+    Get or create the tolerant output parser shared by every LLM service,
+    so repair and salvage rates are collected in one place.
     """
-    Test the Neo4j database connection.
+    global _output_parser
+
+    if _output_parser is None:
+        with _init_lock:
+            if _output_parser is None:
+                _output_parser = ReasoningOutputParser()
+
+    return _output_parser
+
+
+def check_neo4j_connection() -> dict:
+    """
+    Test the Neo4j database connection (blocking).
     Returns connection status and basic info.
     """
     try:
@@ -58,9 +166,32 @@ async def test_neo4j_connection() -> dict:
         }
 
 
+async def test_neo4j_connection() -> dict:
+    """
+    Test the Neo4j database connection without blocking the event loop.
+    Returns connection status and basic info.
+    """
+    return await asyncio.to_thread(check_neo4j_connection)
+
+
+def warm_up_graph_service() -> None:
+    """
+    Open the configured number of pooled Neo4j connections ahead of the
+    first request. Failures are logged, not raised: warm-up is best effort.
+    """
+    try:
+        graph = get_graph_service()
+        opened = graph.warm_up(settings.neo4j_warm_connections)
+        logger.info(f"Neo4j connection pool warmed with {opened} connections")
+        graph.ensure_indexes()
+    except Exception as e:
+        logger.warning(f"Neo4j pool warm-up failed: {e}")
+
+
 def close_graph_service():
     """Close the graph service connection on shutdown"""
-    global _graph_service
+    global _graph_service, _session_service
+    _session_service = None
     if _graph_service is not None:
         _graph_service.close()
         _graph_service = None
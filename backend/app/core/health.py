@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Statuses a dependency check may report that count as "ready"
+HEALTHY_STATUSES = {"connected", "ok"}
+
+
+class DependencyProbe:
+    """
+    Cached readiness probe for external dependencies.
+
+    Checks are blocking callables returning a dict with a "status" key
+    (e.g. check_neo4j_connection). They run in worker threads on a fixed
+    interval in the background, so /readyz and /health only read the last
+    result instead of hitting the database on every poll.
+
+    A check that takes longer than `timeout_seconds` is reported as
+    "timeout"; its thread is left to finish and is not started again until
+    it has. Results older than `max_age_seconds` (the refresh loop stalled
+    or stopped) no longer count as ready.
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], dict]], interval_seconds: float = 10.0,
+                 timeout_seconds: float = 5.0, max_age_seconds: Optional[float] = None):
+        """
+        Args:
+            checks: Dependency name -> blocking check function
+            interval_seconds: Delay between background refreshes
+            timeout_seconds: How long one refresh waits for a check
+            max_age_seconds: Age after which a result is stale
+                (default: two intervals plus the timeout)
+        """
+        self.checks = checks
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        if max_age_seconds is None:
+            max_age_seconds = 2 * interval_seconds + timeout_seconds
+        self.max_age_seconds = max_age_seconds
+        self._results: Dict[str, dict] = {}
+        self._checked_at: Optional[datetime] = None
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def stale(self) -> bool:
+        """True if there is no result yet or the last one is older than max_age_seconds."""
+        return (
+            self._checked_at is None
+            or datetime.utcnow() - self._checked_at > timedelta(seconds=self.max_age_seconds)
+        )
+
+    @property
+    def ready(self) -> bool:
+        """True if every dependency reported healthy in a recent enough check."""
+        return (
+            not self.stale
+            and all(self._results.get(name, {}).get("status") in HEALTHY_STATUSES for name in self.checks)
+        )
+
+    def result(self, name: str) -> dict:
+        """Last cached result for one dependency."""
+        return self._results.get(name, {"status": "unknown"})
+
+    def snapshot(self) -> dict:
+        """Cached probe state, suitable for returning from a health endpoint."""
+        return {
+            "ready": self.ready,
+            "stale": self.stale,
+            "checked_at": self._checked_at.isoformat() if self._checked_at else None,
+            "checks": {name: self.result(name) for name in self.checks}
+        }
+
+    async def refresh(self) -> dict:
+        """Run all checks concurrently in worker threads and cache the results."""
+        for name, check in self.checks.items():
+            # A check still hung from an earlier refresh is awaited again, not restarted
+            if name not in self._pending:
+                self._pending[name] = asyncio.create_task(asyncio.to_thread(check))
+        await asyncio.wait(self._pending.values(), timeout=self.timeout_seconds)
+
+        for name in list(self._pending):
+            task = self._pending[name]
+            if not task.done():
+                result = {"status": "timeout", "error": f"No response within {self.timeout_seconds}s"}
+            else:
+                del self._pending[name]
+                if task.exception() is not None:
+                    result = {"status": "error", "error": str(task.exception())}
+                else:
+                    result = task.result()
+            self._results[name] = result
+        self._checked_at = datetime.utcnow()
+        return self.snapshot()
+
+    def start(self) -> None:
+        """Start refreshing in the background (returns immediately)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background refresh loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Dependency probe refresh failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReused(ValueError):
+    """An Idempotency-Key was sent again with a different request body."""
+
+
+class _Entry:
+    def __init__(self, fingerprint: str, task: asyncio.Task):
+        self.fingerprint = fingerprint
+        self.task = task
+        # No expiry while in flight; the TTL starts when the task finishes
+        self.expires_at = math.inf
+
+
+class IdempotencyStore:
+    """
+    Bounded in-memory store mapping Idempotency-Key headers to the work
+    they started.
+
+    The first request with a key runs the work as its own task, so it
+    completes even if that client gives up. A retry while it is still
+    running awaits the same task; a retry after it finished gets the
+    stored result. Failed work is forgotten so a retry can try again.
+    Entries expire `ttl_seconds` after completion (checked on lookup), and
+    the least recently used completed entries are dropped beyond
+    `max_entries`. In-flight entries are never evicted, so the store may
+    briefly exceed `max_entries` while that many requests are running.
+
+    All methods run on the event loop, so no locking is needed. The store
+    is per process: with several workers, retries only deduplicate when
+    they reach the same worker.
+    """
+
+    def __init__(self, ttl_seconds: float = 86400, max_entries: int = 10000):
+        """
+        Args:
+            ttl_seconds: How long a completed result is kept for replay
+            max_entries: Maximum number of keys held at once
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        work: Callable[[], Awaitable[Any]],
+        keep: Optional[Callable[[Any], bool]] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Run `work` once per key, or attach to / replay an earlier run.
+
+        Args:
+            key: Client-supplied Idempotency-Key
+            fingerprint: Hash of the request body; a reused key must match it
+            work: Coroutine factory doing the actual work
+            keep: Optional predicate on the result; results it rejects are
+                returned but not stored for replay
+
+        Returns:
+            (result, replayed) where replayed is True if this call did not start the work
+
+        Raises:
+            IdempotencyKeyReused: If the key was used for a different request
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyReused(f"Idempotency-Key {key!r} was already used for a different request")
+            self._entries.move_to_end(key)
+            state = "in flight" if not entry.task.done() else "completed"
+            logger.info(f"Idempotency-Key {key!r}: attaching to {state} request")
+            # shield: a retry that disconnects must not cancel the shared work
+            return await asyncio.shield(entry.task), True
+
+        entry = _Entry(fingerprint, asyncio.create_task(work()))
+        self._entries[key] = entry
+        self._evict()
+        entry.task.add_done_callback(lambda task: self._finished(key, entry, keep))
+        return await asyncio.shield(entry.task), False
+
+    def _evict(self) -> None:
+        """Drop the least recently used completed entries beyond max_entries."""
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        # Oldest first; completed entries are the ones with a finite expiry
+        evict = []
+        for key, entry in self._entries.items():
+            if entry.expires_at != math.inf:
+                evict.append(key)
+                if len(evict) == excess:
+                    break
+        for key in evict:
+            del self._entries[key]
+
+    def _finished(self, key: str, entry: _Entry, keep: Optional[Callable[[Any], bool]]) -> None:
+        failed = entry.task.cancelled() or entry.task.exception() is not None
+        if failed or (keep is not None and not keep(entry.task.result())):
+            # Don't pin failures: the next retry runs the work again
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            return
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+        # Catch up on eviction skipped while everything was in flight
+        self._evict()
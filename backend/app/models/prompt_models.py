@@ -0,0 +1,61 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+
+class PromptTemplateStats(BaseModel):
+    """Token and latency totals for one version of a prompt template"""
+    template: str = Field(..., description="Template name")
+    version: str = Field(..., description="Hash of the static prefix; changes whenever the prompt text changes")
+    prefix_chars: int = Field(..., ge=0, description="Length of the static prefix in characters")
+    calls: int = Field(default=0, ge=0)
+    failures: int = Field(default=0, ge=0, description="Calls that ended in the fallback chain")
+    input_tokens: int = Field(default=0, ge=0, description="Prompt tokens reported by providers (includes cached)")
+    cached_input_tokens: int = Field(default=0, ge=0, description="Prompt tokens served from a provider-side cache")
+    output_tokens: int = Field(default=0, ge=0)
+    calls_without_usage: int = Field(default=0, ge=0, description="Calls where the provider reported no token usage")
+    mean_input_tokens: Optional[float] = None
+    mean_output_tokens: Optional[float] = None
+    cache_hit_ratio: Optional[float] = Field(default=None, description="cached_input_tokens / input_tokens")
+    latency_ms_mean: Optional[float] = None
+    latency_ms_p50: Optional[float] = None
+    latency_ms_p95: Optional[float] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "template": "reasoning_chain",
+                "version": "3f2a9c1be07d",
+                "prefix_chars": 3412,
+                "calls": 42,
+                "failures": 1,
+                "input_tokens": 35280,
+                "cached_input_tokens": 30720,
+                "output_tokens": 16800,
+                "calls_without_usage": 0,
+                "mean_input_tokens": 840.0,
+                "mean_output_tokens": 400.0,
+                "cache_hit_ratio": 0.8707,
+                "latency_ms_mean": 2140.5,
+                "latency_ms_p50": 1980.0,
+                "latency_ms_p95": 3400.2
+            }
+        }
+
+
+class PromptStatsResponse(BaseModel):
+    """Per-template stats, one entry per template version seen since startup"""
+    templates: List[PromptTemplateStats] = Field(default_factory=list)
+
+
+class OutputRepairStats(BaseModel):
+    """How often model output needed repair, and how often repair saved a response"""
+    responses: int = Field(default=0, ge=0, description="Model responses parsed")
+    strict_ok: int = Field(default=0, ge=0, description="Responses that needed no repair the strict parser would have rejected")
+    repaired: int = Field(default=0, ge=0, description="Responses with at least one repair applied")
+    salvaged: int = Field(default=0, ge=0, description="Responses that would have hit the fallback chain but were recovered")
+    failed: int = Field(default=0, ge=0, description="Responses that still ended in the fallback chain")
+    continuations: int = Field(default=0, ge=0, description="Continuation requests sent for truncated output")
+    continuations_used: int = Field(default=0, ge=0, description="Continuations that added thoughts or edges")
+    repair_rate: Optional[float] = Field(default=None, description="repaired / responses")
+    salvage_rate: Optional[float] = Field(default=None, description="salvaged / (salvaged + failed)")
+    repairs: Dict[str, int] = Field(default_factory=dict, description="Count of each repair kind applied")
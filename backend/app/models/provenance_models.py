@@ -0,0 +1,50 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+
+class ProvenanceRecord(BaseModel):
+    """One raw exchange with an LLM provider, as it happened"""
+    session_id: str = Field(..., description="Reasoning session the exchange belongs to")
+    provider: str = Field(..., description="LLM provider: openai or gemini")
+    model: str = Field(..., description="Model name sent to the provider")
+    prompt: str = Field(..., description="User prompt that was sent")
+    template: Optional[str] = Field(default=None, description="Prompt template the request was built from")
+    template_version: Optional[str] = Field(default=None, description="Hash of the template's static prefix")
+    raw_response: Optional[str] = Field(default=None, description="Raw text returned by the provider")
+    latency_ms: float = Field(..., ge=0.0, description="Wall-clock time of the provider call")
+    input_tokens: Optional[int] = Field(default=None, description="Prompt tokens reported by the provider")
+    output_tokens: Optional[int] = Field(default=None, description="Completion tokens reported by the provider")
+    cached_input_tokens: Optional[int] = Field(default=None, description="Prompt tokens served from the provider's cache")
+    repairs: List[str] = Field(default_factory=list, description="Kinds of repair applied to the raw output")
+    used_fallback: bool = Field(default=False, description="True if _create_fallback_chain was returned")
+    error: Optional[str] = Field(default=None, description="Error that triggered the fallback, if any")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "session_id": "session_123",
+                "provider": "gemini",
+                "model": "gemini-2.5-flash",
+                "prompt": "Why is the sky blue?",
+                "template": "reasoning_chain",
+                "template_version": "3f2a9c1be07d",
+                "raw_response": "{\"thoughts\": [...], \"edges\": [...]}",
+                "latency_ms": 2140.5,
+                "input_tokens": 812,
+                "output_tokens": 403,
+                "cached_input_tokens": 768,
+                "repairs": [],
+                "used_fallback": False,
+                "error": None,
+                "created_at": "2025-01-01T12:00:00"
+            }
+        }
+
+
+class ProvenanceQueryResponse(BaseModel):
+    """Provenance records matching a time-range query"""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    records: List[ProvenanceRecord] = Field(default_factory=list)
@@ -12,6 +12,18 @@ class ThoughtType(str, Enum):
     CONCLUSION = "conclusion"
 
 
+class LayoutMode(str, Enum):
+    """Layout algorithms the backend can compute for a reasoning graph"""
+    FORCE = "force"
+    HIERARCHICAL = "hierarchical"
+
+
+class WireFormat(str, Enum):
+    """How a reasoning chain is serialized for the client"""
+    FULL = "full"
+    COMPACT = "compact"
+
+
 class ThoughtNode(BaseModel):
     """Represents a single step in the AI's reasoning process"""
     id: str = Field(..., description="Unique identifier for this thought node")
@@ -53,6 +65,37 @@ class ReasoningEdge(BaseModel):
         }
 
 
+class NodePosition(BaseModel):
+    """Precomputed coordinates for a single thought node"""
+    node_id: str = Field(..., description="ID of the positioned thought node")
+    x: float = Field(..., description="Horizontal coordinate")
+    y: float = Field(..., description="Vertical coordinate")
+    layer: Optional[int] = Field(default=None, description="Layer index (hierarchical layouts only)")
+
+
+class GraphLayout(BaseModel):
+    """Node coordinates computed server-side for a reasoning graph"""
+    mode: LayoutMode = Field(..., description="Algorithm used to compute the layout")
+    version: int = Field(..., description="Graph version the layout was computed for")
+    width: float = Field(..., description="Width of the layout bounding box")
+    height: float = Field(..., description="Height of the layout bounding box")
+    positions: List[NodePosition] = Field(default_factory=list)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "mode": "hierarchical",
+                "version": 1,
+                "width": 0.0,
+                "height": 360.0,
+                "positions": [
+                    {"node_id": "node_1", "x": 0.0, "y": 0.0, "layer": 0},
+                    {"node_id": "node_2", "x": 0.0, "y": 120.0, "layer": 1}
+                ]
+            }
+        }
+
+
 class ReasoningChain(BaseModel):
     """Complete reasoning process for a user prompt"""
     session_id: str = Field(..., description="Unique session identifier")
@@ -62,6 +105,8 @@ class ReasoningChain(BaseModel):
     status: str = Field(default="completed", description="Status: active, completed, failed")
     created_at: Optional[str] = None
     metadata: Dict[str, Any] = Field(default_factory=dict)
+    version: int = Field(default=1, description="Graph version of the session")
+    layout: Optional[GraphLayout] = Field(default=None, description="Precomputed node coordinates")
 
     class Config:
         json_schema_extra = {
@@ -75,9 +120,253 @@ class ReasoningChain(BaseModel):
         }
 
 
+class CompactLayout(BaseModel):
+    """Layout columns aligned with a CompactReasoningChain's node columns"""
+    mode: LayoutMode
+    version: int
+    width: float
+    height: float
+    x: List[float] = Field(default_factory=list)
+    y: List[float] = Field(default_factory=list)
+    layer: Optional[List[int]] = Field(default=None, description="Layer index per node (hierarchical only)")
+
+
+class CompactReasoningChain(BaseModel):
+    """
+    Columnar (struct-of-arrays) encoding of a reasoning chain, or of one
+    window of it, for large graphs.
+
+    Node columns are parallel lists ordered by topological depth. Repeated
+    strings (thought types, session IDs, node ID prefixes, edge labels,
+    timestamps) are interned in `strings` and referenced by index; -1 means
+    null. Node IDs are split into an interned prefix (e.g.
+    "<session_id>_node_") and a per-node suffix; the full ID of node i is
+    `strings[node_id_prefix[i]] + node_ids[i]`, or just `node_ids[i]` when
+    the prefix is -1. Edge
+    endpoints are global node indices: node i of this window has global
+    index `offset + i`, so windows fetched one after another can be
+    appended as they arrive. Each edge is sent with the window holding its
+    later endpoint, i.e. once both its nodes are known.
+
+    Windows end on a depth boundary unless a single level is larger than
+    the requested window size.
+    """
+    session_id: str
+    prompt: str
+    status: str = "completed"
+    created_at: Optional[str] = None
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    version: int = Field(..., description="Graph version; pass it back when fetching further windows")
+
+    strings: List[str] = Field(default_factory=list, description="Interned string table")
+    node_ids: List[str] = Field(default_factory=list, description="Node ID suffix after node_id_prefix")
+    node_id_prefix: List[int] = Field(default_factory=list, description="Index into strings, -1 if the ID has no prefix")
+    node_type: List[int] = Field(default_factory=list, description="Index into strings")
+    node_content: List[str] = Field(default_factory=list)
+    node_confidence: List[float] = Field(default_factory=list)
+    node_session: List[int] = Field(default_factory=list, description="Index into strings")
+    node_depth: List[int] = Field(default_factory=list, description="Longest-path depth from the roots")
+    node_created_at: List[int] = Field(default_factory=list, description="Index into strings, -1 if unset")
+    node_metadata: List[Optional[Dict[str, Any]]] = Field(default_factory=list, description="null when empty")
+    edge_source: List[int] = Field(default_factory=list, description="Global node index")
+    edge_target: List[int] = Field(default_factory=list, description="Global node index")
+    edge_label: List[int] = Field(default_factory=list, description="Index into strings")
+    edge_confidence: List[float] = Field(default_factory=list)
+    layout: Optional[CompactLayout] = None
+
+    offset: int = Field(default=0, description="Global index of this window's first node")
+    start_depth: int = Field(default=0, description="Depth of the first node in this window")
+    end_depth: int = Field(default=0, description="Depth of the last node in this window")
+    next_offset: Optional[int] = Field(default=None, description="offset of the next window; null on the last one")
+    total_nodes: int = Field(default=0, description="Nodes in the whole chain")
+    max_depth: int = Field(default=0, description="Deepest level in the whole chain")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "session_id": "session_123",
+                "prompt": "Why is the sky blue?",
+                "status": "completed",
+                "version": 1,
+                "strings": ["session_123_node_", "question", "session_123", "conclusion", "concludes"],
+                "node_ids": ["1", "2"],
+                "node_id_prefix": [0, 0],
+                "node_type": [1, 3],
+                "node_content": ["Why does the sky look blue?", "Rayleigh scattering"],
+                "node_confidence": [0.95, 0.93],
+                "node_session": [2, 2],
+                "node_depth": [0, 1],
+                "node_created_at": [-1, -1],
+                "node_metadata": [{"original_id": "1"}, {"original_id": "2"}],
+                "edge_source": [0],
+                "edge_target": [1],
+                "edge_label": [4],
+                "edge_confidence": [1.0],
+                "offset": 0,
+                "start_depth": 0,
+                "end_depth": 1,
+                "next_offset": None,
+                "total_nodes": 2,
+                "max_depth": 1
+            }
+        }
+
+
+class SessionChanges(BaseModel):
+    """
+    Delta between a client's synced version and the session's current version.
+
+    Thought edits are the only logged mutation, so an incremental delta
+    fills updated_nodes; added_nodes and added_edges carry the whole graph
+    on a full resync.
+    """
+    session_id: str = Field(..., description="Session the changes belong to")
+    since: int = Field(..., description="Version the client had synced to")
+    version: int = Field(..., description="Current session version; pass as `since` next time")
+    full_resync: bool = Field(
+        default=False,
+        description="True if the log was compacted past `since`; added_* then holds the whole graph"
+    )
+    added_nodes: List[ThoughtNode] = Field(default_factory=list)
+    updated_nodes: List[ThoughtNode] = Field(default_factory=list)
+    removed_nodes: List[ThoughtNode] = Field(default_factory=list)
+    added_edges: List[ReasoningEdge] = Field(default_factory=list)
+    updated_edges: List[ReasoningEdge] = Field(default_factory=list)
+    removed_edges: List[ReasoningEdge] = Field(default_factory=list)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "session_id": "session_123",
+                "since": 3,
+                "version": 4,
+                "full_resync": False,
+                "updated_nodes": [{
+                    "id": "node_2",
+                    "type": "retrieval",
+                    "content": "Recall how light scatters in the atmosphere",
+                    "confidence": 0.9,
+                    "session_id": "session_123",
+                    "metadata": {}
+                }]
+            }
+        }
+
+
+class BranchNodeInput(BaseModel):
+    """A thought a branch adds, or replaces in the inherited chain"""
+    id: str = Field(..., description="Node ID; reuse an existing ID to override that thought")
+    type: ThoughtType = Field(..., description="Type of reasoning step")
+    content: str = Field(..., description="The actual thought content")
+    confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence level (0-1)")
+
+
+class CreateBranchRequest(BaseModel):
+    """
+    Fork a session into an alternate reasoning path.
+
+    Only the differences from the parent are sent and stored; everything
+    else is shared with the parent session.
+    """
+    name: Optional[str] = Field(default=None, max_length=200, description="Optional branch label")
+    upsert_nodes: List[BranchNodeInput] = Field(default_factory=list, description="Thoughts to add or override")
+    remove_node_ids: List[str] = Field(default_factory=list, description="Inherited thoughts to drop")
+    add_edges: List[ReasoningEdge] = Field(default_factory=list, description="Edges to add or relabel")
+    remove_edges: List[ReasoningEdge] = Field(
+        default_factory=list, description="Inherited edges to drop (matched by source_id/target_id)"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "Assume Mie scattering dominates",
+                "upsert_nodes": [{
+                    "id": "session_123_node_3",
+                    "type": "reasoning",
+                    "content": "Large particles scatter all wavelengths roughly equally",
+                    "confidence": 0.6
+                }],
+                "remove_node_ids": ["session_123_node_4"],
+                "add_edges": [{
+                    "source_id": "session_123_node_3",
+                    "target_id": "session_123_node_5",
+                    "label": "leads to",
+                    "confidence": 0.7
+                }],
+                "remove_edges": []
+            }
+        }
+
+
+class ThoughtMatch(BaseModel):
+    """A thought in one chain paired with its counterpart in another"""
+    left_id: str = Field(..., description="Thought ID in the baseline chain")
+    right_id: str = Field(..., description="Thought ID in the compared chain")
+    similarity: float = Field(..., description="Combined match score (text, type, depth)")
+    text_similarity: float = Field(..., description="Cosine similarity of the thought texts")
+    type_changed: bool = Field(default=False, description="True if the thought types differ")
+    confidence_delta: float = Field(..., description="Compared confidence minus baseline confidence")
+
+
+class DivergencePoint(BaseModel):
+    """Matched thoughts after which the two chains continue differently"""
+    left_id: str
+    right_id: str
+    left_next: List[str] = Field(default_factory=list, description="Successors in the baseline chain")
+    right_next: List[str] = Field(default_factory=list, description="Successors in the compared chain")
+
+
+class ChainDiff(BaseModel):
+    """Structural and semantic diff between two reasoning chains"""
+    left_session_id: str
+    right_session_id: str
+    matches: List[ThoughtMatch] = Field(default_factory=list)
+    unmatched_left: List[str] = Field(default_factory=list, description="Baseline thoughts with no counterpart")
+    unmatched_right: List[str] = Field(default_factory=list, description="Compared thoughts with no counterpart")
+    divergence_points: List[DivergencePoint] = Field(default_factory=list)
+    structural_similarity: float = Field(default=0.0, description="Edge overlap under the thought matching (0-1)")
+    semantic_similarity: float = Field(default=0.0, description="Match score averaged over the larger chain (0-1)")
+    mean_confidence_delta: float = Field(default=0.0, description="Average confidence change over matched thoughts")
+
+
+class ModelSpec(BaseModel):
+    """An LLM provider and model to run (must be listed in COMPARE_MODELS)"""
+    provider: str = Field(..., description="openai or gemini")
+    model: str = Field(..., description="Provider model name")
+
+
+class CompareModelsRequest(BaseModel):
+    """Run one prompt across several models and diff their reasoning"""
+    prompt: str = Field(..., min_length=1, max_length=2000, description="User's question or prompt")
+    models: Optional[List[ModelSpec]] = Field(
+        default=None, description="Models to compare; defaults to the configured compare_models"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "prompt": "Why is the sky blue?",
+                "models": [
+                    {"provider": "gemini", "model": "gemini-2.5-flash"},
+                    {"provider": "openai", "model": "gpt-4o-mini"}
+                ]
+            }
+        }
+
+
+class ModelComparison(BaseModel):
+    """Reasoning chains from several models for one prompt, diffed against the first"""
+    comparison_id: str
+    prompt: str
+    chains: List[ReasoningChain] = Field(default_factory=list, description="One chain per model that ran")
+    diffs: List[ChainDiff] = Field(default_factory=list, description="Each chain diffed against chains[0]")
+    failed: Dict[str, str] = Field(default_factory=dict, description="provider:model -> reason it was skipped")
+
+
 class ProcessPromptRequest(BaseModel):
     """Request to process a user prompt and generate reasoning"""
     prompt: str = Field(..., min_length=1, max_length=2000, description="User's question or prompt")
+    layout_mode: LayoutMode = Field(default=LayoutMode.FORCE, description="Layout to precompute for the graph")
 
     class Config:
         json_schema_extra = {
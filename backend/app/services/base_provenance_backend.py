@@ -0,0 +1,62 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Optional
+import logging
+
+from app.models.provenance_models import ProvenanceRecord
+
+logger = logging.getLogger(__name__)
+
+
+class BaseProvenanceBackend(ABC):
+    """
+    Abstract base class for provenance log storage.
+
+    A provenance log is append-only: records are written in batches and
+    never updated. Storage is organised in time segments so that old data
+    can be dropped a whole segment at a time when it falls out of the
+    retention window.
+
+    Methods are blocking; ProvenanceWriter calls them from worker threads.
+    """
+
+    @abstractmethod
+    def write_batch(self, records: List[ProvenanceRecord]) -> None:
+        """
+        Append a batch of records to the log.
+
+        Args:
+            records: Records to append, in arrival order
+        """
+        pass
+
+    @abstractmethod
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              session_id: Optional[str] = None, limit: int = 100) -> List[ProvenanceRecord]:
+        """
+        Read records in a time range.
+
+        Args:
+            start: Inclusive lower bound on created_at (None = unbounded)
+            end: Exclusive upper bound on created_at (None = unbounded)
+            session_id: Only return exchanges for this session
+            limit: Maximum number of records to return
+
+        Returns:
+            Matching records, oldest first
+        """
+        pass
+
+    @abstractmethod
+    def delete_before(self, cutoff: datetime) -> int:
+        """
+        Delete every segment that ends at or before `cutoff`.
+
+        Returns:
+            int: Number of segments (or rows, for row-based stores) deleted
+        """
+        pass
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+        pass
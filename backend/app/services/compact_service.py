@@ -0,0 +1,191 @@
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from app.models.thought_models import CompactLayout, CompactReasoningChain, GraphLayout, ReasoningChain
+from app.services.layout_service import LayoutService
+
+logger = logging.getLogger(__name__)
+
+
+class ChainIndex:
+    """
+    Depth order of a chain's nodes, computed once per graph version and
+    reused for every window cut from it.
+    """
+
+    def __init__(self, order: np.ndarray, sorted_depths: np.ndarray, edges: np.ndarray):
+        """
+        Args:
+            order: Chain node index of each global position (depth-sorted)
+            sorted_depths: Depth of each global position
+            edges: (E, 4) rows of (later endpoint, source, target, chain edge index)
+                in global positions, sorted by later endpoint
+        """
+        self.order = order
+        self.sorted_depths = sorted_depths
+        self.edges = edges
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+
+class CompactChainEncoder:
+    """
+    Encodes reasoning chains in the columnar wire format, whole or one
+    depth-ordered window at a time.
+
+    Nodes are ordered by topological depth (ties keep chain order), so a
+    client can render a huge graph from the roots down while later
+    windows are still loading.
+    """
+
+    def __init__(self, layout_service: LayoutService):
+        """
+        Args:
+            layout_service: Used for the depth layering (same as the hierarchical layout)
+        """
+        self.layout_service = layout_service
+
+    def index(self, chain: ReasoningChain) -> ChainIndex:
+        """Compute the depth order of a chain (O(N + E); cache the result per graph version)."""
+        node_ids = [node.id for node in chain.nodes]
+        edge_pairs = [(edge.source_id, edge.target_id) for edge in chain.edges]
+        depths = self.layout_service.topological_depths(node_ids, edge_pairs)
+
+        # Stable sort by depth: global position i is the i-th node in this order
+        order = np.lexsort((np.arange(len(node_ids)), depths))
+        position = {node_ids[i]: p for p, i in enumerate(order.tolist())}
+
+        rows = [
+            (max(position[s], position[t]), position[s], position[t], i)
+            for i, (s, t) in enumerate(edge_pairs) if s in position and t in position
+        ]
+        edges = np.array(rows, dtype=np.int64).reshape(-1, 4)
+        edges = edges[np.argsort(edges[:, 0], kind="stable")]
+        return ChainIndex(order, depths[order], edges)
+
+    def encode(
+        self,
+        chain: ReasoningChain,
+        index: Optional[ChainIndex] = None,
+        layout: Optional[GraphLayout] = None,
+        offset: int = 0,
+        max_nodes: Optional[int] = None,
+        start_depth: Optional[int] = None,
+    ) -> CompactReasoningChain:
+        """
+        Encode a chain, or one window of its nodes.
+
+        Args:
+            chain: Chain to encode
+            index: Depth order from index(chain); computed here if not given
+            layout: Layout to encode as columns (default: chain.layout)
+            offset: Global index of the first node to include
+            max_nodes: Window size (None = every node from `offset` on)
+            start_depth: If given, start at the first node at or below this depth
+                instead of at `offset`
+
+        Returns:
+            CompactReasoningChain for the window
+        """
+        if index is None:
+            index = self.index(chain)
+        if layout is None:
+            layout = chain.layout
+        sorted_depths = index.sorted_depths
+        total = len(index)
+
+        if start_depth is not None:
+            offset = int(np.searchsorted(sorted_depths, start_depth, side="left"))
+        offset = min(max(offset, 0), total)
+        end = total if max_nodes is None else min(offset + max_nodes, total)
+        if end < total and end > offset:
+            # Trim a partially included last level, unless it is the only one
+            level_start = int(np.searchsorted(sorted_depths, sorted_depths[end], side="left"))
+            if level_start > offset:
+                end = level_start
+
+        strings: List[str] = []
+        interned: Dict[str, int] = {}
+
+        def intern(value: Optional[str]) -> int:
+            if value is None:
+                return -1
+            if value not in interned:
+                interned[value] = len(strings)
+                strings.append(value)
+            return interned[value]
+
+        window_order = index.order[offset:end].tolist()
+        window = [chain.nodes[i] for i in window_order]
+
+        # IDs look like "<session_id>_node_<n>": send the prefix once, interned
+        id_suffixes: List[str] = []
+        id_prefixes: List[int] = []
+        for node in window:
+            prefix = f"{node.session_id}_node_"
+            if node.id.startswith(prefix) and len(node.id) > len(prefix):
+                id_prefixes.append(intern(prefix))
+                id_suffixes.append(node.id[len(prefix):])
+            else:
+                id_prefixes.append(-1)
+                id_suffixes.append(node.id)
+        result = CompactReasoningChain(
+            session_id=chain.session_id,
+            prompt=chain.prompt,
+            status=chain.status,
+            created_at=chain.created_at,
+            metadata=chain.metadata,
+            version=chain.version,
+            node_ids=id_suffixes,
+            node_id_prefix=id_prefixes,
+            node_type=[intern(node.type.value) for node in window],
+            node_content=[node.content for node in window],
+            node_confidence=[node.confidence for node in window],
+            node_session=[intern(node.session_id) for node in window],
+            node_depth=sorted_depths[offset:end].tolist(),
+            node_created_at=[intern(node.created_at) for node in window],
+            node_metadata=[node.metadata or None for node in window],
+            offset=offset,
+            start_depth=int(sorted_depths[offset]) if end > offset else 0,
+            end_depth=int(sorted_depths[end - 1]) if end > offset else 0,
+            next_offset=end if end < total else None,
+            total_nodes=total,
+            max_depth=int(sorted_depths[-1]) if total else 0,
+        )
+
+        # Each edge goes out with the window that holds its later endpoint
+        first, last = np.searchsorted(index.edges[:, 0], [offset, end], side="left")
+        window_edges = index.edges[first:last]
+        result.edge_source = window_edges[:, 1].tolist()
+        result.edge_target = window_edges[:, 2].tolist()
+        for i in window_edges[:, 3].tolist():
+            edge = chain.edges[i]
+            result.edge_label.append(intern(edge.label))
+            result.edge_confidence.append(edge.confidence)
+
+        # Assigned last: the model keeps its own copy of the list at construction
+        result.strings = strings
+
+        if layout is not None:
+            positions = layout.positions
+            # Layouts are computed in chain node order; fall back to an ID lookup otherwise
+            if len(positions) == len(chain.nodes) and all(positions[i].node_id == chain.nodes[i].id for i in window_order):
+                placed = [positions[i] for i in window_order]
+            else:
+                coordinates = {p.node_id: p for p in positions}
+                placed = [coordinates.get(node.id) for node in window]
+            result.layout = CompactLayout(
+                mode=layout.mode,
+                version=layout.version,
+                width=layout.width,
+                height=layout.height,
+                x=[p.x if p else 0.0 for p in placed],
+                y=[p.y if p else 0.0 for p in placed],
+                layer=[p.layer if p and p.layer is not None else -1 for p in placed]
+                if any(p and p.layer is not None for p in placed) else None,
+            )
+
+        return result
@@ -0,0 +1,230 @@
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+import re
+import zlib
+
+import numpy as np
+
+from app.models.thought_models import ChainDiff, DivergencePoint, ReasoningChain, ThoughtMatch
+from app.services.layout_service import LayoutService
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class GraphDiffService:
+    """
+    Structural and semantic diff between two reasoning chains.
+
+    Thoughts are embedded as hashed TF-IDF bag-of-words vectors (unigrams
+    and bigrams), so all pairwise similarities come from one matrix
+    product. Each pair is scored by text similarity, agreement of thought
+    type and agreement of relative depth in the graph. Thoughts are then
+    matched one-to-one with an optimal assignment (Hungarian algorithm)
+    instead of pairwise Python loops.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 4096,
+        min_similarity: float = 0.25,
+        type_weight: float = 0.15,
+        depth_weight: float = 0.15,
+        layout_service: Optional[LayoutService] = None,
+    ):
+        """
+        Args:
+            dimensions: Size of the hashed feature space
+            min_similarity: Matched pairs scoring below this are reported as unmatched
+            type_weight: Share of the score given to matching thought types
+            depth_weight: Share of the score given to similar relative depth
+            layout_service: Source of the depth layering, shared with the
+                hierarchical layout and the compact windows
+        """
+        self.dimensions = dimensions
+        self.min_similarity = min_similarity
+        self.type_weight = type_weight
+        self.depth_weight = depth_weight
+        self.layout_service = layout_service or LayoutService()
+
+    def diff(self, left: ReasoningChain, right: ReasoningChain) -> ChainDiff:
+        """
+        Compare two chains.
+
+        Args:
+            left: Baseline chain
+            right: Chain compared against the baseline
+
+        Returns:
+            ChainDiff with matched/unmatched thoughts, divergence points,
+            confidence deltas and overall similarity scores
+        """
+        left_ids = [n.id for n in left.nodes]
+        right_ids = [n.id for n in right.nodes]
+        result = ChainDiff(left_session_id=left.session_id, right_session_id=right.session_id)
+        if not left_ids or not right_ids:
+            result.unmatched_left, result.unmatched_right = left_ids, right_ids
+            return result
+
+        text = self._text_similarity(
+            [n.content for n in left.nodes],
+            [n.content for n in right.nodes],
+        )
+        left_types = np.array([n.type.value for n in left.nodes])
+        right_types = np.array([n.type.value for n in right.nodes])
+        same_type = (left_types[:, None] == right_types[None, :]).astype(float)
+        left_depth = self._relative_depth(left)
+        right_depth = self._relative_depth(right)
+        depth_agreement = 1.0 - np.abs(left_depth[:, None] - right_depth[None, :])
+
+        text_weight = 1.0 - self.type_weight - self.depth_weight
+        score = text_weight * text + self.type_weight * same_type + self.depth_weight * depth_agreement
+
+        rows, cols = self._assign(-score)
+        keep = score[rows, cols] >= self.min_similarity
+        rows, cols = rows[keep], cols[keep]
+
+        left_conf = np.array([n.confidence for n in left.nodes])
+        right_conf = np.array([n.confidence for n in right.nodes])
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            result.matches.append(ThoughtMatch(
+                left_id=left_ids[i],
+                right_id=right_ids[j],
+                similarity=round(float(score[i, j]), 4),
+                text_similarity=round(float(text[i, j]), 4),
+                type_changed=bool(left_types[i] != right_types[j]),
+                confidence_delta=round(float(right_conf[j] - left_conf[i]), 4),
+            ))
+
+        matched_left, matched_right = set(rows.tolist()), set(cols.tolist())
+        result.unmatched_left = [left_ids[i] for i in range(len(left_ids)) if i not in matched_left]
+        result.unmatched_right = [right_ids[j] for j in range(len(right_ids)) if j not in matched_right]
+
+        mapping = {left_ids[i]: right_ids[j] for i, j in zip(rows.tolist(), cols.tolist())}
+        result.divergence_points = self._divergence_points(left, right, mapping)
+        result.structural_similarity = round(self._edge_overlap(left, right, mapping), 4)
+        result.semantic_similarity = round(
+            float(score[rows, cols].sum()) / max(len(left_ids), len(right_ids)), 4
+        )
+        if len(rows):
+            result.mean_confidence_delta = round(float((right_conf[cols] - left_conf[rows]).mean()), 4)
+        return result
+
+    def _text_similarity(self, left: List[str], right: List[str]) -> np.ndarray:
+        """Cosine similarity of hashed TF-IDF vectors, as a (len(left), len(right)) matrix."""
+        docs = [self._features(text) for text in left + right]
+        matrix = np.zeros((len(docs), self.dimensions))
+        for row, features in enumerate(docs):
+            if features:
+                np.add.at(matrix[row], features, 1.0)
+
+        document_frequency = (matrix > 0).sum(axis=0)
+        idf = np.log((1 + len(docs)) / (1 + document_frequency)) + 1.0
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+        return matrix[:len(left)] @ matrix[len(left):].T
+
+    def _features(self, text: str) -> List[int]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(gram.encode("utf-8")) % self.dimensions for gram in grams]
+
+    def _relative_depth(self, chain: ReasoningChain) -> np.ndarray:
+        """Longest-path depth of each node from the roots (cycles broken), scaled to [0, 1]."""
+        depth = self.layout_service.topological_depths(
+            [n.id for n in chain.nodes], [(e.source_id, e.target_id) for e in chain.edges]
+        ).astype(float)
+        return depth / depth.max() if len(depth) and depth.max() > 0 else depth
+
+    @staticmethod
+    def _assign(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Minimum-cost one-to-one assignment (Hungarian algorithm with
+        potentials). The inner column scan is vectorized, so the cost is
+        O(n^2 m) NumPy work rather than Python loops over every pair.
+        """
+        transposed = cost.shape[0] > cost.shape[1]
+        if transposed:
+            cost = cost.T
+        n, m = cost.shape
+
+        u = np.zeros(n + 1)
+        v = np.zeros(m + 1)
+        owner = np.zeros(m + 1, dtype=np.int64)  # owner[j] = row assigned to column j (1-based, 0 = none)
+        way = np.zeros(m + 1, dtype=np.int64)
+
+        for i in range(1, n + 1):
+            owner[0] = i
+            j0 = 0
+            min_reduced = np.full(m + 1, np.inf)
+            used = np.zeros(m + 1, dtype=bool)
+            while True:
+                used[j0] = True
+                i0 = owner[j0]
+                free = ~used[1:]
+                reduced = cost[i0 - 1] - u[i0] - v[1:]
+                better = free & (reduced < min_reduced[1:])
+                min_reduced[1:][better] = reduced[better]
+                way[1:][better] = j0
+
+                candidates = np.where(free, min_reduced[1:], np.inf)
+                j1 = int(np.argmin(candidates)) + 1
+                delta = candidates[j1 - 1]
+
+                u[owner[used]] += delta
+                v[used] -= delta
+                min_reduced[1:][free] -= delta
+                j0 = j1
+                if owner[j0] == 0:
+                    break
+
+            while j0:
+                j1 = way[j0]
+                owner[j0] = owner[j1]
+                j0 = j1
+
+        cols = np.flatnonzero(owner[1:])
+        rows = owner[1:][cols] - 1
+        order = np.argsort(rows)
+        rows, cols = rows[order], cols[order]
+        return (cols, rows) if transposed else (rows, cols)
+
+    @staticmethod
+    def _successors(chain: ReasoningChain) -> Dict[str, Set[str]]:
+        successors: Dict[str, Set[str]] = {n.id: set() for n in chain.nodes}
+        for edge in chain.edges:
+            if edge.source_id in successors:
+                successors[edge.source_id].add(edge.target_id)
+        return successors
+
+    def _divergence_points(self, left: ReasoningChain, right: ReasoningChain,
+                           mapping: Dict[str, str]) -> List[DivergencePoint]:
+        """
+        Matched thoughts where the two chains stop agreeing: the thoughts
+        that follow them don't correspond one-to-one.
+        """
+        left_next = self._successors(left)
+        right_next = self._successors(right)
+        points = []
+        for left_id, right_id in mapping.items():
+            mapped_next = {mapping.get(s) for s in left_next.get(left_id, set())}
+            if mapped_next != right_next.get(right_id, set()):
+                points.append(DivergencePoint(
+                    left_id=left_id,
+                    right_id=right_id,
+                    left_next=sorted(left_next.get(left_id, set())),
+                    right_next=sorted(right_next.get(right_id, set())),
+                ))
+        return points
+
+    @staticmethod
+    def _edge_overlap(left: ReasoningChain, right: ReasoningChain, mapping: Dict[str, str]) -> float:
+        """Jaccard overlap of the edge sets once left node IDs are mapped onto right ones."""
+        left_edges = {(mapping.get(e.source_id), mapping.get(e.target_id)) for e in left.edges}
+        left_edges = {e for e in left_edges if None not in e}
+        right_edges = {(e.source_id, e.target_id) for e in right.edges}
+        unmapped_left = len(left.edges) - len(left_edges)
+        union = len(left_edges | right_edges) + unmapped_left
+        return len(left_edges & right_edges) / union if union else 1.0
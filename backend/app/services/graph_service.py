@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, List
 
 from neo4j import GraphDatabase
 from app.services.base_graph_service import BaseGraphService
@@ -33,6 +33,32 @@ class GraphService(BaseGraphService):
         """Clean up the database driver connection."""
         self.driver.close()
 
+    def warm_up(self, connections: int = 1) -> int:
+        """
+        Pre-open pooled connections so the first requests don't pay for
+        TCP/TLS setup and authentication.
+
+        Each explicit transaction holds its own connection until closed, so
+        opening them side by side forces the pool to grow to `connections`.
+
+        Returns:
+            int: Number of connections that were opened
+        """
+        sessions, transactions = [], []
+        try:
+            for _ in range(max(connections, 1)):
+                session = self.driver.session()
+                sessions.append(session)
+                tx = session.begin_transaction()
+                transactions.append(tx)
+                tx.run("RETURN 1").consume()
+            return len(transactions)
+        finally:
+            for tx in transactions:
+                tx.close()
+            for session in sessions:
+                session.close()
+
     def create_node(self, label: str, properties: Dict[str, Any]) -> str:
         """
         Create a new node in Neo4j with automatic ID and timestamp generation.
@@ -123,3 +149,375 @@ class GraphService(BaseGraphService):
         with self.driver.session() as session:
             result = session.run(cypher, from_id=from_id, to_id=to_id, props=props).single()
             return result["c"] > 0
+
+    def update_node(self, node_id: str, properties: Dict[str, Any]) -> bool:
+        """
+        Merge new properties into an existing node.
+
+        Args:
+            node_id: The UUID assigned when the node was created
+            properties: Key-value pairs to set (existing keys are overwritten)
+
+        Returns:
+            bool: True if the node exists and was updated
+        """
+        cypher = """
+        MATCH (n {id: $id})
+        SET n += $props
+        RETURN count(n) AS c
+        """
+
+        with self.driver.session() as session:
+            result = session.run(cypher, id=node_id, props=properties).single()
+            return result["c"] > 0
+
+    def update_session(self, session_id: str, properties: Dict[str, Any]) -> bool:
+        """
+        Merge new properties into a Session node (index lookup by session_id).
+
+        Args:
+            session_id: The reasoning session identifier (not the Neo4j node id)
+            properties: Key-value pairs to set (existing keys are overwritten)
+
+        Returns:
+            bool: True if the session exists and was updated
+        """
+        cypher = """
+        MATCH (s:Session {session_id: $session_id})
+        SET s += $props
+        RETURN count(s) AS c
+        """
+
+        with self.driver.session() as session:
+            result = session.run(cypher, session_id=session_id, props=properties).single()
+            return result["c"] > 0
+
+    def create_sessions(self, sessions: List[Dict[str, Any]]) -> List[str]:
+        """
+        Store one or more complete reasoning sessions in a single query.
+
+        Args:
+            sessions: Dicts with "props" (Session properties, incl. session_id),
+                "thoughts" (ThoughtNode properties, incl. node_id) and
+                "edges" (source_id, target_id, label, confidence)
+
+        Returns:
+            Neo4j ids of the created Session nodes, in input order
+        """
+        now = datetime.utcnow().isoformat()
+        payload = [
+            {
+                "props": {**sess["props"], "id": str(uuid.uuid4()), "created_at": now},
+                "thoughts": [{**t, "id": str(uuid.uuid4()), "created_at": now} for t in sess["thoughts"]],
+                "edges": sess["edges"],
+            }
+            for sess in sessions
+        ]
+
+        cypher = """
+        UNWIND $sessions AS sess
+        CREATE (s:Session)
+        SET s += sess.props
+        WITH s, sess
+        CALL {
+            WITH s, sess
+            UNWIND sess.thoughts AS t
+            CREATE (s)-[:HAS_THOUGHT]->(n:ThoughtNode)
+            SET n += t
+            RETURN count(n) AS thought_count
+        }
+        CALL {
+            WITH sess
+            UNWIND sess.edges AS e
+            MATCH (a:ThoughtNode {session_id: sess.props.session_id, node_id: e.source_id}),
+                  (b:ThoughtNode {session_id: sess.props.session_id, node_id: e.target_id})
+            MERGE (a)-[r:LEADS_TO]->(b)
+            SET r.label = e.label, r.confidence = e.confidence
+            RETURN count(r) AS edge_count
+        }
+        RETURN s.id AS id
+        """
+
+        with self.driver.session() as session:
+            return [rec["id"] for rec in session.run(cypher, sessions=payload)]
+
+    def ensure_indexes(self) -> None:
+        """Create the indexes session lookups rely on (no-op if they exist)."""
+        statements = [
+            "CREATE INDEX session_id_idx IF NOT EXISTS FOR (s:Session) ON (s.session_id)",
+            "CREATE INDEX thought_session_node_idx IF NOT EXISTS FOR (t:ThoughtNode) ON (t.session_id, t.node_id)",
+        ]
+        with self.driver.session() as session:
+            for statement in statements:
+                session.run(statement).consume()
+
+    def get_session_node(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve just the Session node's properties (no thoughts or edges).
+
+        Args:
+            session_id: The reasoning session identifier (not the Neo4j node id)
+
+        Returns:
+            Dictionary of session properties, or None if the session doesn't exist
+        """
+        cypher = """
+        MATCH (s:Session {session_id: $session_id})
+        RETURN s AS session
+        """
+
+        with self.driver.session() as session:
+            rec = session.run(cypher, session_id=session_id).single()
+            return dict(rec["session"]) if rec else None
+
+    def get_session_lineage(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Load a session and every session it was branched from, in one traversal.
+
+        Each level carries only what is stored on that session: a root
+        session holds its full graph, a branch holds its divergent thoughts
+        and edges plus tombstones for removed ones.
+
+        Args:
+            session_id: The reasoning session identifier (not the Neo4j node id)
+
+        Returns:
+            One dict per level with "session", "depth", "thoughts" and "edges"
+            keys, nearest first (depth 0 is the requested session), or None if
+            the session doesn't exist
+        """
+        cypher = """
+        MATCH path = (:Session {session_id: $session_id})-[:BRANCHED_FROM*0..]->(s:Session)
+        WITH s, length(path) AS depth
+        OPTIONAL MATCH (s)-[:HAS_THOUGHT]->(t:ThoughtNode)
+        WITH s, depth, collect(t) AS thoughts
+        OPTIONAL MATCH (a:ThoughtNode {session_id: s.session_id})-[r:LEADS_TO]->(b:ThoughtNode)
+        WITH s, depth, thoughts,
+             collect(CASE WHEN r IS NULL THEN NULL ELSE {
+                 source_id: a.node_id, target_id: b.node_id,
+                 label: r.label, confidence: r.confidence
+             } END) AS edges
+        OPTIONAL MATCH (s)-[:HAS_EDGE]->(e:BranchEdge)
+        WITH s, depth, thoughts, edges, collect(properties(e)) AS branch_edges
+        RETURN s AS session, depth, thoughts, edges + branch_edges AS edges
+        ORDER BY depth
+        """
+
+        with self.driver.session() as session:
+            levels = [
+                {
+                    "session": dict(rec["session"]),
+                    "depth": rec["depth"],
+                    "thoughts": [dict(t) for t in rec["thoughts"]],
+                    "edges": [dict(e) for e in rec["edges"]],
+                }
+                for rec in session.run(cypher, session_id=session_id)
+            ]
+            return levels or None
+
+    def create_branch(self, parent_session_id: str, session_props: Dict[str, Any],
+                      thoughts: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Create a branch Session linked to its parent, with only its divergent
+        thoughts and edges, in a single query.
+
+        Args:
+            parent_session_id: Session the branch forks from
+            session_props: Properties of the branch Session node (incl. tombstones)
+            thoughts: ThoughtNode properties the branch adds or overrides
+            edges: BranchEdge properties the branch adds or overrides
+
+        Returns:
+            Neo4j id of the branch Session node, or None if the parent doesn't exist
+        """
+        now = datetime.utcnow().isoformat()
+        props = {**session_props, "id": str(uuid.uuid4()), "created_at": now}
+        thoughts = [{**t, "id": str(uuid.uuid4()), "created_at": now} for t in thoughts]
+        edges = [{**e, "id": str(uuid.uuid4()), "created_at": now} for e in edges]
+
+        cypher = """
+        MATCH (p:Session {session_id: $parent_session_id})
+        CREATE (b:Session)-[:BRANCHED_FROM]->(p)
+        SET b += $props
+        FOREACH (t IN $thoughts | CREATE (b)-[:HAS_THOUGHT]->(n:ThoughtNode) SET n += t)
+        FOREACH (e IN $edges | CREATE (b)-[:HAS_EDGE]->(x:BranchEdge) SET x += e)
+        RETURN b.id AS id
+        """
+
+        with self.driver.session() as session:
+            rec = session.run(cypher, parent_session_id=parent_session_id, props=props,
+                              thoughts=thoughts, edges=edges).single()
+            return rec["id"] if rec else None
+
+    def get_thought(self, session_id: str, node_id: str) -> Optional[Dict[str, Any]]:
+        """Return a ThoughtNode stored on this exact session (not inherited), or None."""
+        cypher = """
+        MATCH (t:ThoughtNode {session_id: $session_id, node_id: $node_id})
+        RETURN t AS node
+        """
+
+        with self.driver.session() as session:
+            rec = session.run(cypher, session_id=session_id, node_id=node_id).single()
+            return dict(rec["node"]) if rec else None
+
+    def add_thought(self, session_id: str, properties: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Store a ThoughtNode on a session (e.g. a branch's copy-on-write override).
+
+        Returns:
+            The stored node's properties, or None if the session doesn't exist
+        """
+        props = {**properties, "session_id": session_id, "id": str(uuid.uuid4()),
+                 "created_at": datetime.utcnow().isoformat()}
+        cypher = """
+        MATCH (s:Session {session_id: $session_id})
+        CREATE (s)-[:HAS_THOUGHT]->(t:ThoughtNode)
+        SET t += $props
+        RETURN t AS node
+        """
+
+        with self.driver.session() as session:
+            rec = session.run(cypher, session_id=session_id, props=props).single()
+            return dict(rec["node"]) if rec else None
+
+    def copy_thought_to_branches(self, session_id: str, properties: Dict[str, Any]) -> int:
+        """
+        Give each direct branch of a session its own copy of a thought it
+        currently inherits, so a following edit to the session doesn't leak
+        into the branches. Branches that override or removed the thought are skipped.
+
+        Args:
+            session_id: Session about to be edited
+            properties: The thought's current (pre-edit) properties; must include node_id
+
+        Returns:
+            int: Number of branches that received a copy
+        """
+        props = {k: v for k, v in properties.items() if k not in ("id", "session_id", "created_at")}
+        cypher = """
+        MATCH (:Session {session_id: $session_id})<-[:BRANCHED_FROM]-(c:Session)
+        WHERE NOT (c)-[:HAS_THOUGHT]->(:ThoughtNode {node_id: $node_id})
+          AND NOT $node_id IN coalesce(c.removed_node_ids, [])
+        CREATE (c)-[:HAS_THOUGHT]->(t:ThoughtNode)
+        SET t += $props, t.session_id = c.session_id, t.id = randomUUID(), t.created_at = $now
+        RETURN count(t) AS c
+        """
+
+        with self.driver.session() as session:
+            result = session.run(cypher, session_id=session_id, node_id=props["node_id"], props=props,
+                                 now=datetime.utcnow().isoformat()).single()
+            return result["c"]
+
+    def update_thought(self, session_id: str, node_id: str, properties: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Update a ThoughtNode addressed by its session and reasoning node id.
+
+        Returns:
+            The node's properties after the update, or None if it doesn't exist
+        """
+        cypher = """
+        MATCH (t:ThoughtNode {session_id: $session_id, node_id: $node_id})
+        SET t += $props
+        RETURN t AS node
+        """
+
+        with self.driver.session() as session:
+            rec = session.run(cypher, session_id=session_id, node_id=node_id, props=properties).single()
+            return dict(rec["node"]) if rec else None
+
+    def append_session_changes(self, session_id: str, changes: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Bump a session's graph version and append change log entries for it.
+
+        The version increment and the log writes happen in one query, so
+        concurrent writers always get distinct, monotonically increasing versions.
+
+        Args:
+            session_id: Reasoning session identifier
+            changes: Entries with "op", "kind", "entity_id" and "payload" keys
+
+        Returns:
+            The new session version, or None if the session doesn't exist
+        """
+        cypher = """
+        MATCH (s:Session {session_id: $session_id})
+        SET s.version = coalesce(s.version, 1) + 1
+        WITH s
+        UNWIND $changes AS c
+        CREATE (s)-[:HAS_CHANGE]->(:Change {
+            version: s.version, op: c.op, kind: c.kind,
+            entity_id: c.entity_id, payload: c.payload
+        })
+        RETURN DISTINCT s.version AS version
+        """
+
+        with self.driver.session() as session:
+            rec = session.run(cypher, session_id=session_id, changes=changes).single()
+            return rec["version"] if rec else None
+
+    def get_session_changes(self, session_id: str, since: int) -> List[Dict[str, Any]]:
+        """Return change log entries newer than `since`, oldest first."""
+        cypher = """
+        MATCH (:Session {session_id: $session_id})-[:HAS_CHANGE]->(c:Change)
+        WHERE c.version > $since
+        RETURN c AS change
+        ORDER BY c.version
+        """
+
+        with self.driver.session() as session:
+            return [dict(rec["change"]) for rec in session.run(cypher, session_id=session_id, since=since)]
+
+    def advance_sync_cursor(self, session_id: str, client_id: str, version: int,
+                            now: float, ttl_seconds: float) -> Optional[Dict[str, int]]:
+        """
+        Record that a client has synced to `version`, drop cursors not seen for
+        `ttl_seconds`, and delete change log entries every remaining client has
+        applied, all in one query.
+
+        Each client's cursor is a SyncCursor node hanging off the Session. The
+        query writes the Session first, which holds its lock until commit, so
+        concurrent polls on one session serialize instead of overwriting each
+        other's cursors.
+
+        Args:
+            session_id: Reasoning session identifier
+            client_id: Stable client identifier
+            version: Version the client has now applied
+            now: Current time (epoch seconds)
+            ttl_seconds: Cursors last seen longer ago than this are removed
+
+        Returns:
+            {"compacted_version": ..., "removed": ...} if the log was compacted,
+            {} if not, or None if the session doesn't exist
+        """
+        cypher = """
+        MATCH (s:Session {session_id: $session_id})
+        SET s.cursors_updated_at = $now
+        MERGE (s)-[:HAS_SYNC_CURSOR]->(cursor:SyncCursor {client_id: $client_id})
+        SET cursor.version = CASE WHEN cursor.version > $version THEN cursor.version ELSE $version END,
+            cursor.seen_at = $now
+        WITH s
+        OPTIONAL MATCH (s)-[:HAS_SYNC_CURSOR]->(stale:SyncCursor)
+        WHERE stale.seen_at < $now - $ttl
+        DETACH DELETE stale
+        WITH DISTINCT s
+        MATCH (s)-[:HAS_SYNC_CURSOR]->(cursor:SyncCursor)
+        WITH s, min(cursor.version) AS synced_by_all
+        WITH s, synced_by_all, synced_by_all > coalesce(s.compacted_version, 0) AS compact
+        FOREACH (_ IN CASE WHEN compact THEN [1] ELSE [] END |
+            SET s.compacted_version = synced_by_all)
+        WITH s, synced_by_all, compact
+        OPTIONAL MATCH (s)-[:HAS_CHANGE]->(c:Change)
+        WHERE compact AND c.version <= synced_by_all
+        DETACH DELETE c
+        RETURN compact, synced_by_all, count(c) AS removed
+        """
+
+        with self.driver.session() as session:
+            rec = session.run(cypher, session_id=session_id, client_id=client_id, version=version,
+                              now=now, ttl=ttl_seconds).single()
+            if rec is None:
+                return None
+            if not rec["compact"]:
+                return {}
+            return {"compacted_version": rec["synced_by_all"], "removed": rec["removed"]}
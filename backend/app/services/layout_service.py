@@ -0,0 +1,409 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import math
+
+import numpy as np
+
+from app.models.thought_models import GraphLayout, LayoutMode, NodePosition
+
+logger = logging.getLogger(__name__)
+
+
+class LayoutService:
+    """
+    Computes node coordinates for reasoning graphs on the server.
+
+    Two layouts are supported:
+    - force: Fruchterman-Reingold style force-directed layout, with
+      repulsion approximated by a vectorized Barnes-Hut quadtree
+    - hierarchical: Sugiyama-style layered layout (cycle removal,
+      longest-path layering, barycenter crossing reduction)
+
+    All heavy lifting is done with NumPy arrays so large branched or
+    merged graphs can be laid out without per-node Python loops.
+
+    Layouts are computed inline on a cache miss, so the force simulation
+    is kept to a bounded cost: its iteration count shrinks as the graph
+    grows, and graphs above `max_force_nodes` get the (much cheaper)
+    hierarchical layout instead.
+    """
+
+    def __init__(
+        self,
+        iterations: int = 300,
+        full_iteration_nodes: int = 100,
+        min_iterations: int = 30,
+        max_force_nodes: int = 1000,
+        theta: float = 0.8,
+        brute_force_threshold: int = 256,
+        node_spacing: float = 160.0,
+        layer_spacing: float = 120.0,
+        crossing_sweeps: int = 8,
+        seed: int = 42,
+    ):
+        """
+        Initialize the layout service.
+
+        Args:
+            iterations: Number of force simulation steps for small graphs
+            full_iteration_nodes: Graphs up to this size get all `iterations`;
+                above it the count falls off as 1/n
+            min_iterations: Lower bound on the scaled iteration count
+            max_force_nodes: Above this node count FORCE requests are served
+                with the hierarchical layout (the returned mode says so)
+            theta: Barnes-Hut opening angle (lower = more accurate, slower)
+            brute_force_threshold: Below this node count repulsion is computed exactly
+            node_spacing: Ideal edge length / horizontal gap between nodes
+            layer_spacing: Vertical gap between layers in hierarchical mode
+            crossing_sweeps: Number of down/up barycenter sweeps
+            seed: Random seed so layouts are reproducible across requests
+        """
+        self.iterations = iterations
+        self.full_iteration_nodes = full_iteration_nodes
+        self.min_iterations = min_iterations
+        self.max_force_nodes = max_force_nodes
+        self.theta = theta
+        self.brute_force_threshold = brute_force_threshold
+        self.node_spacing = node_spacing
+        self.layer_spacing = layer_spacing
+        self.crossing_sweeps = crossing_sweeps
+        self.seed = seed
+
+    def compute_layout(
+        self,
+        node_ids: Sequence[str],
+        edges: Sequence[Tuple[str, str]],
+        mode: LayoutMode = LayoutMode.FORCE,
+        version: int = 1,
+    ) -> GraphLayout:
+        """
+        Compute coordinates for every node in a graph.
+
+        Args:
+            node_ids: IDs of the nodes to position
+            edges: (source_id, target_id) pairs; edges to unknown nodes are ignored
+            mode: Layout algorithm to use
+            version: Graph version the layout is computed for
+
+        Returns:
+            GraphLayout with one position per node, centered on the origin
+        """
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        pairs = [(index[s], index[t]) for s, t in edges if s in index and t in index and s != t]
+        edge_array = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+        if mode == LayoutMode.FORCE and len(node_ids) > self.max_force_nodes:
+            logger.info(f"{len(node_ids)} nodes exceeds max_force_nodes={self.max_force_nodes}; "
+                        f"using the hierarchical layout")
+            mode = LayoutMode.HIERARCHICAL
+
+        layers: Optional[np.ndarray] = None
+        if len(node_ids) == 0:
+            pos = np.zeros((0, 2))
+        elif mode == LayoutMode.HIERARCHICAL:
+            pos, layers = self._hierarchical(len(node_ids), edge_array)
+        else:
+            pos = self._force_directed(len(node_ids), edge_array)
+
+        if len(pos):
+            pos = pos - (pos.min(axis=0) + pos.max(axis=0)) / 2.0
+            width, height = (pos.max(axis=0) - pos.min(axis=0)).tolist()
+        else:
+            width, height = 0.0, 0.0
+
+        positions = [
+            NodePosition(
+                node_id=node_id,
+                x=round(float(pos[i, 0]), 2),
+                y=round(float(pos[i, 1]), 2),
+                layer=int(layers[i]) if layers is not None else None,
+            )
+            for i, node_id in enumerate(node_ids)
+        ]
+
+        return GraphLayout(mode=mode, version=version, width=width, height=height, positions=positions)
+
+    def topological_depths(self, node_ids: Sequence[str], edges: Sequence[Tuple[str, str]]) -> np.ndarray:
+        """
+        Longest-path depth of every node from the roots (the same layering as
+        the hierarchical layout; cycles are broken first).
+
+        Args:
+            node_ids: IDs of the nodes
+            edges: (source_id, target_id) pairs; edges to unknown nodes are ignored
+
+        Returns:
+            Integer depth per node, aligned with node_ids
+        """
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        pairs = [(index[s], index[t]) for s, t in edges if s in index and t in index and s != t]
+        edge_array = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        return self._assign_layers(len(node_ids), self._remove_cycles(len(node_ids), edge_array))
+
+    # ------------------------------------------------------------------
+    # Force-directed layout
+    # ------------------------------------------------------------------
+
+    def _force_directed(self, n: int, edges: np.ndarray) -> np.ndarray:
+        """Run a cooled Fruchterman-Reingold simulation and return (n, 2) positions."""
+        rng = np.random.default_rng(self.seed)
+        k = self.node_spacing
+        extent = k * math.sqrt(n)
+        pos = rng.uniform(-extent / 2, extent / 2, size=(n, 2))
+        if n == 1:
+            return np.zeros((1, 2))
+
+        # Each step costs O(n^2) (exact) or O(n log n) (Barnes-Hut), so large
+        # graphs get fewer, larger steps; the cooling schedule adapts to the count
+        iterations = self._iteration_count(n)
+        temperature = extent / 10.0
+        cooling = temperature / (iterations + 1)
+        src, dst = edges[:, 0], edges[:, 1]
+
+        for _ in range(iterations):
+            if n <= self.brute_force_threshold:
+                disp = self._exact_repulsion(pos, k)
+            else:
+                disp = self._barnes_hut_repulsion(pos, k)
+
+            # Attraction along edges: f = d^2 / k
+            if len(edges):
+                delta = pos[src] - pos[dst]
+                dist = np.maximum(np.linalg.norm(delta, axis=1), 1e-6)
+                force = (delta / dist[:, None]) * (dist ** 2 / k)[:, None]
+                for axis in range(2):
+                    disp[:, axis] -= np.bincount(src, weights=force[:, axis], minlength=n)
+                    disp[:, axis] += np.bincount(dst, weights=force[:, axis], minlength=n)
+
+            # Weak gravity keeps disconnected components from drifting apart
+            disp -= pos * 0.01
+
+            length = np.maximum(np.linalg.norm(disp, axis=1), 1e-9)
+            pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+            temperature = max(temperature - cooling, 1e-3)
+
+        return pos
+
+    def _iteration_count(self, n: int) -> int:
+        if n <= self.full_iteration_nodes:
+            return self.iterations
+        scaled = self.iterations * self.full_iteration_nodes // n
+        return max(min(scaled, self.iterations), self.min_iterations)
+
+    @staticmethod
+    def _exact_repulsion(pos: np.ndarray, k: float) -> np.ndarray:
+        """All-pairs repulsion (f = k^2 / d), vectorized; used for small graphs."""
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist2 = np.maximum((delta ** 2).sum(axis=-1), 1e-6)
+        np.fill_diagonal(dist2, np.inf)
+        return (delta * (k * k / dist2)[:, :, None]).sum(axis=1)
+
+    def _barnes_hut_repulsion(self, pos: np.ndarray, k: float) -> np.ndarray:
+        """
+        Approximate repulsion with a Barnes-Hut quadtree.
+
+        The tree is built level by level as sorted arrays of occupied cell
+        keys with their mass and center of mass. Traversal keeps a frontier
+        of (node, cell) pairs for all nodes at once: pairs that satisfy the
+        opening criterion (cell_size / distance < theta) contribute their
+        aggregated force, the rest are expanded into their four children.
+        """
+        n = len(pos)
+        origin = pos.min(axis=0)
+        size = max(float((pos.max(axis=0) - origin).max()), 1e-6) * (1 + 1e-9)
+        max_depth = min(int(math.ceil(math.log(n, 4))) + 2, 16)
+
+        levels = []
+        for level in range(max_depth + 1):
+            cells = 1 << level
+            cell_xy = np.minimum(((pos - origin) / size * cells).astype(np.int64), cells - 1)
+            keys = cell_xy[:, 0] * cells + cell_xy[:, 1]
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            mass = np.bincount(inverse).astype(float)
+            com = np.stack([
+                np.bincount(inverse, weights=pos[:, 0]),
+                np.bincount(inverse, weights=pos[:, 1]),
+            ], axis=1) / mass[:, None]
+            levels.append((keys, unique_keys, mass, com))
+
+        disp = np.zeros_like(pos)
+        node_idx = np.repeat(np.arange(n), 4)
+        cell_key = np.tile(np.arange(4), n)
+
+        for level in range(1, max_depth + 1):
+            own_keys, unique_keys, mass, com = levels[level]
+            slot = np.searchsorted(unique_keys, cell_key)
+            slot = np.minimum(slot, len(unique_keys) - 1)
+            occupied = unique_keys[slot] == cell_key
+            node_idx, cell_key, slot = node_idx[occupied], cell_key[occupied], slot[occupied]
+
+            contains_self = own_keys[node_idx] == cell_key
+            cell_mass = mass[slot]
+            cell_com = com[slot]
+
+            if level == max_depth:
+                # Leaf level: remove the node itself from its own cell's aggregate
+                other_mass = cell_mass - contains_self
+                keep = other_mass > 0
+                cell_com = np.where(
+                    contains_self[:, None],
+                    (cell_com * cell_mass[:, None] - pos[node_idx]) / np.maximum(other_mass, 1)[:, None],
+                    cell_com,
+                )
+                self._accumulate(disp, pos, node_idx[keep], cell_com[keep], other_mass[keep], k)
+                break
+
+            delta = pos[node_idx] - cell_com
+            dist = np.sqrt((delta ** 2).sum(axis=1))
+            width = size / (1 << level)
+            accept = ~contains_self & ((width < self.theta * dist) | (cell_mass == 1))
+            self._accumulate(disp, pos, node_idx[accept], cell_com[accept], cell_mass[accept], k)
+
+            # Open the remaining cells into their four children at the next
+            # level; a cell holding only the node itself has nothing to open
+            expand = ~accept & ~(contains_self & (cell_mass == 1))
+            cells = 1 << level
+            node_idx = np.repeat(node_idx[expand], 4)
+            open_keys = cell_key[expand]
+            cx, cy = open_keys // cells, open_keys % cells
+            child_x = (2 * cx)[:, None] + np.array([0, 0, 1, 1])
+            child_y = (2 * cy)[:, None] + np.array([0, 1, 0, 1])
+            cell_key = (child_x * (cells * 2) + child_y).ravel()
+            if len(node_idx) == 0:
+                break
+
+        return disp
+
+    @staticmethod
+    def _accumulate(
+        disp: np.ndarray,
+        pos: np.ndarray,
+        node_idx: np.ndarray,
+        source: np.ndarray,
+        mass: np.ndarray,
+        k: float,
+    ) -> None:
+        """Add mass-weighted repulsion from aggregated sources to each node's displacement."""
+        if len(node_idx) == 0:
+            return
+        delta = pos[node_idx] - source
+        dist2 = np.maximum((delta ** 2).sum(axis=1), 1e-6)
+        force = delta * (mass * k * k / dist2)[:, None]
+        # bincount is a much faster scatter-add than np.add.at
+        disp[:, 0] += np.bincount(node_idx, weights=force[:, 0], minlength=len(disp))
+        disp[:, 1] += np.bincount(node_idx, weights=force[:, 1], minlength=len(disp))
+
+    # ------------------------------------------------------------------
+    # Hierarchical (Sugiyama-style) layout
+    # ------------------------------------------------------------------
+
+    def _hierarchical(self, n: int, edges: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (n, 2) positions and per-node layer indices for a layered layout."""
+        dag = self._remove_cycles(n, edges)
+        layers = self._assign_layers(n, dag)
+
+        # Split edges spanning several layers with dummy nodes so the
+        # crossing reduction sees every edge as adjacent-layer segments
+        layer_of = list(layers)
+        segments: List[Tuple[int, int]] = []
+        for src, dst in dag:
+            previous = int(src)
+            for layer in range(int(layers[src]) + 1, int(layers[dst])):
+                layer_of.append(layer)
+                segments.append((previous, len(layer_of) - 1))
+                previous = len(layer_of) - 1
+            segments.append((previous, int(dst)))
+
+        layer_of = np.array(layer_of, dtype=np.int64)
+        seg = np.array(segments, dtype=np.int64).reshape(-1, 2)
+        order = self._reduce_crossings(layer_of, seg)
+
+        pos = np.zeros((len(layer_of), 2))
+        for layer in range(int(layer_of.max()) + 1):
+            members = np.flatnonzero(layer_of == layer)
+            ranked = members[np.argsort(order[members], kind="stable")]
+            offsets = (np.arange(len(ranked)) - (len(ranked) - 1) / 2.0) * self.node_spacing
+            pos[ranked, 0] = offsets
+            pos[ranked, 1] = layer * self.layer_spacing
+
+        return pos[:n], layers
+
+    @staticmethod
+    def _remove_cycles(n: int, edges: np.ndarray) -> List[Tuple[int, int]]:
+        """Reverse DFS back edges so the graph becomes acyclic."""
+        adjacency: Dict[int, List[int]] = {i: [] for i in range(n)}
+        for src, dst in edges.tolist():
+            adjacency[src].append(dst)
+
+        state = [0] * n  # 0 = unvisited, 1 = on stack, 2 = done
+        reversed_edges = set()
+        for root in range(n):
+            if state[root]:
+                continue
+            stack = [(root, iter(adjacency[root]))]
+            state[root] = 1
+            while stack:
+                node, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    state[node] = 2
+                    stack.pop()
+                elif state[child] == 1:
+                    reversed_edges.add((node, child))
+                elif state[child] == 0:
+                    state[child] = 1
+                    stack.append((child, iter(adjacency[child])))
+
+        dag = set()
+        for src, dst in edges.tolist():
+            dag.add((dst, src) if (src, dst) in reversed_edges else (src, dst))
+        return sorted(dag)
+
+    @staticmethod
+    def _assign_layers(n: int, dag: List[Tuple[int, int]]) -> np.ndarray:
+        """Longest-path layering over a topological order."""
+        indegree = np.zeros(n, dtype=np.int64)
+        children: Dict[int, List[int]] = {i: [] for i in range(n)}
+        for src, dst in dag:
+            children[src].append(dst)
+            indegree[dst] += 1
+
+        layers = np.zeros(n, dtype=np.int64)
+        frontier = list(np.flatnonzero(indegree == 0))
+        while frontier:
+            node = frontier.pop()
+            for child in children[node]:
+                layers[child] = max(layers[child], layers[node] + 1)
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    frontier.append(child)
+        return layers
+
+    def _reduce_crossings(self, layer_of: np.ndarray, seg: np.ndarray) -> np.ndarray:
+        """
+        Barycenter heuristic: alternately sweep down and up, reordering each
+        layer by the mean position of its neighbours in the adjacent layer.
+        Returns each node's rank within its layer.
+        """
+        total = len(layer_of)
+        order = np.zeros(total)
+        for layer in range(int(layer_of.max()) + 1):
+            members = np.flatnonzero(layer_of == layer)
+            order[members] = np.arange(len(members))
+        if len(seg) == 0:
+            return order
+
+        for sweep in range(self.crossing_sweeps):
+            downward = sweep % 2 == 0
+            # Each segment goes from layer L to L+1; pick which end moves
+            moving, fixed = (seg[:, 1], seg[:, 0]) if downward else (seg[:, 0], seg[:, 1])
+            weight = np.bincount(moving, minlength=total).astype(float)
+            total_rank = np.bincount(moving, weights=order[fixed], minlength=total)
+            barycenter = np.where(weight > 0, total_rank / np.maximum(weight, 1), order)
+
+            for layer in range(int(layer_of.max()) + 1):
+                members = np.flatnonzero(layer_of == layer)
+                ranked = members[np.lexsort((order[members], barycenter[members]))]
+                order[ranked] = np.arange(len(ranked))
+
+        return order
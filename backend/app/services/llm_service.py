@@ -1,9 +1,14 @@
-from openai import OpenAI
-import google.generativeai as genai
-from typing import Dict, List, Optional
-import json
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import logging
+import threading
+import time
 from app.models.thought_models import ThoughtNode, ReasoningEdge, ThoughtType
+from app.models.provenance_models import ProvenanceRecord
+from app.services.output_repair import CONTINUATION_INSTRUCTION, ParsedOutput, ReasoningOutputParser
+from app.services.prompt_service import PromptTemplate, PromptTemplateRegistry
+from app.services.provenance_service import ProvenanceWriter
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +16,12 @@ logger = logging.getLogger(__name__)
 class LLMService:
     """Service for interacting with LLMs to extract reasoning chains"""
 
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", provider: str = "gemini"):
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", provider: str = "gemini",
+                 provenance: Optional[ProvenanceWriter] = None,
+                 prompts: Optional[PromptTemplateRegistry] = None,
+                 context_cache_ttl_seconds: int = 0,
+                 parser: Optional[ReasoningOutputParser] = None,
+                 continuation_max_tokens: int = 1024):
         """
         Initialize the LLM service.
 
@@ -19,14 +29,42 @@ class LLMService:
             api_key: API key (OpenAI or Gemini)
             model: Model to use 
             provider: "openai" or "gemini" (default: gemini)
+            provenance: Optional writer that logs every raw provider exchange
+            prompts: Prompt template registry that also collects per-template stats
+                (default: a private registry with the built-in templates)
+            context_cache_ttl_seconds: Gemini only: keep the system prompt in an
+                explicit context cache for this long (0 = rely on implicit caching)
+            parser: Tolerant output parser that also collects repair stats
+                (default: a private parser)
+            continuation_max_tokens: Output cap for the follow-up request that
+                completes truncated output (0 = never send one)
         """
         self.provider = provider
         self.model = model
+        self.provenance = provenance
+        self.prompts = prompts or PromptTemplateRegistry()
+        self.template: PromptTemplate = self.prompts.get("reasoning_chain")
+        self.context_cache_ttl_seconds = context_cache_ttl_seconds
+        self.parser = parser or ReasoningOutputParser()
+        self.continuation_max_tokens = continuation_max_tokens
 
+        # Provider SDKs are heavy to import (hundreds of ms each), so they are
+        # loaded on first use rather than when the app starts
         if provider == "gemini":
+            import google.generativeai as genai
+
             genai.configure(api_key=api_key)
-            self.client = genai.GenerativeModel(model)
+            self._genai = genai
+            # The static prefix goes in as the system instruction, built once,
+            # so every request starts with the same cacheable tokens
+            self.client = genai.GenerativeModel(model, system_instruction=self.template.system_prompt)
+            self._cached_client = None
+            self._cache_expires_at = 0.0
+            self._context_cache_failed = False
+            self._cache_lock = threading.Lock()
         else:
+            from openai import OpenAI
+
             self.client = OpenAI(api_key=api_key)
 
     async def generate_reasoning_chain(self, prompt: str, session_id: str) -> Dict:
@@ -43,111 +81,83 @@ class LLMService:
         Returns:
             Dict containing nodes and edges of the reasoning chain
         """
+        template = self.template
+        user_text = template.render_user(prompt)
 
-        system_prompt = """You are a reasoning engine that externalizes its thought process.
-
-For any question, output your reasoning as a JSON object with this exact structure:
-{
-  "thoughts": [
-    {"id": "1", "type": "question", "content": "Rephrase the question to understand it", "confidence": 0.9},
-    {"id": "2", "type": "retrieval", "content": "What information do I need?", "confidence": 0.85},
-    {"id": "3", "type": "reasoning", "content": "Apply logic to the information", "confidence": 0.8},
-    {"id": "4", "type": "conclusion", "content": "Final answer", "confidence": 0.9}
-  ],
-  "edges": [
-    {"from": "1", "to": "2", "label": "requires"},
-    {"from": "2", "to": "3", "label": "informs"},
-    {"from": "3", "to": "4", "label": "concludes"}
-  ]
-}
-
-Types available:
-- "question": Understanding/rephrasing the problem
-- "retrieval": Identifying needed information or facts
-- "reasoning": Applying logic, making connections
-- "conclusion": Final answer or result
-
-Rules:
-1. Create 3-7 thought nodes
-2. Be explicit about your reasoning steps
-3. Confidence is 0.0-1.0 (how sure you are of this step)
-4. Each thought should be clear and specific
-5. Edges show how thoughts connect
-6. Content should be detailed enough to understand your thinking
-
-Example for "Why is the sky blue?":
-{
-  "thoughts": [
-    {"id": "1", "type": "question", "content": "The user wants to understand why the sky appears blue to human observers", "confidence": 0.95},
-    {"id": "2", "type": "retrieval", "content": "I need to recall information about light, atmosphere, and scattering", "confidence": 0.9},
-    {"id": "3", "type": "reasoning", "content": "Sunlight contains all colors. When it hits Earth's atmosphere, shorter wavelengths (blue) scatter more than longer wavelengths due to Rayleigh scattering", "confidence": 0.92},
-    {"id": "4", "type": "reasoning", "content": "This scattered blue light comes from all directions in the sky, making it appear blue", "confidence": 0.88},
-    {"id": "5", "type": "conclusion", "content": "The sky appears blue because of Rayleigh scattering - blue light's shorter wavelength causes it to scatter more in the atmosphere than other colors", "confidence": 0.93}
-  ],
-  "edges": [
-    {"from": "1", "to": "2", "label": "requires information"},
-    {"from": "2", "to": "3", "label": "retrieved knowledge"},
-    {"from": "3", "to": "4", "label": "extends reasoning"},
-    {"from": "4", "to": "5", "label": "synthesizes into conclusion"}
-  ]
-}
-
-Now process the user's question and output your reasoning chain."""
+        raw_text = None
+        parsed: Optional[ParsedOutput] = None
+        continued = continuation_used = False
+        input_tokens, output_tokens, cached_tokens = None, None, None
+        started = time.perf_counter()
+        latency_ms = 0.0
 
         try:
             logger.info(f"Generating reasoning chain for prompt: {prompt[:100]}...")
 
-            if self.provider == "gemini":
-                # Gemini API call
-                full_prompt = f"{system_prompt}\n\nUser question: {prompt}"
-                response = self.client.generate_content(
-                    full_prompt,
-                    generation_config=genai.GenerationConfig(
-                        temperature=0.7,
-                        response_mime_type="application/json"
+            response = await self._call_provider([("user", user_text)])
+            latency_ms = (time.perf_counter() - started) * 1000
+            raw_text = self._response_text(response)
+            input_tokens, output_tokens, cached_tokens = self._token_usage(response)
+
+            # Repair rather than reject: one bad field no longer costs the whole response
+            parsed = self.parser.parse(raw_text)
+
+            if parsed.truncated and parsed.thoughts and self.continuation_max_tokens:
+                # Ask for the missing part only, on top of the cached prefix
+                continued = True
+                try:
+                    continuation = await self._call_provider(
+                        [("user", user_text), ("assistant", parsed.to_json()), ("user", CONTINUATION_INSTRUCTION)],
+                        max_tokens=self.continuation_max_tokens
                     )
-                )
-                reasoning_data = json.loads(response.text)
-            else:
-                # OpenAI API call
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"},
-                    temperature=0.7
-                )
-                reasoning_data = json.loads(response.choices[0].message.content)
+                    continuation_text = self._response_text(continuation)
+                    raw_text = f"{raw_text}\n\n[continuation]\n{continuation_text}"
+                    more_in, more_out, more_cached = self._token_usage(continuation)
+                    input_tokens = self._add_tokens(input_tokens, more_in)
+                    output_tokens = self._add_tokens(output_tokens, more_out)
+                    cached_tokens = self._add_tokens(cached_tokens, more_cached)
+                    merged = self.parser.merge(parsed, continuation_text)
+                    continuation_used = (len(merged.thoughts), len(merged.edges)) != (len(parsed.thoughts), len(parsed.edges))
+                    parsed = merged
+                except Exception as e:
+                    logger.warning(f"Continuation request failed, keeping the partial chain: {e}")
+                latency_ms = (time.perf_counter() - started) * 1000
+
+            if not parsed.thoughts:
+                raise ValueError("No usable thoughts in model output")
 
-            # Validate and transform the response
-            nodes = []
-            for thought in reasoning_data.get("thoughts", []):
-                # Create ThoughtNode from the LLM response
-                node = ThoughtNode(
+            nodes = [
+                ThoughtNode(
                     id=f"{session_id}_node_{thought['id']}",
                     type=ThoughtType(thought["type"]),
                     content=thought["content"],
-                    confidence=float(thought["confidence"]),
+                    confidence=thought["confidence"],
                     session_id=session_id,
                     metadata={"original_id": thought["id"]}
                 )
-                nodes.append(node)
+                for thought in parsed.thoughts
+            ]
 
             # Transform edges to use full node IDs
-            edges = []
-            for edge in reasoning_data.get("edges", []):
-                reasoning_edge = ReasoningEdge(
+            edges = [
+                ReasoningEdge(
                     source_id=f"{session_id}_node_{edge['from']}",
                     target_id=f"{session_id}_node_{edge['to']}",
                     label=edge["label"],
-                    confidence=edge.get("confidence", 1.0)
+                    confidence=edge["confidence"]
                 )
-                edges.append(reasoning_edge)
+                for edge in parsed.edges
+            ]
 
+            if parsed.repairs:
+                logger.info(f"Repaired model output for session {session_id}: {dict(parsed.repairs)}")
             logger.info(f"Generated {len(nodes)} thought nodes with {len(edges)} edges")
 
+            self.parser.record(parsed, continued, continuation_used)
+            self.prompts.record(template, latency_ms, input_tokens, output_tokens, cached_tokens)
+            self._record_provenance(session_id, prompt, raw_text, latency_ms, input_tokens, output_tokens,
+                                    cached_tokens, repairs=sorted(parsed.repairs))
+
             return {
                 "nodes": [node.model_dump() for node in nodes],
                 "edges": [edge.model_dump() for edge in edges]
@@ -155,9 +165,145 @@ Now process the user's question and output your reasoning chain."""
 
         except Exception as e:
             logger.error(f"Error generating reasoning chain: {e}")
+            if not latency_ms:
+                latency_ms = (time.perf_counter() - started) * 1000
+            if raw_text is not None:
+                # Only count responses that reached the parser, not provider errors
+                self.parser.record(None, continued, continuation_used)
+            self.prompts.record(template, latency_ms, input_tokens, output_tokens, cached_tokens, failed=True)
+            self._record_provenance(session_id, prompt, raw_text, latency_ms, input_tokens, output_tokens,
+                                    cached_tokens, repairs=sorted(parsed.repairs) if parsed else [],
+                                    used_fallback=True, error=str(e))
             # Return a fallback reasoning chain
             return self._create_fallback_chain(prompt, session_id)
 
+    async def _call_provider(self, turns: List[Tuple[str, str]], max_tokens: Optional[int] = None) -> Any:
+        """
+        Send the template's system prompt followed by `turns` to the provider.
+
+        Args:
+            turns: (role, text) pairs after the system prompt; role is "user" or "assistant"
+            max_tokens: Optional cap on the number of output tokens
+
+        Returns:
+            The provider's raw response object
+        """
+        # SDK calls block, so run them in a worker thread to keep the
+        # event loop free (and let several calls run concurrently)
+        if self.provider == "gemini":
+            # Gemini API call
+            if len(turns) == 1:
+                contents = turns[0][1]
+            else:
+                contents = [{"role": "model" if role == "assistant" else "user", "parts": [text]}
+                            for role, text in turns]
+            return await asyncio.to_thread(self._generate_gemini, contents, max_tokens)
+
+        # OpenAI API call
+        extra = {"max_tokens": max_tokens} if max_tokens else {}
+        return await asyncio.to_thread(
+            self.client.chat.completions.create,
+            model=self.model,
+            messages=[self.template.system_message] + [{"role": role, "content": text} for role, text in turns],
+            response_format={"type": "json_object"},
+            temperature=0.7,
+            **extra
+        )
+
+    def _response_text(self, response: Any) -> str:
+        if self.provider == "gemini":
+            return response.text
+        return response.choices[0].message.content
+
+    def _generate_gemini(self, contents: Any, max_tokens: Optional[int] = None) -> Any:
+        """Blocking Gemini call, through the explicit context cache when one is available."""
+        client = self._gemini_client()
+        try:
+            return client.generate_content(
+                contents,
+                generation_config=self._genai.GenerationConfig(
+                    temperature=0.7,
+                    response_mime_type="application/json",
+                    max_output_tokens=max_tokens
+                )
+            )
+        except Exception:
+            if client is not self.client:
+                # The cache may have been evicted server-side; recreate it next time
+                self._cached_client = None
+            raise
+
+    def _gemini_client(self) -> Any:
+        """
+        Model bound to an explicit context cache holding the system prompt,
+        created on first use and renewed before its TTL runs out.
+
+        Falls back to the plain model (which still benefits from implicit
+        prefix caching) if caching is off or the provider rejects the cache,
+        e.g. because the prefix is under the model's minimum cacheable size.
+        """
+        if not self.context_cache_ttl_seconds or self._context_cache_failed:
+            return self.client
+
+        with self._cache_lock:
+            if self._cached_client is None or time.monotonic() >= self._cache_expires_at:
+                try:
+                    cache = self._genai.caching.CachedContent.create(
+                        model=self.model,
+                        display_name=f"{self.template.name}@{self.template.version}",
+                        system_instruction=self.template.system_prompt,
+                        ttl=timedelta(seconds=self.context_cache_ttl_seconds)
+                    )
+                    self._cached_client = self._genai.GenerativeModel.from_cached_content(cached_content=cache)
+                    # Renew a little early so requests never hit an expired cache
+                    self._cache_expires_at = time.monotonic() + self.context_cache_ttl_seconds * 0.9
+                    logger.info(f"Created Gemini context cache for {self.template.name}@{self.template.version}")
+                except Exception as e:
+                    logger.warning(f"Gemini context caching unavailable for {self.model}, using implicit caching: {e}")
+                    self._context_cache_failed = True
+                    return self.client
+            return self._cached_client
+
+    def _token_usage(self, response: Any) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """Extract (input_tokens, output_tokens, cached_input_tokens) from a provider response, if reported."""
+        if self.provider == "gemini":
+            usage = getattr(response, "usage_metadata", None)
+            return (getattr(usage, "prompt_token_count", None),
+                    getattr(usage, "candidates_token_count", None),
+                    getattr(usage, "cached_content_token_count", None))
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+        return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None), cached
+
+    @staticmethod
+    def _add_tokens(a: Optional[int], b: Optional[int]) -> Optional[int]:
+        return None if a is None and b is None else (a or 0) + (b or 0)
+
+    def _record_provenance(self, session_id: str, prompt: str, raw_text: Optional[str], latency_ms: float,
+                           input_tokens: Optional[int], output_tokens: Optional[int],
+                           cached_input_tokens: Optional[int] = None, repairs: Optional[List[str]] = None,
+                           used_fallback: bool = False, error: Optional[str] = None) -> None:
+        """Hand the exchange to the provenance writer (non-blocking)."""
+        if self.provenance is None:
+            return
+        self.provenance.record(ProvenanceRecord(
+            session_id=session_id,
+            provider=self.provider,
+            model=self.model,
+            prompt=prompt,
+            template=self.template.name,
+            template_version=self.template.version,
+            raw_response=raw_text,
+            latency_ms=latency_ms,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_input_tokens=cached_input_tokens,
+            repairs=repairs or [],
+            used_fallback=used_fallback,
+            error=error
+        ))
+
     def _create_fallback_chain(self, prompt: str, session_id: str) -> Dict:
         """
         Create a simple fallback reasoning chain when LLM fails.
@@ -208,5 +354,6 @@ Now process the user's question and output your reasoning chain."""
 
         return {
             "nodes": [node.model_dump() for node in nodes],
-            "edges": [edge.model_dump() for edge in edges]
+            "edges": [edge.model_dump() for edge in edges],
+            "used_fallback": True
         }
@@ -0,0 +1,398 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import re
+import threading
+
+from app.models.prompt_models import OutputRepairStats
+from app.models.thought_models import ThoughtType
+
+logger = logging.getLogger(__name__)
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_PERCENT_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*%\s*$")
+
+# Near-miss type names models produce, mapped onto ThoughtType
+_TYPE_ALIASES = {
+    ThoughtType.QUESTION: ("question", "questions", "query", "problem", "understanding", "understand",
+                           "clarification", "rephrase", "restatement"),
+    ThoughtType.RETRIEVAL: ("retrieval", "retrieve", "recall", "fact", "facts", "information", "info",
+                            "knowledge", "lookup", "evidence", "observation", "background"),
+    ThoughtType.REASONING: ("reasoning", "reason", "analysis", "analyze", "inference", "deduction",
+                            "logic", "step", "thought", "thinking", "hypothesis", "calculation"),
+    ThoughtType.CONCLUSION: ("conclusion", "conclude", "answer", "final", "final_answer", "result",
+                             "summary", "verdict", "decision"),
+}
+_TYPE_LOOKUP = {alias: thought_type for thought_type, aliases in _TYPE_ALIASES.items() for alias in aliases}
+
+# Repairs that the old strict parser would have rejected outright (fallback chain)
+FATAL_REPAIRS = frozenset({
+    "json_extracted", "json_syntax", "truncated", "thought_type", "thought_id", "confidence",
+    "thought_dropped", "edge_fields", "structure"
+})
+
+CONTINUATION_INSTRUCTION = (
+    "Your previous reply was cut off. Output ONLY the missing part, as a JSON object "
+    "{\"thoughts\": [...], \"edges\": [...]}: thoughts you had not finished or not yet written "
+    "(continue the ids from the last complete thought) and every edge not already listed above. "
+    "Do not repeat complete thoughts."
+)
+
+
+class ParsedOutput:
+    """Thoughts and edges recovered from one model response, plus what had to be fixed."""
+
+    def __init__(self, thoughts: List[Dict[str, Any]], edges: List[Dict[str, Any]],
+                 repairs: Counter, truncated: bool):
+        self.thoughts = thoughts
+        self.edges = edges
+        self.repairs = repairs
+        self.truncated = truncated
+
+    @property
+    def strict_ok(self) -> bool:
+        """True if the response would have parsed without any repair that used to be fatal."""
+        return not any(kind in FATAL_REPAIRS for kind in self.repairs)
+
+    def to_json(self) -> str:
+        """Compact JSON of what was recovered, in the shape the model was asked for."""
+        return json.dumps({
+            "thoughts": self.thoughts,
+            "edges": [{"from": e["from"], "to": e["to"], "label": e["label"]} for e in self.edges]
+        }, separators=(",", ":"))
+
+
+class ReasoningOutputParser:
+    """
+    Tolerant parser for reasoning-chain JSON returned by an LLM.
+
+    Instead of discarding a whole response over one bad field, it recovers
+    what it can: extracts JSON from surrounding prose or code fences,
+    removes trailing commas, closes truncated output at the last complete
+    value, coerces near-miss thought types and confidences, and drops
+    thoughts without content and edges pointing at unknown thoughts.
+    Counts every outcome so repair and salvage rates can be monitored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._responses = 0
+        self._strict_ok = 0
+        self._repaired = 0
+        self._salvaged = 0
+        self._failed = 0
+        self._continuations = 0
+        self._continuations_used = 0
+        self._repair_counts: Counter = Counter()
+
+    def parse(self, raw_text: Optional[str], known_ids: Optional[set] = None) -> ParsedOutput:
+        """
+        Recover thoughts and edges from a raw model response.
+
+        Args:
+            raw_text: Text returned by the provider
+            known_ids: Thought IDs from earlier output that edges may also point at
+
+        Returns:
+            ParsedOutput with normalized thoughts ({id, type, content, confidence})
+            and edges ({from, to, label, confidence})
+
+        Raises:
+            ValueError: If no JSON can be recovered at all
+        """
+        repairs: Counter = Counter()
+        data, truncated = self._load_json(raw_text or "", repairs)
+
+        if isinstance(data, list):
+            data = {"thoughts": data}
+            repairs["structure"] += 1
+        if not isinstance(data, dict):
+            raise ValueError("Model output is not a JSON object")
+
+        raw_thoughts = self._first_list(data, ("thoughts", "nodes", "steps"), repairs)
+        raw_edges = self._first_list(data, ("edges", "links", "connections"), repairs)
+
+        thoughts = self._normalize_thoughts(raw_thoughts, repairs)
+        edges = self._normalize_edges(raw_edges, {t["id"] for t in thoughts} | (known_ids or set()), repairs)
+        return ParsedOutput(thoughts, edges, repairs, truncated)
+
+    def merge(self, parsed: ParsedOutput, continuation_text: Optional[str]) -> ParsedOutput:
+        """
+        Add the thoughts and edges from a continuation response to a
+        truncated parse. Thoughts that already exist keep their first version.
+        """
+        known = {t["id"] for t in parsed.thoughts}
+        extra = self.parse(continuation_text, known_ids=known)
+        thoughts = parsed.thoughts + [t for t in extra.thoughts if t["id"] not in known]
+
+        ids = {t["id"] for t in thoughts}
+        seen = set()
+        edges = []
+        for edge in parsed.edges + extra.edges:
+            key = (edge["from"], edge["to"])
+            if key not in seen and edge["from"] in ids and edge["to"] in ids:
+                seen.add(key)
+                edges.append(edge)
+
+        repairs = parsed.repairs + extra.repairs
+        repairs["continuation"] += 1
+        return ParsedOutput(thoughts, edges, repairs, extra.truncated)
+
+    def record(self, parsed: Optional[ParsedOutput], continued: bool = False,
+               continuation_used: bool = False) -> None:
+        """
+        Count one response.
+
+        Args:
+            parsed: Final parse that produced a chain, or None if the fallback chain was used
+            continued: A continuation request was sent
+            continuation_used: The continuation contributed thoughts or edges
+        """
+        with self._lock:
+            self._responses += 1
+            self._continuations += int(continued)
+            self._continuations_used += int(continuation_used)
+            if parsed is None:
+                self._failed += 1
+                return
+            self._repair_counts.update(parsed.repairs)
+            if parsed.repairs:
+                self._repaired += 1
+            if parsed.strict_ok:
+                self._strict_ok += 1
+            else:
+                self._salvaged += 1
+
+    def stats(self) -> OutputRepairStats:
+        """Snapshot of the repair and salvage counters."""
+        with self._lock:
+            responses = self._responses
+            would_have_failed = responses - self._strict_ok
+            return OutputRepairStats(
+                responses=responses,
+                strict_ok=self._strict_ok,
+                repaired=self._repaired,
+                salvaged=self._salvaged,
+                failed=self._failed,
+                continuations=self._continuations,
+                continuations_used=self._continuations_used,
+                repair_rate=round(self._repaired / responses, 4) if responses else None,
+                salvage_rate=round(self._salvaged / would_have_failed, 4) if would_have_failed else None,
+                repairs=dict(self._repair_counts)
+            )
+
+    # JSON recovery
+
+    def _load_json(self, text: str, repairs: Counter) -> Tuple[Any, bool]:
+        """Decode JSON, repairing common breakage. Returns (data, truncated)."""
+        text = _FENCE_RE.sub("", text.strip())
+        try:
+            return json.loads(text, strict=False), False
+        except json.JSONDecodeError:
+            pass
+
+        starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+        if not starts:
+            raise ValueError("No JSON found in model output")
+        start = min(starts)
+        if start:
+            repairs["json_extracted"] += 1
+        text = text[start:]
+
+        # A complete value followed by prose
+        try:
+            data, end = json.JSONDecoder(strict=False).raw_decode(text)
+            if text[end:].strip():
+                repairs["json_extracted"] += 1
+            return data, False
+        except json.JSONDecodeError:
+            pass
+
+        cleaned = _TRAILING_COMMA_RE.sub(r"\1", text)
+        try:
+            data = json.loads(cleaned, strict=False)
+            repairs["json_syntax"] += 1
+            return data, False
+        except json.JSONDecodeError:
+            pass
+
+        closed = self._close_truncated(cleaned)
+        if closed is None:
+            raise ValueError("Model output is not recoverable JSON")
+        repairs["truncated"] += 1
+        return json.loads(closed, strict=False), True
+
+    @staticmethod
+    def _close_truncated(text: str) -> Optional[str]:
+        """
+        Cut truncated JSON after the last complete object or array and close
+        every container still open at that point.
+        """
+        stack: List[str] = []
+        in_string = False
+        escaped = False
+        last_cut: Optional[Tuple[int, str]] = None
+
+        for i, ch in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                continue
+            if ch == '"':
+                in_string = True
+            elif ch == "{":
+                stack.append("}")
+            elif ch == "[":
+                stack.append("]")
+            elif ch in "}]":
+                if not stack or stack[-1] != ch:
+                    break
+                stack.pop()
+                last_cut = (i + 1, "".join(reversed(stack)))
+                if not stack:
+                    break
+
+        if last_cut is None:
+            return None
+        end, closers = last_cut
+        return text[:end] + closers
+
+    # Normalization
+
+    @staticmethod
+    def _first_list(data: Dict[str, Any], keys: Tuple[str, ...], repairs: Counter) -> List[Any]:
+        for i, key in enumerate(keys):
+            value = data.get(key)
+            if isinstance(value, list):
+                if i:
+                    repairs["structure"] += 1
+                return value
+        return []
+
+    def _normalize_thoughts(self, raw_thoughts: List[Any], repairs: Counter) -> List[Dict[str, Any]]:
+        thoughts = []
+        seen = set()
+        for position, item in enumerate(raw_thoughts, start=1):
+            if not isinstance(item, dict):
+                repairs["thought_dropped"] += 1
+                continue
+
+            content = item.get("content", item.get("text", item.get("thought")))
+            if not isinstance(content, str) or not content.strip():
+                repairs["thought_dropped"] += 1
+                continue
+
+            raw_id = item.get("id", item.get("node_id"))
+            thought_id = str(raw_id).strip() if raw_id is not None else ""
+            if not thought_id or thought_id in seen:
+                if thought_id in seen:
+                    repairs["duplicate_id"] += 1
+                else:
+                    repairs["thought_id"] += 1
+                thought_id = self._free_id(position, seen)
+            seen.add(thought_id)
+
+            thoughts.append({
+                "id": thought_id,
+                "type": self._coerce_type(item.get("type"), repairs).value,
+                "content": content.strip(),
+                "confidence": self._coerce_confidence(item.get("confidence"), repairs),
+            })
+        return thoughts
+
+    def _normalize_edges(self, raw_edges: List[Any], ids: set, repairs: Counter) -> List[Dict[str, Any]]:
+        edges = []
+        seen = set()
+        for item in raw_edges:
+            if not isinstance(item, dict):
+                repairs["edge_dropped"] += 1
+                continue
+
+            source = item.get("from", item.get("source", item.get("source_id")))
+            target = item.get("to", item.get("target", item.get("target_id")))
+            if "from" not in item or "to" not in item:
+                repairs["edge_fields"] += 1
+            source = str(source).strip() if source is not None else None
+            target = str(target).strip() if target is not None else None
+
+            if source not in ids or target not in ids or source == target:
+                repairs["dangling_edge"] += 1
+                continue
+            if (source, target) in seen:
+                repairs["duplicate_edge"] += 1
+                continue
+            seen.add((source, target))
+
+            label = item.get("label")
+            if not isinstance(label, str):
+                repairs["edge_fields"] += 1
+                label = "" if label is None else str(label)
+            confidence = item.get("confidence")
+            edges.append({
+                "from": source,
+                "to": target,
+                "label": label,
+                "confidence": 1.0 if confidence is None else self._coerce_confidence(confidence, repairs),
+            })
+        return edges
+
+    @staticmethod
+    def _free_id(position: int, taken: set) -> str:
+        candidate = position
+        while str(candidate) in taken:
+            candidate += 1
+        return str(candidate)
+
+    @staticmethod
+    def _coerce_type(value: Any, repairs: Counter) -> ThoughtType:
+        """Map a near-miss type name onto ThoughtType (unknown types become reasoning)."""
+        if isinstance(value, str):
+            try:
+                return ThoughtType(value)
+            except ValueError:
+                pass
+            key = re.sub(r"[\s\-]+", "_", value.strip().lower())
+            if key in _TYPE_LOOKUP:
+                repairs["thought_type"] += 1
+                return _TYPE_LOOKUP[key]
+            # e.g. "reasoning_step", "final answer", "retrieval/facts"
+            for part in re.split(r"[_/,]+", key):
+                if part in _TYPE_LOOKUP:
+                    repairs["thought_type"] += 1
+                    return _TYPE_LOOKUP[part]
+        repairs["thought_type"] += 1
+        return ThoughtType.REASONING
+
+    @staticmethod
+    def _coerce_confidence(value: Any, repairs: Counter) -> float:
+        """
+        Parse a confidence into [0, 1]; missing values become 0.5.
+
+        "85%" and values from 2 to 100 are read as percentages. Anything
+        just above 1 (e.g. 1.05) is a slight overshoot and is clamped to 1.
+        """
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and 0.0 <= value <= 1.0:
+            return float(value)
+
+        repairs["confidence"] += 1
+        number: Optional[float] = None
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            number = float(value)
+        elif isinstance(value, str):
+            match = _PERCENT_RE.match(value)
+            try:
+                number = float(match.group(1)) / 100 if match else float(value)
+            except ValueError:
+                number = None
+
+        if number is None or number != number:
+            return 0.5
+        if 2.0 <= number <= 100.0:
+            number /= 100
+        return min(max(number, 0.0), 1.0)
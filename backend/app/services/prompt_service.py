@@ -0,0 +1,209 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+from app.models.prompt_models import PromptTemplateStats
+
+logger = logging.getLogger(__name__)
+
+REASONING_CHAIN_SYSTEM_PROMPT = """You are a reasoning engine that externalizes its thought process.
+
+For any question, output your reasoning as a JSON object with this exact structure:
+{
+  "thoughts": [
+    {"id": "1", "type": "question", "content": "Rephrase the question to understand it", "confidence": 0.9},
+    {"id": "2", "type": "retrieval", "content": "What information do I need?", "confidence": 0.85},
+    {"id": "3", "type": "reasoning", "content": "Apply logic to the information", "confidence": 0.8},
+    {"id": "4", "type": "conclusion", "content": "Final answer", "confidence": 0.9}
+  ],
+  "edges": [
+    {"from": "1", "to": "2", "label": "requires"},
+    {"from": "2", "to": "3", "label": "informs"},
+    {"from": "3", "to": "4", "label": "concludes"}
+  ]
+}
+
+Types available:
+- "question": Understanding/rephrasing the problem
+- "retrieval": Identifying needed information or facts
+- "reasoning": Applying logic, making connections
+- "conclusion": Final answer or result
+
+Rules:
+1. Create 3-7 thought nodes
+2. Be explicit about your reasoning steps
+3. Confidence is 0.0-1.0 (how sure you are of this step)
+4. Each thought should be clear and specific
+5. Edges show how thoughts connect
+6. Content should be detailed enough to understand your thinking
+
+Example for "Why is the sky blue?":
+{
+  "thoughts": [
+    {"id": "1", "type": "question", "content": "The user wants to understand why the sky appears blue to human observers", "confidence": 0.95},
+    {"id": "2", "type": "retrieval", "content": "I need to recall information about light, atmosphere, and scattering", "confidence": 0.9},
+    {"id": "3", "type": "reasoning", "content": "Sunlight contains all colors. When it hits Earth's atmosphere, shorter wavelengths (blue) scatter more than longer wavelengths due to Rayleigh scattering", "confidence": 0.92},
+    {"id": "4", "type": "reasoning", "content": "This scattered blue light comes from all directions in the sky, making it appear blue", "confidence": 0.88},
+    {"id": "5", "type": "conclusion", "content": "The sky appears blue because of Rayleigh scattering - blue light's shorter wavelength causes it to scatter more in the atmosphere than other colors", "confidence": 0.93}
+  ],
+  "edges": [
+    {"from": "1", "to": "2", "label": "requires information"},
+    {"from": "2", "to": "3", "label": "retrieved knowledge"},
+    {"from": "3", "to": "4", "label": "extends reasoning"},
+    {"from": "4", "to": "5", "label": "synthesizes into conclusion"}
+  ]
+}
+
+Now process the user's question and output your reasoning chain."""
+
+
+class PromptTemplate:
+    """
+    A prompt split into a static prefix (the system prompt) and a per-call
+    user part.
+
+    The prefix is built once and sent byte-for-byte identical on every
+    call, which is what provider-side prompt caches key on.
+    """
+
+    def __init__(self, name: str, system_prompt: str, user_format: str = "{prompt}"):
+        """
+        Args:
+            name: Template name used in stats and provenance
+            system_prompt: Static prefix sent ahead of every user prompt
+            user_format: Format string for the per-call part; receives `prompt`
+        """
+        self.name = name
+        self.system_prompt = system_prompt
+        self.user_format = user_format
+        # Short content hash, so every edit to the prompt gets its own stats
+        self.version = hashlib.sha256(
+            f"{system_prompt}\x00{user_format}".encode("utf-8")
+        ).hexdigest()[:12]
+        self.system_message = {"role": "system", "content": system_prompt}
+
+    def render_user(self, prompt: str) -> str:
+        """Per-call part of the prompt."""
+        return self.user_format.format(prompt=prompt)
+
+
+class _TemplateCounters:
+    """Running totals for one template version."""
+
+    def __init__(self, template: PromptTemplate, latency_window: int):
+        self.template = template
+        self.calls = 0
+        self.failures = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+        self.calls_with_usage = 0
+        self.latency_total_ms = 0.0
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+
+
+class PromptTemplateRegistry:
+    """
+    Registry of prompt templates with per-template token and latency stats.
+
+    Stats are kept per (name, version), so a changed prompt shows up as a
+    new row next to the old one and the two can be compared directly.
+    """
+
+    def __init__(self, templates: Optional[List[PromptTemplate]] = None, latency_window: int = 1000):
+        """
+        Args:
+            templates: Templates to register (default: the built-in templates)
+            latency_window: Number of recent calls kept for latency percentiles
+        """
+        self.latency_window = latency_window
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._counters: Dict[Tuple[str, str], _TemplateCounters] = {}
+        # record() is called from the event loop and from worker threads
+        self._lock = threading.Lock()
+
+        if templates is None:
+            templates = [PromptTemplate("reasoning_chain", REASONING_CHAIN_SYSTEM_PROMPT, "User question: {prompt}")]
+        for template in templates:
+            self.register(template)
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        """Add or replace a template by name."""
+        with self._lock:
+            self._templates[template.name] = template
+        logger.info(f"Registered prompt template {template.name}@{template.version}")
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        """
+        Look up a template by name.
+
+        Raises:
+            KeyError: If no template with that name is registered
+        """
+        try:
+            return self._templates[name]
+        except KeyError:
+            raise KeyError(f"Unknown prompt template '{name}'") from None
+
+    def record(self, template: PromptTemplate, latency_ms: float, input_tokens: Optional[int],
+               output_tokens: Optional[int], cached_input_tokens: Optional[int] = None,
+               failed: bool = False) -> None:
+        """
+        Add one provider call to the template's stats.
+
+        Args:
+            template: Template the call was built from
+            latency_ms: Wall-clock time of the provider call
+            input_tokens: Prompt tokens reported by the provider (None if not reported)
+            output_tokens: Completion tokens reported by the provider
+            cached_input_tokens: Prompt tokens served from the provider's cache
+            failed: True if the call ended in the fallback chain
+        """
+        key = (template.name, template.version)
+        with self._lock:
+            counters = self._counters.get(key)
+            if counters is None:
+                counters = self._counters[key] = _TemplateCounters(template, self.latency_window)
+            counters.calls += 1
+            counters.failures += int(failed)
+            counters.latency_total_ms += latency_ms
+            counters.latencies.append(latency_ms)
+            if input_tokens is not None or output_tokens is not None:
+                counters.calls_with_usage += 1
+                counters.input_tokens += input_tokens or 0
+                counters.output_tokens += output_tokens or 0
+                counters.cached_input_tokens += cached_input_tokens or 0
+
+    def stats(self) -> List[PromptTemplateStats]:
+        """Snapshot of the stats for every template version that has been called."""
+        with self._lock:
+            counters = list(self._counters.values())
+            latencies = [np.array(c.latencies) for c in counters]
+
+        result = []
+        for c, recent in zip(counters, latencies):
+            with_usage = c.calls_with_usage
+            p50, p95 = np.percentile(recent, [50, 95]) if len(recent) else (None, None)
+            result.append(PromptTemplateStats(
+                template=c.template.name,
+                version=c.template.version,
+                prefix_chars=len(c.template.system_prompt),
+                calls=c.calls,
+                failures=c.failures,
+                input_tokens=c.input_tokens,
+                cached_input_tokens=c.cached_input_tokens,
+                output_tokens=c.output_tokens,
+                calls_without_usage=c.calls - with_usage,
+                mean_input_tokens=round(c.input_tokens / with_usage, 1) if with_usage else None,
+                mean_output_tokens=round(c.output_tokens / with_usage, 1) if with_usage else None,
+                cache_hit_ratio=round(c.cached_input_tokens / c.input_tokens, 4) if c.input_tokens else None,
+                latency_ms_mean=round(c.latency_total_ms / c.calls, 1) if c.calls else None,
+                latency_ms_p50=round(float(p50), 1) if p50 is not None else None,
+                latency_ms_p95=round(float(p95), 1) if p95 is not None else None
+            ))
+        return result
@@ -0,0 +1,401 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import asyncio
+import gzip
+import logging
+import re
+import threading
+import uuid
+import zlib
+
+from app.models.provenance_models import ProvenanceRecord
+from app.services.base_provenance_backend import BaseProvenanceBackend
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# provenance-<segment start>[-<part>].jsonl.gz
+_SEGMENT_FILE_RE = re.compile(r"^provenance-(\d{8}T\d{6})(?:-([0-9a-f]+))?\.jsonl\.gz$")
+
+
+def _as_utc_naive(value: datetime) -> datetime:
+    """Normalise to a naive UTC datetime (the convention used by created_at)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _segment_start(value: datetime, segment_seconds: int) -> datetime:
+    """Start of the fixed-size time segment containing `value`."""
+    elapsed = int((_as_utc_naive(value) - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=elapsed - elapsed % segment_seconds)
+
+
+class SegmentFileBackend(BaseProvenanceBackend):
+    """
+    Default provenance backend: gzip-compressed JSON Lines segment files.
+
+    Each time segment (one hour by default) is stored as
+    provenance-<start>-<part>.jsonl.gz files. Every batch is appended as a
+    new gzip member, so files are only ever appended to, and a reader sees
+    all members of a file as one stream. Retention deletes whole segments.
+
+    Each backend instance writes to its own part, and moves to a fresh part
+    after a failed write. A member torn by a crash or a failed write is
+    therefore always the last one in its file: nothing is appended after
+    it, so the reader never loses later batches behind it.
+    """
+
+    def __init__(self, directory: str, segment_seconds: int = 3600):
+        """
+        Args:
+            directory: Where segment files are stored (created if missing)
+            segment_seconds: Length of one segment
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_seconds = segment_seconds
+        self._part = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+
+    def _segment_path(self, start: datetime) -> Path:
+        return self.directory / f"provenance-{start:%Y%m%dT%H%M%S}-{self._part}.jsonl.gz"
+
+    def _segments(self) -> Dict[datetime, List[Path]]:
+        """Existing segment files (every part) keyed by segment start."""
+        segments: Dict[datetime, List[Path]] = {}
+        for path in self.directory.glob("provenance-*.jsonl.gz"):
+            match = _SEGMENT_FILE_RE.match(path.name)
+            try:
+                start = datetime.strptime(match.group(1), "%Y%m%dT%H%M%S") if match else None
+            except ValueError:
+                start = None
+            if start is None:
+                logger.warning(f"Ignoring unexpected file in provenance directory: {path.name}")
+                continue
+            segments.setdefault(start, []).append(path)
+        return segments
+
+    def write_batch(self, records: List[ProvenanceRecord]) -> None:
+        by_segment: Dict[datetime, List[str]] = {}
+        for record in records:
+            start = _segment_start(record.created_at, self.segment_seconds)
+            by_segment.setdefault(start, []).append(record.model_dump_json())
+
+        with self._lock:
+            for start, lines in by_segment.items():
+                try:
+                    with gzip.open(self._segment_path(start), "at", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+                except Exception:
+                    # The file may now end in a partial member; never append after it
+                    self._part = uuid.uuid4().hex[:12]
+                    raise
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              session_id: Optional[str] = None, limit: int = 100) -> List[ProvenanceRecord]:
+        start = _as_utc_naive(start) if start else None
+        end = _as_utc_naive(end) if end else None
+        span = timedelta(seconds=self.segment_seconds)
+
+        matches: List[ProvenanceRecord] = []
+        for segment_start, paths in sorted(self._segments().items()):
+            # Skip whole segments outside the requested range without reading them
+            if (start and segment_start + span <= start) or (end and segment_start >= end):
+                continue
+            segment_matches = []
+            for path in paths:
+                for record in self._read_segment(path):
+                    if start and record.created_at < start:
+                        continue
+                    if end and record.created_at >= end:
+                        continue
+                    if session_id and record.session_id != session_id:
+                        continue
+                    segment_matches.append(record)
+            segment_matches.sort(key=lambda r: r.created_at)
+            matches.extend(segment_matches)
+            # Segments are disjoint and time-ordered, so later ones can't sort earlier
+            if len(matches) >= limit:
+                break
+
+        return matches[:limit]
+
+    @staticmethod
+    def _read_segment(path: Path) -> List[ProvenanceRecord]:
+        records = []
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        records.append(ProvenanceRecord.model_validate_json(line))
+        except FileNotFoundError:
+            # Deleted by retention between listing and reading
+            pass
+        except (EOFError, OSError, zlib.error) as e:
+            # A batch still being appended (or cut short by a crash) leaves a
+            # truncated trailing member; it is always the last one in its part
+            logger.warning(f"Truncated provenance segment {path.name}: {e}")
+        return records
+
+    def delete_before(self, cutoff: datetime) -> int:
+        cutoff = _as_utc_naive(cutoff)
+        span = timedelta(seconds=self.segment_seconds)
+        deleted = 0
+        with self._lock:
+            for segment_start, paths in self._segments().items():
+                if segment_start + span <= cutoff:
+                    for path in paths:
+                        path.unlink(missing_ok=True)
+                    deleted += 1
+        return deleted
+
+
+class PostgresProvenanceBackend(BaseProvenanceBackend):
+    """
+    Provenance backend on PostgreSQL (see postgres-test in docker-compose-test.yml).
+
+    Queryable fields are stored as columns; the full record is stored as a
+    zlib-compressed JSON payload. Rows carry the start of their time segment
+    so retention deletes whole segments. Requires the optional psycopg package.
+    """
+
+    def __init__(self, dsn: str, segment_seconds: int = 3600, table: str = "llm_provenance"):
+        """
+        Args:
+            dsn: PostgreSQL connection string
+            segment_seconds: Length of one retention segment
+            table: Table name (created if missing)
+        """
+        try:
+            import psycopg
+        except ImportError as e:
+            raise ImportError(
+                "The postgres provenance backend requires psycopg: pip install 'psycopg[binary]'"
+            ) from e
+
+        self.segment_seconds = segment_seconds
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = psycopg.connect(dsn, autocommit=True)
+        with self._lock:
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id BIGSERIAL PRIMARY KEY,
+                    created_at TIMESTAMP NOT NULL,
+                    segment_start TIMESTAMP NOT NULL,
+                    session_id TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    latency_ms DOUBLE PRECISION NOT NULL,
+                    input_tokens INTEGER,
+                    output_tokens INTEGER,
+                    used_fallback BOOLEAN NOT NULL,
+                    payload BYTEA NOT NULL
+                )
+            """)
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created_at_idx ON {table} (created_at)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_segment_idx ON {table} (segment_start)")
+
+    def write_batch(self, records: List[ProvenanceRecord]) -> None:
+        rows = [
+            (
+                _as_utc_naive(r.created_at),
+                _segment_start(r.created_at, self.segment_seconds),
+                r.session_id,
+                r.provider,
+                r.model,
+                r.latency_ms,
+                r.input_tokens,
+                r.output_tokens,
+                r.used_fallback,
+                zlib.compress(r.model_dump_json().encode("utf-8"))
+            )
+            for r in records
+        ]
+        with self._lock, self._conn.cursor() as cur:
+            cur.executemany(
+                f"""
+                INSERT INTO {self.table} (created_at, segment_start, session_id, provider, model,
+                    latency_ms, input_tokens, output_tokens, used_fallback, payload)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                rows
+            )
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              session_id: Optional[str] = None, limit: int = 100) -> List[ProvenanceRecord]:
+        clauses, params = [], []
+        if start:
+            clauses.append("created_at >= %s")
+            params.append(_as_utc_naive(start))
+        if end:
+            clauses.append("created_at < %s")
+            params.append(_as_utc_naive(end))
+        if session_id:
+            clauses.append("session_id = %s")
+            params.append(session_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT payload FROM {self.table} {where} ORDER BY created_at LIMIT %s",
+                [*params, limit]
+            ).fetchall()
+        return [ProvenanceRecord.model_validate_json(zlib.decompress(row[0])) for row in rows]
+
+    def delete_before(self, cutoff: datetime) -> int:
+        last_expired = _as_utc_naive(cutoff) - timedelta(seconds=self.segment_seconds)
+        with self._lock:
+            cur = self._conn.execute(f"DELETE FROM {self.table} WHERE segment_start <= %s", [last_expired])
+            return cur.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class ProvenanceWriter:
+    """
+    Asynchronous batching writer in front of a provenance backend.
+
+    record() only enqueues and never waits, so the request path doesn't pay
+    for storage I/O. A background task groups records into batches (up to
+    batch_size, or whatever arrived within flush_interval_seconds) and hands
+    each batch to the backend in a worker thread. A second task applies the
+    retention policy periodically.
+    """
+
+    def __init__(
+        self,
+        backend: BaseProvenanceBackend,
+        batch_size: int = 100,
+        flush_interval_seconds: float = 1.0,
+        max_queue_size: int = 10000,
+        retention_days: int = 30,
+        retention_check_interval_seconds: float = 3600.0,
+    ):
+        """
+        Args:
+            backend: Storage backend to write to
+            batch_size: Maximum records per backend write
+            flush_interval_seconds: Maximum time a record waits before being written
+            max_queue_size: Records beyond this are dropped (and counted) rather than blocking
+            retention_days: Segments older than this are deleted
+            retention_check_interval_seconds: How often retention is applied
+        """
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue_size = max_queue_size
+        self.retention_days = retention_days
+        self.retention_check_interval_seconds = retention_check_interval_seconds
+
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def record(self, record: ProvenanceRecord) -> None:
+        """Enqueue a record for writing. Never blocks; drops if the queue is full."""
+        if self._queue is None:
+            self.dropped += 1
+            logger.warning("Provenance writer not started; dropping record")
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Provenance queue full; dropped {self.dropped} records so far")
+
+    def start(self) -> None:
+        """Start the batching and retention tasks (call from the running event loop)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._retention_loop()),
+        ]
+
+    async def stop(self) -> None:
+        """Flush everything queued so far, then stop the background tasks."""
+        if not self._tasks:
+            return
+        writer_task, retention_task = self._tasks
+        retention_task.cancel()
+        await self._queue.put(None)  # sentinel: flush and exit
+        await writer_task
+        try:
+            await retention_task
+        except asyncio.CancelledError:
+            pass
+        self._tasks = []
+        self._queue = None
+        await asyncio.to_thread(self.backend.close)
+
+    async def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    session_id: Optional[str] = None, limit: int = 100) -> List[ProvenanceRecord]:
+        """Time-range query against the backend (records still queued are not included)."""
+        return await asyncio.to_thread(self.backend.query, start, end, session_id, limit)
+
+    async def apply_retention(self) -> int:
+        """Delete segments that are entirely older than the retention window."""
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        deleted = await asyncio.to_thread(self.backend.delete_before, cutoff)
+        if deleted:
+            logger.info(f"Provenance retention removed {deleted} segments older than {cutoff.isoformat()}")
+        return deleted
+
+    def stats(self) -> dict:
+        """Writer counters, for health/metrics endpoints."""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.flush_interval_seconds
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._write(batch)
+
+    async def _write(self, batch: List[ProvenanceRecord]) -> None:
+        try:
+            await asyncio.to_thread(self.backend.write_batch, batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"Failed to write {len(batch)} provenance records: {e}")
+
+    async def _retention_loop(self) -> None:
+        while True:
+            try:
+                await self.apply_retention()
+            except Exception as e:
+                logger.error(f"Provenance retention failed: {e}")
+            await asyncio.sleep(self.retention_check_interval_seconds)
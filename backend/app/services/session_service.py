@@ -0,0 +1,582 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+import uuid
+
+from app.models.thought_models import (
+    CompactReasoningChain,
+    CreateBranchRequest,
+    GraphLayout,
+    LayoutMode,
+    ReasoningChain,
+    ReasoningEdge,
+    SessionChanges,
+    ThoughtNode
+)
+from app.services.compact_service import ChainIndex, CompactChainEncoder
+from app.services.graph_service import GraphService
+from app.services.layout_service import LayoutService
+
+logger = logging.getLogger(__name__)
+
+
+class SessionService:
+    """
+    Persists and loads reasoning sessions on top of the graph service.
+
+    A session is stored in Neo4j as a Session node linked to its
+    ThoughtNodes (HAS_THOUGHT), with LEADS_TO relationships between
+    thoughts. The Session node also carries a graph version and one cached
+    layout per layout mode (layout_cache_<mode>), tagged with the graph
+    version it was computed for.
+
+    Every mutation bumps the version and appends Change entries so clients
+    can sync by deltas. The only mutation on an existing session is a
+    thought edit, logged as an "updated" node entry; sessions are otherwise
+    created whole and branches are new sessions. Clients that pass a
+    client_id get a sync cursor; log entries every active client has
+    synced past are compacted away, and a client behind the compacted
+    version gets the whole graph back as a full resync.
+
+    Branches are Sessions linked to their parent with BRANCHED_FROM. A
+    branch stores only the thoughts and edges it adds or overrides, plus
+    tombstones for the ones it removes; the rest is read from its
+    ancestors. Forking therefore costs O(changes), and loading any session
+    is one lineage traversal. Editing a thought that branches still inherit
+    first copies the old value down into them, so branches behave as
+    snapshots of their parent at fork time.
+    """
+
+    def __init__(self, graph: GraphService, layout_service: LayoutService,
+                 sync_cursor_ttl_seconds: int = 86400, window_cache_size: int = 16):
+        """
+        Args:
+            graph: Graph service used for persistence
+            layout_service: Layout engine for precomputed coordinates
+            sync_cursor_ttl_seconds: Clients that haven't synced for this long
+                no longer hold back compaction (they fall back to a full resync)
+            window_cache_size: Resolved chains kept in memory for paging through
+                large sessions window by window
+        """
+        self.graph = graph
+        self.layout_service = layout_service
+        self.sync_cursor_ttl_seconds = sync_cursor_ttl_seconds
+        self.compact_encoder = CompactChainEncoder(layout_service)
+        self.window_cache_size = window_cache_size
+        # (session_id, version) -> (resolved chain, depth order, layouts by mode)
+        self._window_cache: "OrderedDict[Tuple[str, int], Tuple[ReasoningChain, ChainIndex, Dict]]" = OrderedDict()
+        self._window_lock = threading.Lock()
+
+    def create_session(self, session_id: str, prompt: str, reasoning_data: Dict[str, Any],
+                       layout: Optional[GraphLayout] = None,
+                       extra_props: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Store a freshly generated reasoning chain.
+
+        Args:
+            session_id: Reasoning session identifier
+            prompt: Original user prompt
+            reasoning_data: Dict with "nodes" and "edges" as returned by LLMService
+            layout: Optional precomputed layout to seed the session's layout cache
+            extra_props: Additional Session properties (e.g. provider/model)
+
+        Returns:
+            str: Neo4j id of the Session node
+        """
+        return self.create_sessions([{
+            "session_id": session_id,
+            "prompt": prompt,
+            "reasoning_data": reasoning_data,
+            "layout": layout,
+            "extra_props": extra_props
+        }])[0]
+
+    def create_sessions(self, sessions: List[Dict[str, Any]]) -> List[str]:
+        """
+        Store several reasoning chains in one batched graph write.
+
+        Args:
+            sessions: Dicts with the create_session() arguments as keys
+
+        Returns:
+            Neo4j ids of the Session nodes, in input order
+        """
+        batch = []
+        for sess in sessions:
+            session_id = sess["session_id"]
+            props = {
+                **(sess.get("extra_props") or {}),
+                "session_id": session_id,
+                "prompt": sess["prompt"],
+                "status": "completed",
+                "version": 1
+            }
+            layout = sess.get("layout")
+            if layout is not None:
+                props[self._layout_cache_key(layout.mode)] = layout.model_dump_json()
+
+            reasoning_data = sess["reasoning_data"]
+            batch.append({
+                "props": props,
+                "thoughts": [
+                    {
+                        "node_id": node_data["id"],
+                        "type": node_data["type"],
+                        "content": node_data["content"],
+                        "confidence": node_data["confidence"],
+                        "session_id": session_id
+                    }
+                    for node_data in reasoning_data["nodes"]
+                ],
+                "edges": [
+                    {
+                        "source_id": edge_data["source_id"],
+                        "target_id": edge_data["target_id"],
+                        "label": edge_data["label"],
+                        "confidence": edge_data.get("confidence", 1.0)
+                    }
+                    for edge_data in reasoning_data["edges"]
+                ]
+            })
+
+        return self.graph.create_sessions(batch)
+
+    def load_chain(self, session_id: str, layout_mode: Optional[LayoutMode] = None) -> Optional[ReasoningChain]:
+        """
+        Load a stored session as a ReasoningChain.
+
+        Args:
+            session_id: Reasoning session identifier
+            layout_mode: If given, attach a layout for the current graph version
+                (served from the session's cache when it is still valid)
+
+        Returns:
+            ReasoningChain, or None if the session doesn't exist
+        """
+        lineage = self.graph.get_session_lineage(session_id)
+        if lineage is None:
+            return None
+
+        session = lineage[0]["session"]
+        nodes, edges = self._resolve(lineage)
+        metadata = {}
+        if session.get("parent_session_id"):
+            metadata = {"parent_session_id": session["parent_session_id"], "branch_name": session.get("branch_name")}
+
+        chain = ReasoningChain(
+            session_id=session_id,
+            prompt=session.get("prompt", ""),
+            nodes=nodes,
+            edges=edges,
+            status=session.get("status", "completed"),
+            created_at=session.get("created_at"),
+            metadata=metadata,
+            version=session.get("version", 1)
+        )
+
+        if layout_mode is not None:
+            chain.layout = self._get_or_compute_layout(session, chain, layout_mode)
+
+        return chain
+
+    def load_compact(self, session_id: str, layout_mode: Optional[LayoutMode] = LayoutMode.HIERARCHICAL,
+                     offset: int = 0, max_nodes: Optional[int] = None, start_depth: Optional[int] = None,
+                     expected_version: Optional[int] = None) -> Optional[CompactReasoningChain]:
+        """
+        Load a stored session in the columnar wire format, whole or one
+        depth-ordered window at a time.
+
+        Paging through a large session resolves it, computes its depth
+        order and loads its layout once per graph version: all three are
+        kept in a small LRU cache keyed by (session_id, version), and each
+        window is a slice of them.
+
+        Layout columns are only included when they are cheap: hierarchical
+        layouts are computed (and cached on the session) on demand, force
+        layouts only if one is already cached for this version.
+
+        Args:
+            session_id: Reasoning session identifier
+            layout_mode: Layout to include columns for (None = no layout)
+            offset: Global index of the first node in the window
+            max_nodes: Window size (None = the rest of the chain)
+            start_depth: Start at the first node at this depth instead of at `offset`
+            expected_version: Version the client's earlier windows came from
+
+        Returns:
+            CompactReasoningChain, or None if the session doesn't exist
+
+        Raises:
+            ValueError: If expected_version is given and the session has moved on
+        """
+        session = self.graph.get_session_node(session_id)
+        if session is None:
+            return None
+
+        version = session.get("version", 1)
+        if expected_version is not None and expected_version != version:
+            raise ValueError(
+                f"Session {session_id} is at version {version}, not {expected_version}; restart from offset 0"
+            )
+
+        key = (session_id, version)
+        with self._window_lock:
+            cached = self._window_cache.get(key)
+            if cached is not None:
+                self._window_cache.move_to_end(key)
+
+        if cached is None:
+            chain = self.load_chain(session_id)
+            if chain is None:
+                return None
+            cached = (chain, self.compact_encoder.index(chain), {})
+            with self._window_lock:
+                self._window_cache[key] = cached
+                while len(self._window_cache) > self.window_cache_size:
+                    self._window_cache.popitem(last=False)
+
+        chain, index, layouts = cached
+        layout = None
+        if layout_mode is not None:
+            layout = layouts.get(layout_mode)
+            if layout is None:
+                if layout_mode == LayoutMode.HIERARCHICAL:
+                    layout = self._get_or_compute_layout(session, chain, layout_mode)
+                else:
+                    layout = self._cached_layout(session, layout_mode, version)
+                if layout is not None:
+                    layouts[layout_mode] = layout
+
+        return self.compact_encoder.encode(chain, index, layout=layout, offset=offset,
+                                           max_nodes=max_nodes, start_depth=start_depth)
+
+    def create_branch(self, parent_session_id: str, request: CreateBranchRequest) -> Optional[ReasoningChain]:
+        """
+        Fork a session, storing only what differs from the parent.
+
+        Args:
+            parent_session_id: Session (root or branch) to fork from
+            request: Thoughts/edges to add or override and ones to remove
+
+        Returns:
+            The new branch resolved as a full ReasoningChain, or None if the
+            parent doesn't exist
+
+        Raises:
+            ValueError: If a thought is both upserted and removed
+        """
+        upserted = {node.id for node in request.upsert_nodes}
+        conflicting = upserted & set(request.remove_node_ids)
+        if conflicting:
+            raise ValueError(f"Thoughts both upserted and removed: {sorted(conflicting)}")
+
+        parent = self.graph.get_session_node(parent_session_id)
+        if parent is None:
+            return None
+
+        branch_id = str(uuid.uuid4())
+        session_props = {
+            "session_id": branch_id,
+            "prompt": parent.get("prompt", ""),
+            "status": "completed",
+            "version": 1,
+            "parent_session_id": parent_session_id,
+            "removed_node_ids": list(request.remove_node_ids),
+            "removed_edges": [self._edge_key(e.source_id, e.target_id) for e in request.remove_edges]
+        }
+        if request.name:
+            session_props["branch_name"] = request.name
+
+        thoughts = [
+            {
+                "node_id": node.id,
+                "type": node.type.value,
+                "content": node.content,
+                "confidence": node.confidence,
+                "session_id": branch_id
+            }
+            for node in request.upsert_nodes
+        ]
+        edges = [
+            {
+                "source_id": edge.source_id,
+                "target_id": edge.target_id,
+                "label": edge.label,
+                "confidence": edge.confidence,
+                "session_id": branch_id
+            }
+            for edge in request.add_edges
+        ]
+
+        if self.graph.create_branch(parent_session_id, session_props, thoughts, edges) is None:
+            return None
+
+        logger.info(f"Branched session {parent_session_id} into {branch_id} "
+                    f"({len(thoughts)} thoughts, {len(edges)} edges, "
+                    f"{len(request.remove_node_ids) + len(request.remove_edges)} removals)")
+        return self.load_chain(branch_id)
+
+    def update_thought(self, session_id: str, node_id: str, content: str,
+                       confidence: float) -> Optional[ThoughtNode]:
+        """
+        Edit a thought's content and confidence and record it in the change log.
+
+        If the session inherits the thought from an ancestor, the edit is
+        stored as a copy-on-write override on this session. Branches of
+        this session that still inherit the thought get a copy of the old
+        value first, so the edit doesn't leak into them.
+
+        Returns:
+            The updated ThoughtNode, or None if the session or node doesn't exist
+        """
+        current = self.graph.get_thought(session_id, node_id)
+        inherited = current is None
+        if inherited:
+            lineage = self.graph.get_session_lineage(session_id)
+            if lineage is None:
+                return None
+            nodes, _ = self._resolve(lineage)
+            match = next((n for n in nodes if n.id == node_id), None)
+            if match is None:
+                return None
+            current = {
+                "node_id": match.id,
+                "type": match.type.value,
+                "content": match.content,
+                "confidence": match.confidence
+            }
+
+        self.graph.copy_thought_to_branches(session_id, current)
+
+        updates = {"content": content, "confidence": confidence}
+        if inherited:
+            record = self.graph.add_thought(session_id, {**current, **updates})
+        else:
+            record = self.graph.update_thought(session_id, node_id, updates)
+        if record is None:
+            return None
+
+        node = self._thought_from_record(record)
+        self.record_changes(session_id, [self.node_change("updated", node)])
+        return node
+
+    def record_changes(self, session_id: str, changes: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Bump the session version and append change log entries.
+
+        Args:
+            session_id: Reasoning session identifier
+            changes: Entries built with node_change()
+
+        Returns:
+            The new version, or None if the session doesn't exist
+        """
+        if not changes:
+            return None
+        return self.graph.append_session_changes(session_id, changes)
+
+    @staticmethod
+    def node_change(op: str, node: ThoughtNode) -> Dict[str, Any]:
+        """Build a change log entry for an added, updated or removed thought."""
+        return {"op": op, "kind": "node", "entity_id": node.id, "payload": node.model_dump_json()}
+
+    def get_changes(self, session_id: str, since: int, client_id: Optional[str] = None) -> Optional[SessionChanges]:
+        """
+        Compute what changed in a session after version `since`.
+
+        Several changes to the same node collapse into one entry, holding
+        its latest state. Only thought edits are logged, so outside a full
+        resync the delta fills updated_nodes only; added_nodes and
+        added_edges are filled when the client needs a full resync.
+
+        Args:
+            session_id: Reasoning session identifier
+            since: Last version the client has applied (0 for a fresh client)
+            client_id: Optional stable client identifier; enables log compaction
+
+        Returns:
+            SessionChanges, or None if the session doesn't exist
+
+        Raises:
+            ValueError: If `since` is ahead of the session's version
+        """
+        session = self.graph.get_session_node(session_id)
+        if session is None:
+            return None
+
+        version = session.get("version", 1)
+        if since > version:
+            raise ValueError(f"since={since} is ahead of session version {version}")
+
+        delta = SessionChanges(session_id=session_id, since=since, version=version)
+
+        if since < max(session.get("compacted_version", 0), 1):
+            # Initial state isn't in the log, and compacted entries are gone:
+            # send the whole graph
+            delta.full_resync = True
+            delta.added_nodes, delta.added_edges = self._resolve(self.graph.get_session_lineage(session_id) or [])
+        elif since < version:
+            self._collapse_changes(self.graph.get_session_changes(session_id, since), delta)
+
+        if client_id:
+            self._advance_cursor(session, client_id, version)
+
+        return delta
+
+    @staticmethod
+    def _collapse_changes(entries: List[Dict[str, Any]], delta: SessionChanges) -> None:
+        """Fold ordered change log entries into one added/updated/removed entry per entity."""
+        first_op: Dict[tuple, str] = {}
+        latest: Dict[tuple, Dict[str, Any]] = {}
+        for entry in entries:
+            key = (entry["kind"], entry["entity_id"])
+            first_op.setdefault(key, entry["op"])
+            latest[key] = entry
+
+        for key, entry in latest.items():
+            first, last = first_op[key], entry["op"]
+            if first == "added" and last == "removed":
+                continue
+            if first == "added":
+                op = "added"
+            elif last == "removed":
+                op = "removed"
+            else:
+                op = "updated"
+
+            if entry["kind"] == "node":
+                getattr(delta, f"{op}_nodes").append(ThoughtNode.model_validate_json(entry["payload"]))
+            else:
+                getattr(delta, f"{op}_edges").append(ReasoningEdge.model_validate_json(entry["payload"]))
+
+    def _advance_cursor(self, session: Dict[str, Any], client_id: str, version: int) -> None:
+        """
+        Record that a client has synced to `version`, then delete log entries
+        that every active client has already applied.
+
+        Clients that went quiet are forgotten; they'll do a full resync if
+        they return. The whole update is one query, so concurrent polls
+        don't lose each other's cursors.
+        """
+        compacted = self.graph.advance_sync_cursor(
+            session["session_id"], client_id, version,
+            now=time.time(), ttl_seconds=self.sync_cursor_ttl_seconds
+        )
+        if compacted:
+            logger.info(f"Compacted {compacted['removed']} change entries for session {session['session_id']} "
+                        f"up to v{compacted['compacted_version']}")
+
+    @classmethod
+    def _resolve(cls, lineage: List[Dict[str, Any]]) -> Tuple[List[ThoughtNode], List[ReasoningEdge]]:
+        """
+        Merge a session's lineage (nearest first) into its effective graph.
+
+        The nearest session that stores a thought or edge wins; tombstones on
+        a session hide entries from its ancestors. Edges whose endpoints were
+        removed are dropped.
+        """
+        nodes: Dict[str, Dict[str, Any]] = {}
+        edges: Dict[str, Dict[str, Any]] = {}
+        hidden_nodes: set = set()
+        hidden_edges: set = set()
+
+        for level in lineage:
+            for thought in level["thoughts"]:
+                node_id = thought["node_id"]
+                if node_id not in nodes and node_id not in hidden_nodes:
+                    nodes[node_id] = thought
+            for edge in level["edges"]:
+                key = cls._edge_key(edge["source_id"], edge["target_id"])
+                if key not in edges and key not in hidden_edges:
+                    edges[key] = edge
+            # A session's tombstones only apply to what it inherits
+            hidden_nodes.update(level["session"].get("removed_node_ids") or [])
+            hidden_edges.update(level["session"].get("removed_edges") or [])
+
+        # Keep the root's ordering, with branch additions after it
+        order = {}
+        for level in reversed(lineage):
+            for thought in level["thoughts"]:
+                order.setdefault(thought["node_id"], len(order))
+
+        resolved_nodes = [cls._thought_from_record(nodes[i]) for i in sorted(nodes, key=order.__getitem__)]
+        resolved_edges = [
+            cls._edge_from_record(e) for e in edges.values()
+            if e["source_id"] in nodes and e["target_id"] in nodes
+        ]
+        return resolved_nodes, resolved_edges
+
+    @staticmethod
+    def _edge_key(source_id: str, target_id: str) -> str:
+        return f"{source_id}->{target_id}"
+
+    @staticmethod
+    def _thought_from_record(record: Dict[str, Any]) -> ThoughtNode:
+        """
+        Convert stored ThoughtNode properties back into the API model.
+        session_id is the session that stores the thought, which for an
+        inherited thought in a branch is an ancestor.
+        """
+        return ThoughtNode(
+            id=record["node_id"],
+            type=record["type"],
+            content=record["content"],
+            confidence=record["confidence"],
+            session_id=record["session_id"],
+            created_at=record.get("created_at")
+        )
+
+    @staticmethod
+    def _edge_from_record(record: Dict[str, Any]) -> ReasoningEdge:
+        """Convert stored LEADS_TO properties back into the API model."""
+        confidence = record.get("confidence")
+        return ReasoningEdge(
+            source_id=record["source_id"],
+            target_id=record["target_id"],
+            label=record.get("label") or "",
+            confidence=confidence if confidence is not None else 1.0
+        )
+
+    def compute_layout(self, chain: ReasoningChain, mode: LayoutMode) -> GraphLayout:
+        """Compute a layout for a chain at its current version."""
+        return self.layout_service.compute_layout(
+            node_ids=[node.id for node in chain.nodes],
+            edges=[(edge.source_id, edge.target_id) for edge in chain.edges],
+            mode=mode,
+            version=chain.version
+        )
+
+    @staticmethod
+    def _layout_cache_key(mode: LayoutMode) -> str:
+        """Session property holding the cached layout for one mode."""
+        return f"layout_cache_{mode.value}"
+
+    @classmethod
+    def _cached_layout(cls, session: Dict[str, Any], mode: LayoutMode, version: int) -> Optional[GraphLayout]:
+        """Layout cached on the session for this mode, if it matches the graph version."""
+        cached = session.get(cls._layout_cache_key(mode))
+        if cached:
+            layout = GraphLayout.model_validate_json(cached)
+            if layout.version == version:
+                return layout
+        return None
+
+    def _get_or_compute_layout(self, session: Dict[str, Any], chain: ReasoningChain,
+                               mode: LayoutMode) -> GraphLayout:
+        """
+        Return the cached layout for this mode if it matches the session's
+        graph version, otherwise compute it and write it back to the session.
+
+        Each mode has its own property, so concurrent fetches of different
+        modes don't overwrite each other's cache entries.
+        """
+        cached = self._cached_layout(session, mode, chain.version)
+        if cached is not None:
+            return cached
+
+        logger.info(f"Computing {mode.value} layout for session {chain.session_id} v{chain.version}")
+        layout = self.compute_layout(chain, mode)
+        self.graph.update_session(session["session_id"], {self._layout_cache_key(mode): layout.model_dump_json()})
+        return layout
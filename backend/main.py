@@ -1,12 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.config import Settings
-from app.core.database import test_neo4j_connection, close_graph_service
-from app.api import reasoning
+from fastapi.responses import JSONResponse
+from app.core.config import get_settings
+from app.core.database import (
+    check_neo4j_connection,
+    close_graph_service,
+    get_provenance_writer,
+    warm_up_graph_service
+)
+from app.core.health import DependencyProbe
+from app.api import reasoning, provenance, prompts
+import asyncio
 import uvicorn
 
-# Initialize settings
-settings = Settings()
+# Shared settings instance
+settings = get_settings()
+
+# Background-refreshed dependency checks backing /readyz and /health
+readiness_probe = DependencyProbe(
+    {"neo4j": check_neo4j_connection},
+    interval_seconds=settings.readiness_probe_interval_seconds,
+    timeout_seconds=settings.readiness_probe_timeout_seconds
+)
 
 # Create FastAPI app
 app = FastAPI(
@@ -26,6 +41,8 @@ app.add_middleware(
 
 # Include routers
 app.include_router(reasoning.router)
+app.include_router(provenance.router)
+app.include_router(prompts.router)
 
 
 # Startup event
@@ -34,32 +51,63 @@ async def startup_event():
     print(f"Starting {settings.api_title} v{settings.api_version}")
     print(f"Environment: {settings.environment}")
 
-    # Test Neo4j connection
-    neo4j_status = await test_neo4j_connection()
-    if neo4j_status["status"] == "connected":
-        print(f"✓ Neo4j connected: {neo4j_status['uri']}")
-    else:
-        print(f"✗ Neo4j connection failed: {neo4j_status.get('error', 'Unknown error')}")
+    # Don't block startup on Neo4j: warm the connection pool and start the
+    # readiness probe in the background. /readyz reports when they're done.
+    app.state.warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up_graph_service))
+    readiness_probe.start()
+
+    # Start the batching writer for the LLM provenance log
+    provenance_writer = get_provenance_writer()
+    if provenance_writer is not None:
+        provenance_writer.start()
 
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     print("Shutting down...")
+    await readiness_probe.stop()
+
+    # Don't close the driver under a warm-up that's still running. Its thread
+    # can't be interrupted, so give it a bounded wait before cancelling.
+    warm_up_task = app.state.warm_up_task
+    if not warm_up_task.done():
+        await asyncio.wait({warm_up_task}, timeout=settings.readiness_probe_timeout_seconds)
+        warm_up_task.cancel()
+    try:
+        await warm_up_task
+    except asyncio.CancelledError:
+        pass
+
+    # Flush any queued provenance records before exiting
+    provenance_writer = get_provenance_writer()
+    if provenance_writer is not None:
+        await provenance_writer.stop()
     close_graph_service()
 
 
+# Liveness: the process is up and serving. Never touches dependencies.
+@app.get("/livez")
+async def liveness_check():
+    return {"status": "alive"}
+
+
+# Readiness: whether dependencies are reachable, from the cached probe
+@app.get("/readyz")
+async def readiness_check():
+    snapshot = readiness_probe.snapshot()
+    return JSONResponse(content=snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    neo4j_status = await test_neo4j_connection()
-
     return {
         "status": "healthy",
         "service": settings.api_title,
         "version": settings.api_version,
         "environment": settings.environment,
-        "neo4j": neo4j_status
+        "neo4j": readiness_probe.result("neo4j")
     }
 
 
@@ -68,7 +116,9 @@ async def root():
     return {
         "message": "AI Mind Explorer API",
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "livez": "/livez",
+        "readyz": "/readyz"
     }
 
 if __name__ == "__main__":
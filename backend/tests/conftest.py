@@ -0,0 +1,7 @@
+import os
+
+# Settings are required at import time by the API modules; tests never connect
+os.environ.setdefault("NEO4J_URI", "bolt://localhost:7687")
+os.environ.setdefault("NEO4J_USER", "neo4j")
+os.environ.setdefault("NEO4J_PASSWORD", "testpassword")
+os.environ.setdefault("PROVENANCE_ENABLED", "false")
@@ -0,0 +1,214 @@
+import numpy as np
+import pytest
+
+from app.models.thought_models import LayoutMode, ReasoningChain, ReasoningEdge, ThoughtNode
+from app.services.compact_service import CompactChainEncoder
+from app.services.layout_service import LayoutService
+from app.services.session_service import SessionService
+
+SESSION = "0f8c2a6e-session"
+
+
+def _node_id(i):
+    return f"{SESSION}_node_{i}"
+
+
+def _chain(level_sizes, seed=0, extra_edges=0):
+    """A layered chain: every node links to a node in the level above, plus random forward edges."""
+    rng = np.random.default_rng(seed)
+    levels, nodes, edges = [], [], []
+    for size in level_sizes:
+        level = list(range(len(nodes), len(nodes) + size))
+        for i in level:
+            nodes.append(ThoughtNode(id=_node_id(i), type="reasoning", content=f"thought {i}",
+                                     confidence=0.5, session_id=SESSION))
+            if levels:
+                edges.append((int(rng.choice(levels[-1])), i))
+        levels.append(level)
+    for _ in range(extra_edges):
+        a, b = sorted(rng.choice(len(nodes), 2, replace=False).tolist())
+        if (a, b) not in edges:
+            edges.append((a, b))
+    # Shuffle so chain order isn't already depth order
+    order = rng.permutation(len(nodes)).tolist()
+    return ReasoningChain(
+        session_id=SESSION, prompt="p", version=1,
+        nodes=[nodes[i] for i in order],
+        edges=[ReasoningEdge(source_id=_node_id(a), target_id=_node_id(b), label="next", confidence=1.0)
+               for a, b in edges],
+    )
+
+
+@pytest.fixture
+def encoder():
+    return CompactChainEncoder(LayoutService())
+
+
+def _full_ids(window):
+    return [(window.strings[p] if p >= 0 else "") + suffix
+            for p, suffix in zip(window.node_id_prefix, window.node_ids)]
+
+
+def _pages(encoder, chain, max_nodes, layout=None):
+    index = encoder.index(chain)
+    offset, windows = 0, []
+    while offset is not None:
+        window = encoder.encode(chain, index, layout=layout, offset=offset, max_nodes=max_nodes)
+        windows.append(window)
+        offset = window.next_offset
+    return windows
+
+
+# Window reassembly
+
+@pytest.mark.parametrize("max_nodes", [1, 7, 50, 1000])
+def test_windows_reassemble_to_every_node_and_edge_once(encoder, max_nodes):
+    chain = _chain([1, 4, 9, 12, 9, 5, 2], extra_edges=20)
+    layout = LayoutService().compute_layout([n.id for n in chain.nodes],
+                                            [(e.source_id, e.target_id) for e in chain.edges],
+                                            mode=LayoutMode.HIERARCHICAL)
+    whole = encoder.encode(chain, layout=layout)
+    windows = _pages(encoder, chain, max_nodes, layout=layout)
+
+    ids, depths, xs, edges = [], [], [], []
+    for window in windows:
+        assert window.offset == len(ids)
+        ids += _full_ids(window)
+        depths += window.node_depth
+        xs += window.layout.x
+        for s, t in zip(window.edge_source, window.edge_target):
+            # An edge arrives only once both its endpoints have
+            assert max(s, t) < len(ids)
+            edges.append((ids[s], ids[t]))
+
+    assert sorted(ids) == sorted(n.id for n in chain.nodes)
+    assert depths == sorted(depths)
+    assert ids == _full_ids(whole)
+    assert xs == whole.layout.x
+    assert sorted(edges) == sorted((e.source_id, e.target_id) for e in chain.edges)
+    assert windows[-1].next_offset is None
+    assert all(w.total_nodes == len(chain.nodes) for w in windows)
+
+
+def test_edges_point_from_lower_depth(encoder):
+    window = encoder.encode(_chain([1, 3, 3, 3], extra_edges=5))
+    for s, t in zip(window.edge_source, window.edge_target):
+        assert window.node_depth[s] < window.node_depth[t]
+
+
+def test_node_ids_share_interned_prefix(encoder):
+    window = encoder.encode(_chain([1, 3]))
+    assert sorted(window.node_ids) == ["0", "1", "2", "3"]
+    assert {window.strings[p] for p in window.node_id_prefix} == {f"{SESSION}_node_"}
+
+
+# Depth boundaries
+
+def test_window_is_trimmed_to_depth_boundary(encoder):
+    chain = _chain([1, 3, 3, 3])
+    window = encoder.encode(chain, offset=0, max_nodes=5)
+
+    assert window.node_depth == [0, 1, 1, 1]
+    assert (window.start_depth, window.end_depth, window.next_offset) == (0, 1, 4)
+
+
+def test_level_larger_than_window_is_split(encoder):
+    chain = _chain([1, 10])
+    window = encoder.encode(chain, offset=1, max_nodes=4)
+
+    assert window.node_depth == [1, 1, 1, 1]
+    assert window.next_offset == 5
+
+
+def test_start_depth_jumps_to_level(encoder):
+    window = encoder.encode(_chain([1, 3, 3, 3]), offset=0, start_depth=2)
+
+    assert window.offset == 4
+    assert window.node_depth == [2, 2, 2, 3, 3, 3]
+
+
+def test_start_depth_past_max_depth_is_empty(encoder):
+    chain = _chain([1, 3, 3])
+    window = encoder.encode(chain, start_depth=10, max_nodes=5)
+
+    assert window.node_ids == [] and window.edge_source == []
+    assert window.offset == window.total_nodes == 7
+    assert window.next_offset is None
+    assert window.max_depth == 2
+
+
+def test_empty_chain(encoder):
+    chain = ReasoningChain(session_id=SESSION, prompt="p", nodes=[], edges=[], version=1)
+    layout = LayoutService().compute_layout([], [], mode=LayoutMode.HIERARCHICAL)
+    window = encoder.encode(chain, layout=layout, max_nodes=10)
+
+    assert window.node_ids == [] and window.edge_source == [] and window.strings == []
+    assert (window.total_nodes, window.max_depth, window.next_offset) == (0, 0, None)
+    assert window.layout.x == []
+
+
+# SessionService.load_compact
+
+def _lineage(chain):
+    return [{
+        "session": {"session_id": SESSION, "prompt": "p", "version": 1},
+        "depth": 0,
+        "thoughts": [{"node_id": n.id, "type": n.type.value, "content": n.content,
+                      "confidence": n.confidence, "session_id": n.session_id} for n in chain.nodes],
+        "edges": [{"source_id": e.source_id, "target_id": e.target_id, "label": e.label,
+                   "confidence": e.confidence} for e in chain.edges],
+    }]
+
+
+class _FakeGraph:
+    def __init__(self, chain):
+        self.session = {"session_id": SESSION, "prompt": "p", "version": 1}
+        self.lineage = _lineage(chain)
+        self.lineage_loads = 0
+        self.writes = []
+
+    def get_session_node(self, session_id):
+        return dict(self.session) if session_id == SESSION else None
+
+    def get_session_lineage(self, session_id):
+        self.lineage_loads += 1
+        return self.lineage if session_id == SESSION else None
+
+    def update_session(self, session_id, properties):
+        self.writes += sorted(properties)
+        self.session.update(properties)
+        return True
+
+
+def test_load_compact_pages_from_one_resolve():
+    chain = _chain([1, 4, 9, 12, 9], extra_edges=10)
+    graph = _FakeGraph(chain)
+    service = SessionService(graph, LayoutService())
+
+    offset, ids = 0, []
+    while offset is not None:
+        window = service.load_compact(SESSION, offset=offset, max_nodes=8, expected_version=1)
+        ids += _full_ids(window)
+        offset = window.next_offset
+
+    assert sorted(ids) == sorted(n.id for n in chain.nodes)
+    assert graph.lineage_loads == 1
+    assert graph.writes == ["layout_cache_hierarchical"]
+
+
+def test_load_compact_skips_uncached_force_layout():
+    graph = _FakeGraph(_chain([1, 3]))
+    window = SessionService(graph, LayoutService()).load_compact(SESSION, layout_mode=LayoutMode.FORCE)
+
+    assert window.layout is None
+    assert graph.writes == []
+
+
+def test_load_compact_rejects_stale_version():
+    service = SessionService(_FakeGraph(_chain([1, 3])), LayoutService())
+    with pytest.raises(ValueError):
+        service.load_compact(SESSION, offset=4, expected_version=2)
+
+
+def test_load_compact_missing_session():
+    assert SessionService(_FakeGraph(_chain([1])), LayoutService()).load_compact("nope") is None
@@ -0,0 +1,88 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from app.models.thought_models import ReasoningChain, ReasoningEdge, ThoughtNode
+from app.services.diff_service import GraphDiffService
+from app.services.layout_service import LayoutService
+
+
+def _brute_force_cost(cost):
+    """Cheapest one-to-one assignment of the smaller side, by trying every permutation."""
+    if cost.shape[0] > cost.shape[1]:
+        cost = cost.T
+    n, m = cost.shape
+    return min(cost[np.arange(n), list(cols)].sum() for cols in permutations(range(m), n))
+
+
+def _check_assignment(cost, rows, cols):
+    assert len(rows) == len(cols) == min(cost.shape)
+    assert len(set(rows.tolist())) == len(rows)
+    assert len(set(cols.tolist())) == len(cols)
+    assert rows.max() < cost.shape[0] and cols.max() < cost.shape[1]
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (3, 3), (4, 6), (6, 4), (7, 7)])
+def test_assign_matches_brute_force(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(25):
+        cost = rng.random(shape)
+        rows, cols = GraphDiffService._assign(cost)
+
+        _check_assignment(cost, rows, cols)
+        assert cost[rows, cols].sum() == pytest.approx(_brute_force_cost(cost))
+
+
+def test_assign_with_ties_and_integer_costs():
+    rng = np.random.default_rng(7)
+    for _ in range(25):
+        cost = rng.integers(0, 3, (5, 5)).astype(float)
+        rows, cols = GraphDiffService._assign(cost)
+
+        _check_assignment(cost, rows, cols)
+        assert cost[rows, cols].sum() == pytest.approx(_brute_force_cost(cost))
+
+
+def test_assign_finds_obvious_matching():
+    # Identity is free, everything else costs 1
+    cost = 1.0 - np.eye(4)
+    cost = cost[[2, 0, 3, 1]]
+    rows, cols = GraphDiffService._assign(cost)
+
+    assert dict(zip(rows.tolist(), cols.tolist())) == {0: 2, 1: 0, 2: 3, 3: 1}
+
+
+def test_assign_transposed_returns_row_and_column_indices():
+    cost = np.array([[5.0, 1.0], [1.0, 5.0], [0.0, 0.0]])
+    rows, cols = GraphDiffService._assign(cost)
+
+    _check_assignment(cost, rows, cols)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 1), (2, 0)]
+
+
+# Relative depth
+
+def _chain(pairs, n):
+    nodes = [ThoughtNode(id=str(i), type="reasoning", content=f"t{i}", confidence=0.5, session_id="s")
+             for i in range(n)]
+    edges = [ReasoningEdge(source_id=str(a), target_id=str(b), label="", confidence=1.0) for a, b in pairs]
+    return ReasoningChain(session_id="s", prompt="p", nodes=nodes, edges=edges)
+
+
+def test_relative_depth_matches_layout_layering_on_cycles():
+    # 0 -> 1 -> 2 -> 1 is a cycle; 2 -> 3 hangs off it
+    chain = _chain([(0, 1), (1, 2), (2, 1), (2, 3)], 4)
+    layering = LayoutService().topological_depths([n.id for n in chain.nodes],
+                                                  [(e.source_id, e.target_id) for e in chain.edges])
+
+    depth = GraphDiffService()._relative_depth(chain)
+
+    np.testing.assert_allclose(depth, layering / layering.max())
+    assert depth.tolist() == [0.0, 1 / 3, 2 / 3, 1.0]
+
+
+def test_relative_depth_of_flat_and_empty_chains():
+    service = GraphDiffService()
+    assert service._relative_depth(_chain([], 3)).tolist() == [0.0, 0.0, 0.0]
+    assert service._relative_depth(_chain([], 0)).tolist() == []
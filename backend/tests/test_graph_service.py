@@ -0,0 +1,126 @@
+import os
+import uuid
+
+import pytest
+
+from app.services.graph_service import GraphService
+
+
+class _StubSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, cypher, **params):
+        self.driver.calls.append((cypher, params))
+        return iter(self.driver.records)
+
+
+class _StubDriver:
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def session(self):
+        return _StubSession(self)
+
+
+def _stub_graph(records):
+    graph = GraphService.__new__(GraphService)
+    graph.driver = _StubDriver(records)
+    return graph
+
+
+def test_get_session_lineage_maps_levels():
+    graph = _stub_graph([
+        {"session": {"session_id": "b"}, "depth": 0, "thoughts": [], "edges": [{"source_id": "1", "target_id": "3"}]},
+        {"session": {"session_id": "a"}, "depth": 1, "thoughts": [{"node_id": "1"}], "edges": []},
+    ])
+
+    lineage = graph.get_session_lineage("b")
+
+    assert [level["session"]["session_id"] for level in lineage] == ["b", "a"]
+    assert lineage[0]["edges"] == [{"source_id": "1", "target_id": "3"}]
+    assert lineage[1]["thoughts"] == [{"node_id": "1"}]
+    assert graph.driver.calls[0][1] == {"session_id": "b"}
+
+
+def test_get_session_lineage_missing_session():
+    assert _stub_graph([]).get_session_lineage("nope") is None
+
+
+def test_get_session_lineage_groups_before_combining_edges():
+    # Neo4j 5 rejects an aggregate mixed with a non-grouped variable in RETURN
+    graph = _stub_graph([])
+    graph.get_session_lineage("x")
+    cypher = graph.driver.calls[0][0]
+    return_clause = cypher[cypher.rindex("RETURN"):]
+    assert "collect(" not in return_clause
+
+
+# Live database: pytest -m neo4j with NEO4J_TEST_URI set
+
+@pytest.fixture
+def live_graph():
+    uri = os.environ.get("NEO4J_TEST_URI")
+    if not uri:
+        pytest.skip("NEO4J_TEST_URI not set")
+    graph = GraphService(uri, os.environ.get("NEO4J_TEST_USER", "neo4j"),
+                         os.environ.get("NEO4J_TEST_PASSWORD", "testpassword"))
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    yield graph, prefix
+    with graph.driver.session() as session:
+        session.run(
+            "MATCH (s:Session) WHERE s.session_id STARTS WITH $prefix "
+            "OPTIONAL MATCH (s)-[:HAS_THOUGHT|HAS_EDGE|HAS_CHANGE|HAS_SYNC_CURSOR]->(x) "
+            "DETACH DELETE s, x",
+            prefix=prefix
+        ).consume()
+    graph.close()
+
+
+def _thought(session_id, node_id):
+    return {"session_id": session_id, "node_id": node_id, "type": "reasoning",
+            "content": f"thought {node_id}", "confidence": 0.8}
+
+
+@pytest.mark.neo4j
+def test_live_session_lineage_with_branch(live_graph):
+    graph, prefix = live_graph
+    root, branch = f"{prefix}-root", f"{prefix}-branch"
+    graph.create_sessions([{
+        "props": {"session_id": root, "prompt": "p", "version": 1},
+        "thoughts": [_thought(root, "1"), _thought(root, "2")],
+        "edges": [{"source_id": "1", "target_id": "2", "label": "next", "confidence": 1.0}],
+    }])
+    graph.create_branch(root, {"session_id": branch, "prompt": "p", "version": 1},
+                        [_thought(branch, "3")],
+                        [{"source_id": "2", "target_id": "3", "label": "branch", "confidence": 0.9}])
+
+    lineage = graph.get_session_lineage(branch)
+
+    assert [level["session"]["session_id"] for level in lineage] == [branch, root]
+    assert [t["node_id"] for t in lineage[0]["thoughts"]] == ["3"]
+    assert [(e["source_id"], e["target_id"]) for e in lineage[0]["edges"]] == [("2", "3")]
+    assert sorted(t["node_id"] for t in lineage[1]["thoughts"]) == ["1", "2"]
+    assert [(e["source_id"], e["target_id"]) for e in lineage[1]["edges"]] == [("1", "2")]
+
+
+@pytest.mark.neo4j
+def test_live_sync_cursor_compaction(live_graph):
+    graph, prefix = live_graph
+    sid = f"{prefix}-sync"
+    graph.create_sessions([{"props": {"session_id": sid, "prompt": "p", "version": 1},
+                            "thoughts": [_thought(sid, "1")], "edges": []}])
+    for _ in range(3):
+        graph.append_session_changes(sid, [{"op": "updated", "kind": "node", "entity_id": "1", "payload": "{}"}])
+
+    assert graph.advance_sync_cursor(sid, "a", 4, now=1000.0, ttl_seconds=60) == \
+        {"compacted_version": 4, "removed": 3}
+    assert graph.advance_sync_cursor(sid, "a", 4, now=1001.0, ttl_seconds=60) == {}
+    assert graph.advance_sync_cursor("missing", "a", 1, now=1000.0, ttl_seconds=60) is None
@@ -0,0 +1,186 @@
+import asyncio
+import math
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.idempotency import IdempotencyKeyReused, IdempotencyStore
+
+
+class _Work:
+    """Counts calls; each call waits for `release` unless it's already set."""
+
+    def __init__(self, result="done", fail=False):
+        self.result = result
+        self.fail = fail
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("boom")
+        return f"{self.result}-{self.calls}"
+
+
+def test_retry_attaches_to_in_flight_work():
+    async def scenario():
+        store = IdempotencyStore()
+        work = _Work()
+        first = asyncio.create_task(store.run("k", "fp", work))
+        second = asyncio.create_task(store.run("k", "fp", work))
+        await asyncio.sleep(0)
+        work.release.set()
+        return await first, await second, work.calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert first == ("done-1", False)
+    assert second == ("done-1", True)
+    assert calls == 1
+
+
+def test_completed_result_is_replayed():
+    async def scenario():
+        store = IdempotencyStore()
+        work = _Work()
+        work.release.set()
+        return await store.run("k", "fp", work), await store.run("k", "fp", work), work.calls
+
+    first, replay, calls = asyncio.run(scenario())
+    assert first == ("done-1", False)
+    assert replay == ("done-1", True)
+    assert calls == 1
+
+
+def test_reused_key_with_different_fingerprint_raises():
+    async def scenario():
+        store = IdempotencyStore()
+        work = _Work()
+        work.release.set()
+        await store.run("k", "fp-1", work)
+        await store.run("k", "fp-2", work)
+
+    with pytest.raises(IdempotencyKeyReused):
+        asyncio.run(scenario())
+
+
+def test_failed_work_is_not_stored():
+    async def scenario():
+        store = IdempotencyStore()
+        failing = _Work(fail=True)
+        failing.release.set()
+        with pytest.raises(RuntimeError):
+            await store.run("k", "fp", failing)
+        retry = _Work(result="retry")
+        retry.release.set()
+        return await store.run("k", "fp", retry)
+
+    assert asyncio.run(scenario()) == ("retry-1", False)
+
+
+def test_result_rejected_by_keep_is_not_stored():
+    async def scenario():
+        store = IdempotencyStore()
+        work = _Work(result="fallback")
+        work.release.set()
+        first = await store.run("k", "fp", work, keep=lambda result: not result.startswith("fallback"))
+        second = await store.run("k", "fp", work, keep=lambda result: not result.startswith("fallback"))
+        return first, second, len(store._entries)
+
+    first, second, stored = asyncio.run(scenario())
+    assert first == ("fallback-1", False)
+    assert second == ("fallback-2", False)
+    assert stored == 0
+
+
+def test_completed_entry_expires_after_ttl():
+    async def scenario():
+        store = IdempotencyStore(ttl_seconds=0.01)
+        work = _Work()
+        work.release.set()
+        await store.run("k", "fp", work)
+        await asyncio.sleep(0.02)
+        return await store.run("k", "fp", work)
+
+    assert asyncio.run(scenario()) == ("done-2", False)
+
+
+def test_in_flight_entries_are_never_evicted():
+    async def scenario():
+        store = IdempotencyStore(max_entries=2)
+        work = _Work()
+        tasks = [asyncio.create_task(store.run(f"k{i}", "fp", work)) for i in range(3)]
+        await asyncio.sleep(0)
+        over_capacity = len(store._entries)
+        all_in_flight = all(entry.expires_at == math.inf for entry in store._entries.values())
+
+        # A retry for the oldest key still attaches instead of starting again
+        retry = asyncio.create_task(store.run("k0", "fp", work))
+        await asyncio.sleep(0)
+        work.release.set()
+        await asyncio.gather(*tasks)
+        retried = await retry
+        return over_capacity, all_in_flight, retried, work.calls, len(store._entries)
+
+    over_capacity, all_in_flight, retried, calls, remaining = asyncio.run(scenario())
+    assert (over_capacity, all_in_flight) == (3, True)
+    assert retried[1] is True
+    assert calls == 3
+    assert remaining == 2
+
+
+def test_eviction_drops_oldest_completed_entries():
+    async def scenario():
+        store = IdempotencyStore(max_entries=2)
+        done = _Work()
+        done.release.set()
+        await store.run("old", "fp", done)
+        running = _Work()
+        pending = asyncio.create_task(store.run("running", "fp", running))
+        await asyncio.sleep(0)
+        await store.run("new", "fp", done)
+        keys = list(store._entries)
+        running.release.set()
+        await pending
+        return keys
+
+    assert asyncio.run(scenario()) == ["running", "new"]
+
+
+# /process maps a reused key to 422
+
+class _FakeLLM:
+    async def generate_reasoning_chain(self, prompt, session_id):
+        return {"nodes": [], "edges": []}
+
+
+class _FakeSessions:
+    def compute_layout(self, chain, mode):
+        return None
+
+    def create_session(self, **kwargs):
+        return None
+
+
+def test_process_rejects_reused_key_with_422(monkeypatch):
+    from app.api import reasoning
+    from app.core.database import get_session_service
+
+    app = FastAPI()
+    app.include_router(reasoning.router)
+    app.dependency_overrides[reasoning.get_llm_service] = _FakeLLM
+    app.dependency_overrides[get_session_service] = _FakeSessions
+    monkeypatch.setattr(reasoning, "idempotency_store", IdempotencyStore())
+    client = TestClient(app)
+    path = next(route.path for route in reasoning.router.routes if route.path.endswith("/process"))
+
+    first = client.post(path, json={"prompt": "one"}, headers={"Idempotency-Key": "abc"})
+    replay = client.post(path, json={"prompt": "one"}, headers={"Idempotency-Key": "abc"})
+    reused = client.post(path, json={"prompt": "two"}, headers={"Idempotency-Key": "abc"})
+
+    assert first.status_code == 200
+    assert replay.status_code == 200 and replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["session_id"] == first.json()["session_id"]
+    assert reused.status_code == 422
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from app.models.thought_models import LayoutMode
+from app.services.layout_service import LayoutService
+
+
+def _random_positions(n, seed=0):
+    return np.random.default_rng(seed).uniform(-1000.0, 1000.0, (n, 2))
+
+
+def _relative_error(approx, exact):
+    return np.linalg.norm(approx - exact) / np.linalg.norm(exact)
+
+
+# Barnes-Hut repulsion
+
+@pytest.mark.parametrize("n", [300, 1000])
+def test_barnes_hut_matches_exact_repulsion(n):
+    service = LayoutService()
+    pos = _random_positions(n)
+
+    approx = service._barnes_hut_repulsion(pos, 160.0)
+    exact = LayoutService._exact_repulsion(pos, 160.0)
+
+    assert approx.shape == exact.shape
+    assert _relative_error(approx, exact) < 0.05
+
+
+def test_barnes_hut_error_shrinks_with_theta():
+    pos = _random_positions(600, seed=1)
+    exact = LayoutService._exact_repulsion(pos, 160.0)
+
+    coarse = _relative_error(LayoutService(theta=0.8)._barnes_hut_repulsion(pos, 160.0), exact)
+    fine = _relative_error(LayoutService(theta=0.3)._barnes_hut_repulsion(pos, 160.0), exact)
+
+    assert fine < coarse
+    assert fine < 0.005
+
+
+def test_barnes_hut_handles_coincident_points():
+    pos = np.vstack([_random_positions(299, seed=2), [[0.0, 0.0]] * 2])
+    forces = LayoutService()._barnes_hut_repulsion(pos, 160.0)
+    assert np.isfinite(forces).all()
+
+
+def test_exact_repulsion_pushes_pair_apart():
+    forces = LayoutService._exact_repulsion(np.array([[0.0, 0.0], [10.0, 0.0]]), 10.0)
+    np.testing.assert_allclose(forces, [[-10.0, 0.0], [10.0, 0.0]])
+
+
+# Force layout cost bounds
+
+def test_iteration_count_scales_down_with_size():
+    service = LayoutService(iterations=300, full_iteration_nodes=100, min_iterations=30)
+    assert service._iteration_count(50) == 300
+    assert service._iteration_count(100) == 300
+    assert service._iteration_count(200) == 150
+    assert service._iteration_count(100000) == 30
+
+
+def test_force_falls_back_to_hierarchical_above_max_force_nodes():
+    service = LayoutService(max_force_nodes=10)
+    node_ids = [str(i) for i in range(11)]
+    edges = [(str(i), str(i + 1)) for i in range(10)]
+
+    layout = service.compute_layout(node_ids, edges, mode=LayoutMode.FORCE)
+
+    assert layout.mode == LayoutMode.HIERARCHICAL
+    assert [p.layer for p in layout.positions] == list(range(11))
+
+
+# Cycle removal and layering
+
+def _edges(pairs):
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def _is_acyclic(n, dag):
+    layers = LayoutService._assign_layers(n, dag)
+    return all(layers[dst] > layers[src] for src, dst in dag)
+
+
+def test_remove_cycles_keeps_dag_unchanged():
+    pairs = [(0, 1), (0, 2), (1, 3), (2, 3)]
+    assert LayoutService._remove_cycles(4, _edges(pairs)) == sorted(pairs)
+
+
+def test_remove_cycles_reverses_back_edge():
+    dag = LayoutService._remove_cycles(3, _edges([(0, 1), (1, 2), (2, 0)]))
+    assert dag == [(0, 1), (0, 2), (1, 2)]
+
+
+def test_remove_cycles_breaks_every_cycle():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        n = 30
+        pairs = {tuple(p) for p in rng.integers(0, n, (60, 2)).tolist() if p[0] != p[1]}
+        dag = LayoutService._remove_cycles(n, _edges(sorted(pairs)))
+        assert len(dag) <= len(pairs)
+        assert _is_acyclic(n, dag)
+
+
+def test_assign_layers_uses_longest_path():
+    # 0 -> 1 -> 2 -> 3 and a shortcut 0 -> 3: node 3 still goes to layer 3
+    layers = LayoutService._assign_layers(5, [(0, 1), (1, 2), (2, 3), (0, 3)])
+    assert layers.tolist() == [0, 1, 2, 3, 0]
+
+
+def test_topological_depths_ignores_unknown_and_self_edges():
+    depths = LayoutService().topological_depths(["a", "b", "c"], [("a", "b"), ("b", "c"), ("c", "c"), ("b", "x")])
+    assert depths.tolist() == [0, 1, 2]
+
+
+def test_hierarchical_layout_places_layers_on_rows():
+    service = LayoutService(layer_spacing=100.0)
+    layout = service.compute_layout(["a", "b", "c", "d"], [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")],
+                                    mode=LayoutMode.HIERARCHICAL)
+
+    by_id = {p.node_id: p for p in layout.positions}
+    assert [by_id[i].layer for i in "abcd"] == [0, 1, 1, 2]
+    assert by_id["b"].y == by_id["c"].y == by_id["a"].y + 100.0
+    assert by_id["b"].x != by_id["c"].x
@@ -0,0 +1,202 @@
+import json
+
+import pytest
+
+from app.services.output_repair import ReasoningOutputParser
+
+CLEAN = json.dumps({
+    "thoughts": [
+        {"id": "1", "type": "question", "content": "What is asked?", "confidence": 0.9},
+        {"id": "2", "type": "reasoning", "content": "Work it out", "confidence": 0.8},
+        {"id": "3", "type": "conclusion", "content": "The answer", "confidence": 0.95},
+    ],
+    "edges": [
+        {"from": "1", "to": "2", "label": "leads to"},
+        {"from": "2", "to": "3", "label": "concludes"},
+    ],
+})
+
+
+@pytest.fixture
+def parser():
+    return ReasoningOutputParser()
+
+
+def test_clean_output_needs_no_repair(parser):
+    parsed = parser.parse(CLEAN)
+
+    assert [t["id"] for t in parsed.thoughts] == ["1", "2", "3"]
+    assert [(e["from"], e["to"]) for e in parsed.edges] == [("1", "2"), ("2", "3")]
+    assert not parsed.repairs
+    assert not parsed.truncated
+    assert parsed.strict_ok
+
+
+def test_code_fence_is_stripped(parser):
+    parsed = parser.parse(f"```json\n{CLEAN}\n```")
+
+    assert len(parsed.thoughts) == 3
+    assert parsed.strict_ok
+
+
+def test_json_is_extracted_from_prose(parser):
+    parsed = parser.parse(f"Sure! Here is my reasoning:\n{CLEAN}\nHope this helps.")
+
+    assert len(parsed.thoughts) == 3
+    assert parsed.repairs["json_extracted"] == 2
+    assert not parsed.strict_ok
+
+
+def test_trailing_commas_are_removed(parser):
+    raw = '{"thoughts": [{"id": "1", "type": "question", "content": "Q", "confidence": 0.9},], "edges": [],}'
+    parsed = parser.parse(raw)
+
+    assert [t["content"] for t in parsed.thoughts] == ["Q"]
+    assert parsed.repairs["json_syntax"] == 1
+
+
+def test_truncated_output_keeps_complete_thoughts(parser):
+    # Cut off in the middle of the third thought
+    raw = CLEAN[:CLEAN.index('{"id": "3"') + 20]
+    parsed = parser.parse(raw)
+
+    assert parsed.truncated
+    assert parsed.repairs["truncated"] == 1
+    assert [t["id"] for t in parsed.thoughts] == ["1", "2"]
+    assert parsed.edges == []
+
+
+def test_truncated_output_inside_edges(parser):
+    raw = CLEAN[:CLEAN.index('{"from": "2"') + 5]
+    parsed = parser.parse(raw)
+
+    assert parsed.truncated
+    assert len(parsed.thoughts) == 3
+    assert [(e["from"], e["to"]) for e in parsed.edges] == [("1", "2")]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("85%", 0.85),
+    ("0.7", 0.7),
+    (85, 0.85),
+    (1.05, 1.0),
+    (1.5, 1.0),
+    ("1.2", 1.0),
+    (2, 0.02),
+    (50.0, 0.5),
+    (250, 1.0),
+    ("high", 0.5),
+    (None, 0.5),
+    (-0.2, 0.0),
+    (0.4, 0.4),
+])
+def test_confidence_is_coerced(parser, value, expected):
+    raw = json.dumps({"thoughts": [{"id": "1", "type": "reasoning", "content": "c", "confidence": value}]})
+    assert parser.parse(raw).thoughts[0]["confidence"] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Final Answer", "conclusion"),
+    ("analysis", "reasoning"),
+    ("retrieval/facts", "retrieval"),
+    ("Question", "question"),
+    ("something else", "reasoning"),
+])
+def test_thought_type_is_coerced(parser, value, expected):
+    raw = json.dumps({"thoughts": [{"id": "1", "type": value, "content": "c", "confidence": 0.5}]})
+    parsed = parser.parse(raw)
+
+    assert parsed.thoughts[0]["type"] == expected
+    assert parsed.repairs["thought_type"] == 1
+
+
+def test_dangling_and_self_edges_are_dropped(parser):
+    raw = json.dumps({
+        "thoughts": [
+            {"id": "1", "type": "question", "content": "a", "confidence": 0.9},
+            {"id": "2", "type": "conclusion", "content": "b", "confidence": 0.9},
+        ],
+        "edges": [
+            {"from": "1", "to": "2", "label": "ok"},
+            {"from": "2", "to": "9", "label": "unknown target"},
+            {"from": "2", "to": "2", "label": "self loop"},
+            {"from": "1", "to": "2", "label": "duplicate"},
+        ],
+    })
+    parsed = parser.parse(raw)
+
+    assert [(e["from"], e["to"], e["label"]) for e in parsed.edges] == [("1", "2", "ok")]
+    assert parsed.repairs["dangling_edge"] == 2
+    assert parsed.repairs["duplicate_edge"] == 1
+
+
+def test_edges_may_point_at_known_ids(parser):
+    raw = json.dumps({
+        "thoughts": [{"id": "4", "type": "conclusion", "content": "d", "confidence": 0.9}],
+        "edges": [{"from": "3", "to": "4", "label": "continues"}],
+    })
+
+    assert parser.parse(raw).edges == []
+    assert [(e["from"], e["to"]) for e in parser.parse(raw, known_ids={"3"}).edges] == [("3", "4")]
+
+
+def test_alternate_keys_and_missing_fields(parser):
+    raw = json.dumps({
+        "nodes": [
+            {"id": "1", "type": "question", "text": "from text", "confidence": 0.9},
+            {"id": "1", "type": "reasoning", "content": "duplicate id", "confidence": 0.9},
+            {"id": "3", "type": "reasoning", "content": "   ", "confidence": 0.9},
+        ],
+        "links": [{"source": "1", "target": "2", "label": None}],
+    })
+    parsed = parser.parse(raw)
+
+    assert [(t["id"], t["content"]) for t in parsed.thoughts] == [("1", "from text"), ("2", "duplicate id")]
+    assert parsed.edges == [{"from": "1", "to": "2", "label": "", "confidence": 1.0}]
+    assert parsed.repairs["structure"] == 2
+    assert parsed.repairs["duplicate_id"] == 1
+    assert parsed.repairs["thought_dropped"] == 1
+
+
+def test_bare_list_of_thoughts(parser):
+    parsed = parser.parse(json.dumps([{"id": "1", "type": "reasoning", "content": "x", "confidence": 0.5}]))
+
+    assert len(parsed.thoughts) == 1
+    assert parsed.repairs["structure"] == 1
+
+
+@pytest.mark.parametrize("raw", ["", "I cannot answer that.", '"just a string"'])
+def test_unrecoverable_output_raises(parser, raw):
+    with pytest.raises(ValueError):
+        parser.parse(raw)
+
+
+def test_merge_adds_continuation(parser):
+    truncated = parser.parse(CLEAN[:CLEAN.index('{"id": "3"') + 20])
+    continuation = json.dumps({
+        "thoughts": [
+            {"id": "2", "type": "reasoning", "content": "repeated", "confidence": 0.1},
+            {"id": "3", "type": "conclusion", "content": "The answer", "confidence": 0.95},
+        ],
+        "edges": [{"from": "1", "to": "2", "label": "leads to"}, {"from": "2", "to": "3", "label": "concludes"}],
+    })
+    merged = parser.merge(truncated, continuation)
+
+    assert [t["id"] for t in merged.thoughts] == ["1", "2", "3"]
+    assert merged.thoughts[1]["content"] == "Work it out"
+    assert [(e["from"], e["to"]) for e in merged.edges] == [("1", "2"), ("2", "3")]
+    assert merged.repairs["continuation"] == 1
+    assert not merged.truncated
+
+
+def test_stats_count_salvaged_and_failed(parser):
+    parser.record(parser.parse(CLEAN))
+    parser.record(parser.parse(f"```json\n{CLEAN[:-40]}"), continued=True)
+    parser.record(None)
+
+    stats = parser.stats()
+    assert (stats.responses, stats.strict_ok, stats.salvaged, stats.failed) == (3, 1, 1, 1)
+    assert stats.continuations == 1
+    assert stats.repair_rate == pytest.approx(1 / 3, abs=1e-4)
+    assert stats.salvage_rate == 0.5
+    assert stats.repairs["truncated"] == 1
@@ -0,0 +1,206 @@
+import asyncio
+import gzip
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.provenance_models import ProvenanceRecord
+from app.services import provenance_service
+from app.services.provenance_service import ProvenanceWriter, SegmentFileBackend
+
+T0 = datetime(2026, 1, 1, 10, 0, 0)
+
+
+def _record(minutes, session_id="s1"):
+    return ProvenanceRecord(session_id=session_id, provider="openai", model="m", prompt="p",
+                            latency_ms=1.0, created_at=T0 + timedelta(minutes=minutes))
+
+
+def _minutes(records):
+    return [int((r.created_at - T0).total_seconds() // 60) for r in records]
+
+
+# SegmentFileBackend
+
+def test_batches_are_grouped_by_segment(tmp_path):
+    backend = SegmentFileBackend(str(tmp_path))
+    backend.write_batch([_record(0), _record(61), _record(5)])
+    backend.write_batch([_record(62)])
+
+    assert len(list(tmp_path.iterdir())) == 2
+    assert _minutes(backend.query()) == [0, 5, 61, 62]
+
+
+def test_query_filters_by_time_range_and_session(tmp_path):
+    backend = SegmentFileBackend(str(tmp_path))
+    backend.write_batch([_record(m, "s1" if m % 2 else "s2") for m in range(0, 180, 15)])
+
+    assert _minutes(backend.query(start=T0 + timedelta(minutes=30), end=T0 + timedelta(minutes=90))) == \
+        [30, 45, 60, 75]
+    assert _minutes(backend.query(session_id="s1")) == [15, 45, 75, 105, 135, 165]
+    assert _minutes(backend.query(start=(T0 + timedelta(minutes=150)).replace(tzinfo=timezone.utc))) == [150, 165]
+    assert _minutes(backend.query(limit=3)) == [0, 15, 30]
+
+
+def test_query_stops_reading_once_limit_is_reached(tmp_path, monkeypatch):
+    backend = SegmentFileBackend(str(tmp_path))
+    backend.write_batch([_record(m) for m in (0, 10, 70, 130)])
+    reads = []
+    real_read = SegmentFileBackend._read_segment
+    monkeypatch.setattr(SegmentFileBackend, "_read_segment",
+                        staticmethod(lambda path: reads.append(path.name) or real_read(path)))
+
+    assert _minutes(backend.query(limit=2)) == [0, 10]
+    assert len(reads) == 1
+
+
+def test_torn_trailing_member_does_not_hide_later_batches(tmp_path):
+    crashed = SegmentFileBackend(str(tmp_path))
+    crashed.write_batch([_record(0), _record(1)])
+    (part,) = tmp_path.iterdir()
+    with open(part, "ab") as f:
+        f.write(gzip.compress(b'{"session_id": "s1"}\n')[:15])  # crash mid-append
+
+    # The restarted process writes its own part of the same segment
+    restarted = SegmentFileBackend(str(tmp_path))
+    restarted.write_batch([_record(2)])
+    restarted.write_batch([_record(3)])
+
+    assert len(list(tmp_path.iterdir())) == 2
+    assert _minutes(restarted.query()) == [0, 1, 2, 3]
+
+
+def test_failed_write_moves_to_a_new_part(tmp_path, monkeypatch):
+    backend = SegmentFileBackend(str(tmp_path))
+    backend.write_batch([_record(0)])
+    real_open = gzip.open
+
+    def torn_open(path, mode, **kwargs):
+        raw = open(path, "ab")
+        raw.write(gzip.compress(b"partial")[:10])
+        raw.close()
+        raise OSError("disk full")
+
+    monkeypatch.setattr(provenance_service.gzip, "open", torn_open)
+    with pytest.raises(OSError):
+        backend.write_batch([_record(1)])
+    monkeypatch.setattr(provenance_service.gzip, "open", real_open)
+
+    backend.write_batch([_record(2)])
+    assert len(list(tmp_path.iterdir())) == 2
+    assert _minutes(backend.query()) == [0, 2]
+
+
+def test_reads_single_part_segment_names(tmp_path):
+    with gzip.open(tmp_path / "provenance-20260101T100000.jsonl.gz", "at", encoding="utf-8") as f:
+        f.write(_record(3).model_dump_json() + "\n")
+    (tmp_path / "notes.txt").write_text("ignored")
+    (tmp_path / "provenance-garbage.jsonl.gz").write_text("ignored")
+    backend = SegmentFileBackend(str(tmp_path))
+    backend.write_batch([_record(1)])
+
+    assert _minutes(backend.query()) == [1, 3]
+
+
+def test_delete_before_removes_every_part_of_old_segments(tmp_path):
+    SegmentFileBackend(str(tmp_path)).write_batch([_record(0), _record(65)])
+    backend = SegmentFileBackend(str(tmp_path))
+    backend.write_batch([_record(5), _record(125)])
+
+    # The 10:00 segment (two parts) ends at 11:00; 11:00 and 12:00 are kept
+    assert backend.delete_before(T0 + timedelta(minutes=90)) == 1
+    assert _minutes(backend.query()) == [65, 125]
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+# ProvenanceWriter
+
+class _RecordingBackend:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.cutoffs = []
+        self.closed = False
+
+    def write_batch(self, records):
+        if self.fail:
+            raise OSError("disk full")
+        self.batches.append(list(records))
+
+    def delete_before(self, cutoff):
+        self.cutoffs.append(cutoff)
+        return 0
+
+    def query(self, start, end, session_id, limit):
+        return [r for batch in self.batches for r in batch][:limit]
+
+    def close(self):
+        self.closed = True
+
+
+def test_writer_batches_and_flushes_on_stop():
+    async def scenario():
+        backend = _RecordingBackend()
+        writer = ProvenanceWriter(backend, batch_size=3, flush_interval_seconds=60)
+        writer.start()
+        for m in range(7):
+            writer.record(_record(m))
+        await writer.stop()
+        return backend, writer
+
+    backend, writer = asyncio.run(scenario())
+    assert [len(batch) for batch in backend.batches] == [3, 3, 1]
+    assert writer.stats()["written"] == 7
+    assert backend.closed
+
+
+def test_writer_flushes_partial_batch_after_interval():
+    async def scenario():
+        backend = _RecordingBackend()
+        writer = ProvenanceWriter(backend, batch_size=100, flush_interval_seconds=0.01)
+        writer.start()
+        writer.record(_record(0))
+        await asyncio.sleep(0.1)
+        written = [len(batch) for batch in backend.batches]
+        await writer.stop()
+        return written
+
+    assert asyncio.run(scenario()) == [1]
+
+
+def test_writer_drops_when_not_started_or_full():
+    async def scenario():
+        writer = ProvenanceWriter(_RecordingBackend(), max_queue_size=2)
+        writer.record(_record(0))
+        writer.start()
+        for m in range(3):
+            writer.record(_record(m))
+        stats = writer.stats()
+        await writer.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["dropped"] == 2
+    assert stats["queued"] == 2
+
+
+def test_writer_counts_failed_batches():
+    async def scenario():
+        writer = ProvenanceWriter(_RecordingBackend(fail=True), batch_size=2, flush_interval_seconds=60)
+        writer.start()
+        for m in range(3):
+            writer.record(_record(m))
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["written"], stats["failed_batches"]) == (0, 2)
+
+
+def test_apply_retention_uses_retention_window():
+    backend = _RecordingBackend()
+    writer = ProvenanceWriter(backend, retention_days=7)
+    asyncio.run(writer.apply_retention())
+
+    (cutoff,) = backend.cutoffs
+    assert abs((datetime.utcnow() - timedelta(days=7) - cutoff).total_seconds()) < 5
@@ -0,0 +1,164 @@
+import pytest
+
+from app.models.thought_models import LayoutMode, ReasoningChain, ReasoningEdge, ThoughtNode
+from app.services.layout_service import LayoutService
+from app.services.session_service import SessionService
+
+
+def _node(node_id, content="c", session_id="s1"):
+    return ThoughtNode(id=node_id, type="reasoning", content=content, confidence=0.5, session_id=session_id)
+
+
+def _entry(op, node):
+    return {**SessionService.node_change(op, node), "version": 0}
+
+
+class _FakeGraph:
+    """Just the graph calls get_changes makes."""
+
+    def __init__(self, session, changes=(), lineage=None):
+        self.session = session
+        self.changes = list(changes)
+        self.lineage = lineage or []
+        self.cursor_calls = []
+
+    def get_session_node(self, session_id):
+        return dict(self.session) if self.session else None
+
+    def get_session_changes(self, session_id, since):
+        return self.changes
+
+    def get_session_lineage(self, session_id):
+        return self.lineage
+
+    def advance_sync_cursor(self, session_id, client_id, version, now, ttl_seconds):
+        self.cursor_calls.append((session_id, client_id, version, ttl_seconds))
+        return {}
+
+
+def _service(graph):
+    return SessionService(graph, LayoutService(), sync_cursor_ttl_seconds=60)
+
+
+def _changes(entries):
+    service = _service(_FakeGraph({"session_id": "s1", "version": 5}, entries))
+    return service.get_changes("s1", since=2)
+
+
+# _collapse_changes
+
+def test_repeated_updates_collapse_to_latest():
+    delta = _changes([_entry("updated", _node("a", "v1")), _entry("updated", _node("a", "v2")),
+                      _entry("updated", _node("b", "only"))])
+
+    assert [(n.id, n.content) for n in delta.updated_nodes] == [("a", "v2"), ("b", "only")]
+    assert delta.added_nodes == [] and delta.removed_nodes == []
+
+
+def test_added_then_updated_is_added_with_latest_state():
+    delta = _changes([_entry("added", _node("a", "v1")), _entry("updated", _node("a", "v2"))])
+
+    assert [(n.id, n.content) for n in delta.added_nodes] == [("a", "v2")]
+    assert delta.updated_nodes == []
+
+
+def test_added_then_removed_is_not_reported():
+    delta = _changes([_entry("added", _node("a")), _entry("removed", _node("a"))])
+
+    assert delta.added_nodes == delta.updated_nodes == delta.removed_nodes == []
+
+
+def test_updated_then_removed_is_removed():
+    delta = _changes([_entry("updated", _node("a")), _entry("removed", _node("a"))])
+
+    assert [n.id for n in delta.removed_nodes] == ["a"]
+
+
+def test_no_changes_since_current_version():
+    graph = _FakeGraph({"session_id": "s1", "version": 5}, [_entry("updated", _node("a"))])
+    delta = _service(graph).get_changes("s1", since=5)
+
+    assert not delta.full_resync
+    assert delta.updated_nodes == []
+
+
+# get_changes: full resync and compaction
+
+def _lineage():
+    return [{
+        "session": {"session_id": "s1"},
+        "depth": 0,
+        "thoughts": [{"node_id": "a", "type": "question", "content": "q", "confidence": 0.9, "session_id": "s1"},
+                     {"node_id": "b", "type": "conclusion", "content": "c", "confidence": 0.8, "session_id": "s1"}],
+        "edges": [{"source_id": "a", "target_id": "b", "label": "concludes", "confidence": 1.0}],
+    }]
+
+
+@pytest.mark.parametrize("since, compacted", [(0, 0), (2, 3)])
+def test_full_resync_when_log_does_not_cover_since(since, compacted):
+    graph = _FakeGraph({"session_id": "s1", "version": 5, "compacted_version": compacted},
+                       [_entry("updated", _node("a"))], lineage=_lineage())
+    delta = _service(graph).get_changes("s1", since=since)
+
+    assert delta.full_resync
+    assert [n.id for n in delta.added_nodes] == ["a", "b"]
+    assert delta.added_edges == [ReasoningEdge(source_id="a", target_id="b", label="concludes", confidence=1.0)]
+    assert delta.updated_nodes == []
+
+
+def test_incremental_at_compacted_version():
+    graph = _FakeGraph({"session_id": "s1", "version": 5, "compacted_version": 3},
+                       [_entry("updated", _node("a"))], lineage=_lineage())
+    delta = _service(graph).get_changes("s1", since=3)
+
+    assert not delta.full_resync
+    assert [n.id for n in delta.updated_nodes] == ["a"]
+
+
+def test_client_id_advances_cursor_to_current_version():
+    graph = _FakeGraph({"session_id": "s1", "version": 5}, [])
+    service = _service(graph)
+
+    service.get_changes("s1", since=5)
+    service.get_changes("s1", since=5, client_id="tab-1")
+
+    assert graph.cursor_calls == [("s1", "tab-1", 5, 60)]
+
+
+def test_since_ahead_of_version_raises():
+    with pytest.raises(ValueError):
+        _service(_FakeGraph({"session_id": "s1", "version": 2})).get_changes("s1", since=3)
+
+
+def test_missing_session_returns_none():
+    assert _service(_FakeGraph(None)).get_changes("nope", since=0) is None
+
+
+# Layout cache
+
+class _LayoutGraph:
+    def __init__(self):
+        self.session = {"session_id": "s1", "version": 1}
+        self.writes = []
+
+    def update_session(self, session_id, properties):
+        self.writes.append(properties)
+        self.session.update(properties)
+        return True
+
+
+def test_layout_cache_is_one_property_per_mode():
+    graph = _LayoutGraph()
+    service = _service(graph)
+    chain = ReasoningChain(session_id="s1", prompt="p", version=1, nodes=[_node("a"), _node("b")],
+                           edges=[ReasoningEdge(source_id="a", target_id="b", label="", confidence=1.0)])
+
+    # Both fetches start from the same stale session snapshot, as concurrent requests would
+    snapshot = dict(graph.session)
+    force = service._get_or_compute_layout(snapshot, chain, LayoutMode.FORCE)
+    hierarchical = service._get_or_compute_layout(snapshot, chain, LayoutMode.HIERARCHICAL)
+
+    assert [sorted(w) for w in graph.writes] == [["layout_cache_force"], ["layout_cache_hierarchical"]]
+    assert service._cached_layout(graph.session, LayoutMode.FORCE, 1) == force
+    assert service._cached_layout(graph.session, LayoutMode.HIERARCHICAL, 1) == hierarchical
+    assert service._cached_layout(graph.session, LayoutMode.FORCE, 2) is None
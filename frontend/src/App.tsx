@@ -90,6 +90,7 @@ function App() {
             <ThoughtGraph
               nodes={reasoningChain.nodes}
               edges={reasoningChain.edges}
+              layout={reasoningChain.layout}
               onNodeClick={handleNodeClick}
             />
           </div>
@@ -1,15 +1,16 @@
 import React, { useEffect, useRef, useState } from 'react';
 import * as d3 from 'd3';
-import { ThoughtNode, ReasoningEdge } from '../../types/reasoning';
+import { ThoughtNode, ReasoningEdge, GraphLayout } from '../../types/reasoning';
 import './ThoughtGraph.css';
 
 interface ThoughtGraphProps {
   nodes: ThoughtNode[];
   edges: ReasoningEdge[];
+  layout?: GraphLayout | null;
   onNodeClick?: (node: ThoughtNode) => void;
 }
 
-export const ThoughtGraph: React.FC<ThoughtGraphProps> = ({ nodes, edges, onNodeClick }) => {
+export const ThoughtGraph: React.FC<ThoughtGraphProps> = ({ nodes, edges, layout, onNodeClick }) => {
   const svgRef = useRef<SVGSVGElement>(null);
   const [dimensions] = useState({ width: 900, height: 600 });
 
@@ -42,23 +43,38 @@ export const ThoughtGraph: React.FC<ThoughtGraphProps> = ({ nodes, edges, onNode
       conclusion: '#ef4444'    // Red
     };
 
+    // Server-computed coordinates (centered on the origin), if available
+    const positions = new Map(
+      (layout?.positions ?? []).map(p => [p.node_id, p])
+    );
+    const hasLayout = nodes.length > 0 && nodes.every(n => positions.has(n.id));
+
     // Create copies of data for D3
-    const nodeData = nodes.map(n => ({ ...n }));
+    const nodeData = nodes.map(n => {
+      const p = positions.get(n.id);
+      return hasLayout && p ? { ...n, x: p.x + width / 2, y: p.y + height / 2 } : { ...n };
+    });
     const edgeData = edges.map(e => ({
       ...e,
       source: e.source_id,
       target: e.target_id
     }));
 
-    // Create force simulation
+    // Create force simulation (only simulated when no layout was precomputed)
     const simulation = d3.forceSimulation(nodeData as any)
       .force('link', d3.forceLink(edgeData as any)
         .id((d: any) => d.id)
         .distance(150)
-      )
-      .force('charge', d3.forceManyBody().strength(-400))
-      .force('center', d3.forceCenter(width / 2, height / 2))
-      .force('collision', d3.forceCollide().radius(50));
+      );
+
+    if (hasLayout) {
+      simulation.stop();
+    } else {
+      simulation
+        .force('charge', d3.forceManyBody().strength(-400))
+        .force('center', d3.forceCenter(width / 2, height / 2))
+        .force('collision', d3.forceCollide().radius(50));
+    }
 
     // Create arrow markers for edges
     svg.append('defs').selectAll('marker')
@@ -135,7 +151,7 @@ export const ThoughtGraph: React.FC<ThoughtGraphProps> = ({ nodes, edges, onNode
       .attr('fill', '#666');
 
     // Update positions on simulation tick
-    simulation.on('tick', () => {
+    const render = () => {
       links
         .attr('x1', (d: any) => d.source.x)
         .attr('y1', (d: any) => d.source.y)
@@ -147,21 +163,32 @@ export const ThoughtGraph: React.FC<ThoughtGraphProps> = ({ nodes, edges, onNode
         .attr('y', (d: any) => (d.source.y + d.target.y) / 2);
 
       nodeGroups.attr('transform', (d: any) => `translate(${d.x},${d.y})`);
-    });
+    };
+
+    simulation.on('tick', render);
+    if (hasLayout) render();
 
-    // Drag functions
+    // Drag functions (with a precomputed layout, move the node directly)
     function dragStarted(event: any, d: any) {
+      if (hasLayout) return;
       if (!event.active) simulation.alphaTarget(0.3).restart();
       d.fx = d.x;
       d.fy = d.y;
     }
 
     function dragged(event: any, d: any) {
+      if (hasLayout) {
+        d.x = event.x;
+        d.y = event.y;
+        render();
+        return;
+      }
       d.fx = event.x;
       d.fy = event.y;
     }
 
     function dragEnded(event: any, d: any) {
+      if (hasLayout) return;
       if (!event.active) simulation.alphaTarget(0);
       d.fx = null;
       d.fy = null;
@@ -172,7 +199,7 @@ export const ThoughtGraph: React.FC<ThoughtGraphProps> = ({ nodes, edges, onNode
       simulation.stop();
     };
 
-  }, [nodes, edges, dimensions, onNodeClick]);
+  }, [nodes, edges, layout, dimensions, onNodeClick]);
 
   return (
     <div className="thought-graph-container">
@@ -27,6 +27,24 @@ export interface ReasoningEdge {
   target?: ThoughtNode | string;
 }
 
+export type LayoutMode = 'force' | 'hierarchical';
+
+export interface NodePosition {
+  node_id: string;
+  x: number;
+  y: number;
+  layer?: number | null;
+}
+
+// Node coordinates computed by the backend layout engine
+export interface GraphLayout {
+  mode: LayoutMode;
+  version: number;
+  width: number;
+  height: number;
+  positions: NodePosition[];
+}
+
 export interface ReasoningChain {
   session_id: string;
   prompt: string;
@@ -35,8 +53,69 @@ export interface ReasoningChain {
   status: string;
   created_at?: string;
   metadata?: Record<string, any>;
+  version?: number;
+  layout?: GraphLayout | null;
+}
+
+// Columnar encoding for large chains: GET /api/reasoning/session/{id}?format=compact
+// and GET /api/reasoning/session/{id}/nodes?offset=<n> (depth-ordered windows).
+// Indices into `strings` are -1 for null; edge endpoints are global node indices.
+// Full node id i = (node_id_prefix[i] >= 0 ? strings[node_id_prefix[i]] : "") + node_ids[i].
+export interface CompactLayout {
+  mode: LayoutMode;
+  version: number;
+  width: number;
+  height: number;
+  x: number[];
+  y: number[];
+  layer?: number[] | null;
+}
+
+export interface CompactReasoningChain {
+  session_id: string;
+  prompt: string;
+  status: string;
+  created_at?: string | null;
+  metadata?: Record<string, any>;
+  version: number;
+  strings: string[];
+  node_ids: string[];
+  node_id_prefix: number[];
+  node_type: number[];
+  node_content: string[];
+  node_confidence: number[];
+  node_session: number[];
+  node_depth: number[];
+  node_created_at: number[];
+  node_metadata: (Record<string, any> | null)[];
+  edge_source: number[];
+  edge_target: number[];
+  edge_label: number[];
+  edge_confidence: number[];
+  layout?: CompactLayout | null;
+  offset: number;
+  start_depth: number;
+  end_depth: number;
+  next_offset: number | null;
+  total_nodes: number;
+  max_depth: number;
+}
+
+// Response of GET /api/reasoning/session/{id}/changes?since=<version>
+export interface SessionChanges {
+  session_id: string;
+  since: number;
+  version: number;
+  full_resync: boolean;
+  added_nodes: ThoughtNode[];
+  updated_nodes: ThoughtNode[];
+  removed_nodes: ThoughtNode[];
+  added_edges: ReasoningEdge[];
+  updated_edges: ReasoningEdge[];
+  removed_edges: ReasoningEdge[];
 }
 
 export interface ProcessPromptRequest {
   prompt: string;
+  layout_mode?: LayoutMode;
 }